@@ -0,0 +1,193 @@
+"""
+Esecuzione non interattiva di una matrice di esperimenti descritta da un file di configurazione JSON.
+
+Esempio di configurazione:
+
+    {
+        "datasets": ["Data/version_1.csv"],
+        "strategie": [{"nome": "holdout", "param": 0.8}, {"nome": "k_fold", "param": 5}, {"nome": "leave_one_out"}],
+        "k": [3, 5, 7],
+        "imputazione": ["mean", "median"],
+        "scaling": ["normalize", "standardize"],
+        "metriche": ["Accuracy Rate", "AUC"],
+        "distanze": ["euclidea", "manhattan", "minkowski"],
+        "p": 3,
+        "seme": 0,
+        "cache_vicini": true,
+        "output": "results/batch_results.csv",
+        "salva": "results/modelli"
+    }
+
+Tutte le combinazioni vengono eseguite in un solo processo. Ogni dataset viene caricato e pulito
+una sola volta, feature e target di ogni coppia (imputazione, scaling) passano dalla cache del
+preprocessing, se attiva, e per ogni strategia tutti i valori di k condividono la stessa ricerca
+dei vicini (Evaluation.sweep_k). "cache" attiva la cache del preprocessing su disco: true per
+.cache/preprocessing nella directory corrente oppure il percorso di una cartella; di default è
+false, come in load_and_prepare_data. "distanze" elenca le metriche di distanza del classificatore da confrontare
+(models.distanze.METRICHE); "p" è l'esponente usato da "minkowski". Con "cache_vicini": true
+i vicini di ogni campione vengono calcolati una volta sola per dataset, preprocessing e distanza
+(models.cache_vicini.CacheVicini) e riusati da tutte le strategie, con gli stessi risultati.
+
+Con "salva" (o l'opzione --salva) per ogni dataset, preprocessing, distanza e k viene anche
+addestrato un modello su tutto il dataset, salvato con le sue trasformazioni di preprocessing
+nella cartella indicata (ad esempio version_1_mean_normalize_euclidea_k3.knn), pronto per
+score.py e server.py.
+
+Con la variabile d'ambiente PROFILAZIONE=1 (o PROFILAZIONE=cprofile) i tempi di ogni fase sono
+salvati in profilazione.json, nella cartella dell'output (vedi profilazione.py).
+
+Uso: python batch.py config.json [--salva CARTELLA]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from models.artefatto import addestra_e_salva
+from models.distanze import METRICHE as METRICHE_DISTANZA
+from preprocessing.cache import CachePreprocessing, hash_file
+from preprocessing.importdata import load_and_clean_data, prepare_features
+from validation.evaluation import Evaluation
+from profilazione import attiva_da_ambiente, disattiva
+
+METRICHE_DISPONIBILI = ["Accuracy Rate", "Error Rate", "Sensitivity", "Specificity", "Geometric Mean", "AUC"]
+
+CONFIGURAZIONE_PREDEFINITA = {
+    "strategie": [{"nome": "k_fold", "param": 5}],
+    "k": [3],
+    "imputazione": ["mean"],
+    "scaling": ["normalize"],
+    "metriche": METRICHE_DISPONIBILI,
+    "distanze": ["euclidea"],
+    "p": 2,
+    "seme": 0,
+    "cache": False,
+    "cache_vicini": False,
+    "output": os.path.join("results", "batch_results.csv"),
+    "salva": None,
+}
+
+
+def carica_configurazione(percorso: str) -> dict:
+    """Legge il file di configurazione e completa le chiavi mancanti con i valori predefiniti."""
+    with open(percorso, encoding="utf-8") as file:
+        configurazione = {**CONFIGURAZIONE_PREDEFINITA, **json.load(file)}
+    if not configurazione.get("datasets"):
+        raise ValueError("La configurazione deve indicare almeno un dataset in 'datasets'.")
+    for strategia in configurazione["strategie"]:
+        if strategia.get("nome") not in ("holdout", "k_fold", "leave_one_out"):
+            raise ValueError(f"Strategia non valida: {strategia.get('nome')}")
+    for distanza in configurazione["distanze"]:
+        if distanza not in METRICHE_DISTANZA:
+            raise ValueError(f"Distanza non valida: {distanza}. Valori ammessi: {METRICHE_DISTANZA}")
+    return configurazione
+
+
+def esegui_batch(configurazione: dict) -> pd.DataFrame:
+    """
+    Esegue tutte le combinazioni della configurazione.
+
+    Ritorna:
+    pd.DataFrame con una riga per combinazione (dataset, imputazione, scaling, strategia, distanza, k)
+    e una colonna per ogni metrica, più il tempo di valutazione della strategia
+    """
+    cache = configurazione["cache"]
+    if cache is True:
+        cache = CachePreprocessing()
+    elif isinstance(cache, str):
+        cache = CachePreprocessing(cache)
+    cache = cache or None
+    righe = []
+
+    for file_path in configurazione["datasets"]:
+        hash_contenuto = hash_file(file_path)
+        pulito = None  # dataset pulito, caricato solo se serve (cache mancante)
+
+        for metodo_imputazione, metodo_scaling in product(configurazione["imputazione"], configurazione["scaling"]):
+            features, target, trasformazioni = None, None, None
+            if cache is not None:
+                chiave = cache.chiave(file_path, metodo_imputazione, metodo_scaling, hash_contenuto)
+                features, target = cache.carica(chiave)
+                trasformazioni = cache.trasformazioni(chiave) if features is not None else None
+            if features is None or (configurazione["salva"] and trasformazioni is None):
+                if pulito is None:
+                    pulito = load_and_clean_data(file_path)
+                    if pulito is None:
+                        break  # dataset non caricabile: passo al successivo
+                features, target, trasformazioni = prepare_features(pulito, metodo_imputazione, metodo_scaling, True)
+                if cache is not None:
+                    cache.salva(chiave, features, target, trasformazioni)
+
+            cache_vicini = {}  # distanza -> CacheVicini condivisa dalle strategie su queste feature
+            for strategia, distanza in product(configurazione["strategie"], configurazione["distanze"]):
+                nome, param = strategia["nome"], strategia.get("param")
+                np.random.seed(configurazione["seme"])  # risultati indipendenti dall'ordine delle combinazioni
+                inizio = time.perf_counter()
+                evaluation = Evaluation(features, target, k_folds=(param or 5),
+                                        metriche_scelte=configurazione["metriche"], k=max(configurazione["k"]),
+                                        metrica=distanza, p=configurazione["p"],
+                                        cache_vicini=cache_vicini.get(distanza, configurazione["cache_vicini"]))
+                if nome == "holdout":
+                    tabella = evaluation.sweep_k(configurazione["k"], nome, train_size=param)
+                else:
+                    tabella = evaluation.sweep_k(configurazione["k"], nome)
+                if configurazione["cache_vicini"]:
+                    cache_vicini[distanza] = evaluation.cache_vicini
+                durata = time.perf_counter() - inizio
+
+                for k, metriche in tabella.iterrows():
+                    righe.append({"dataset": file_path, "imputazione": metodo_imputazione,
+                                  "scaling": metodo_scaling, "strategia": nome, "param": param, "distanza": distanza,
+                                  "k": k, **metriche.to_dict(), "tempo_strategia": durata})
+                print(f"{file_path} | {metodo_imputazione} | {metodo_scaling} | {nome} | {distanza}: {durata:.2f} s")
+
+            if configurazione["salva"]:
+                nome_dataset = os.path.splitext(os.path.basename(file_path))[0]
+                for distanza, k in product(configurazione["distanze"], configurazione["k"]):
+                    percorso = os.path.join(configurazione["salva"],
+                                            f"{nome_dataset}_{metodo_imputazione}_{metodo_scaling}_{distanza}_k{k}.knn")
+                    addestra_e_salva(features, target, percorso, trasformazioni, k, metrica=distanza,
+                                     p=configurazione["p"], seme=configurazione["seme"])
+                    print(f"Modello salvato in {percorso}")
+
+    return pd.DataFrame(righe)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Esecuzione di una matrice di esperimenti KNN")
+    parser.add_argument("configurazione", help="file di configurazione JSON")
+    parser.add_argument("--salva", metavar="CARTELLA",
+                        help="cartella in cui salvare i modelli addestrati su tutto il dataset (sostituisce 'salva')")
+    argomenti = parser.parse_args(argv)
+
+    configurazione = carica_configurazione(argomenti.configurazione)
+    if argomenti.salva:
+        configurazione["salva"] = argomenti.salva
+    profilatore = attiva_da_ambiente()
+    try:
+        risultati = esegui_batch(configurazione)
+    finally:
+        if profilatore is not None:
+            disattiva()
+
+    output = configurazione["output"]
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    if output.endswith(".xlsx"):
+        risultati.to_excel(output, index=False)
+    else:
+        risultati.to_csv(output, index=False)
+    print(f"\n{len(risultati)} configurazioni salvate in {output}")
+    if profilatore is not None:
+        print(f"Profilazione salvata in {profilatore.salva(os.path.join(os.path.dirname(output), 'profilazione.json'))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+## generatore di dataset sintetici con lo schema di Data/version_1.csv
+
+"""
+I dataset generati hanno le stesse colonne (nello stesso ordine) e gli stessi difetti del file
+originale, in proporzioni controllabili:
+
+- rumore: frazione di valori mancanti in ogni colonna (target compreso), di valori scritti con
+  la virgola decimale ("2,0") nelle colonne di testo e, per un quinto di questa frazione, di
+  valori moltiplicati per 10 (come i 30, 50 o 100 di Mitoses e clump_thickness_ty)
+- duplicati: frazione di righe che sono copie esatte di altre righe
+
+Le feature citologiche (1-10) dipendono dalla classe, quindi il problema di classificazione
+è simile a quello reale. Il file viene scritto a blocchi, ognuno con un generatore derivato da
+seme: lo stesso seme produce sempre lo stesso file anche con 10^7 righe.
+"""
+
+import numpy as np
+import pandas as pd
+
+# colonne di Data/version_1.csv, nello stesso ordine
+COLONNE = ["Blood Pressure", "Mitoses", "Sample code number", "Normal Nucleoli", "Single Epithelial Cell Size",
+           "uniformity_cellsize_xx", "clump_thickness_ty", "Heart Rate", "Marginal Adhesion", "Bland Chromatin",
+           "classtype_v1", "Uniformity of Cell Shape", "bareNucleix_wrong"]
+FEATURE_CITOLOGICHE = ["Mitoses", "Normal Nucleoli", "Single Epithelial Cell Size", "uniformity_cellsize_xx",
+                       "clump_thickness_ty", "Marginal Adhesion", "Bland Chromatin", "Uniformity of Cell Shape",
+                       "bareNucleix_wrong"]
+COLONNE_TESTO = ["Single Epithelial Cell Size", "Bland Chromatin"]  # nel file originale contengono "2,0"
+COLONNE_FUORI_SCALA = ["Mitoses", "clump_thickness_ty"]
+
+FRAZIONE_MALIGNI = 0.35
+RIGHE_PER_BLOCCO = 1_000_000
+
+# testo dei valori 0-100 nelle colonne di testo, con il punto e con la virgola decimale
+_TESTO_PUNTO = np.array([f"{v}.0" for v in range(101)], dtype=object)
+_TESTO_VIRGOLA = np.array([f"{v},0" for v in range(101)], dtype=object)
+
+
+def genera_blocco(n_righe: int, duplicati: float = 0.1, rumore: float = 0.05, generatore=None) -> pd.DataFrame:
+    """
+    Genera n_righe righe con lo schema di version_1.csv.
+
+    INPUT:
+    n_righe (int) numero di righe
+    duplicati (float) frazione di righe copiate da altre righe del blocco
+    rumore (float) frazione di valori mancanti, con la virgola decimale o fuori scala
+    generatore: np.random.Generator (default: seme 0)
+
+    OUTPUT:
+    pd.DataFrame con le colonne COLONNE
+    """
+    generatore = np.random.default_rng(0) if generatore is None else generatore
+    maligno = generatore.random(n_righe) < FRAZIONE_MALIGNI
+
+    colonne = {
+        "Blood Pressure": generatore.integers(90, 140, n_righe).astype(np.float64),
+        "Heart Rate": generatore.integers(60, 100, n_righe).astype(np.float64),
+        "Sample code number": generatore.integers(60_000, 13_500_000, n_righe).astype(np.float64),
+        "classtype_v1": np.where(maligno, 4.0, 2.0),
+    }
+    media, deviazione = np.where(maligno, 6.5, 2.0), np.where(maligno, 2.5, 1.2)
+    for colonna in FEATURE_CITOLOGICHE:
+        valori = np.rint(generatore.normal(media, deviazione))
+        colonne[colonna] = np.clip(valori, 1, 10)
+
+    for colonna in COLONNE_FUORI_SCALA:
+        fuori_scala = generatore.random(n_righe) < rumore / 5
+        colonne[colonna][fuori_scala] *= 10
+
+    # valori mancanti ovunque tranne nelle colonne che nel file originale sono sempre piene
+    for colonna in FEATURE_CITOLOGICHE + ["Sample code number", "classtype_v1"]:
+        colonne[colonna][generatore.random(n_righe) < rumore] = np.nan
+
+    if duplicati > 0 and n_righe > 1:
+        copie = generatore.choice(n_righe, size=int(duplicati * n_righe), replace=False)
+        originali = generatore.integers(0, n_righe, len(copie))
+        for valori in colonne.values():
+            valori[copie] = valori[originali]
+
+    # le colonne di testo si convertono alla fine, così i duplicati restano identici anche nel testo
+    for colonna in COLONNE_TESTO:
+        valori = colonne[colonna]
+        mancanti = np.isnan(valori)
+        interi = np.where(mancanti, 0, valori).astype(np.int64)
+        virgola = generatore.random(n_righe) < rumore
+        testo = np.where(virgola, _TESTO_VIRGOLA[interi], _TESTO_PUNTO[interi])
+        testo[mancanti] = None
+        colonne[colonna] = testo
+
+    df = pd.DataFrame({colonna: colonne[colonna] for colonna in COLONNE})
+    df["Blood Pressure"] = df["Blood Pressure"].astype(np.int64)
+    df["Heart Rate"] = df["Heart Rate"].astype(np.int64)
+    return df
+
+
+def scrivi_dataset(percorso: str, n_righe: int, duplicati: float = 0.1, rumore: float = 0.05, seme: int = 0,
+                   righe_per_blocco: int = RIGHE_PER_BLOCCO) -> str:
+    """
+    Scrive in CSV un dataset sintetico di n_righe righe, un blocco alla volta (la memoria usata
+    non dipende da n_righe). I duplicati sono copie di righe dello stesso blocco.
+
+    Ritorna:
+    percorso del file scritto
+    """
+    semi = np.random.SeedSequence(seme).spawn(-(-n_righe // righe_per_blocco))
+    for blocco, seme_blocco in enumerate(semi):
+        righe = min(righe_per_blocco, n_righe - blocco * righe_per_blocco)
+        df = genera_blocco(righe, duplicati, rumore, np.random.default_rng(seme_blocco))
+        df.to_csv(percorso, mode="w" if blocco == 0 else "a", header=blocco == 0, index=False)
+    return percorso
@@ -0,0 +1,319 @@
+"""
+Benchmark della pipeline completa su dataset sintetici con lo schema di Data/version_1.csv.
+
+Per ogni dimensione richiesta viene generato (una volta sola, poi riusato) un file CSV con
+benchmarks.dati_sintetici e vengono cronometrate le fasi:
+
+    caricamento    DatasetProcessor.load_data
+    pulizia        DataCleaner.clean (pulizia fusa, come load_and_clean_data)
+    imputazione    MissingValueHandler.clean
+    scaling        FeatureScaler.scale_features
+    train          ClassificatoreKNN.train sull'80% delle righe
+    predict_batch  ClassificatoreKNN.predict_batch su al massimo --query righe del restante 20%
+    holdout, k_fold, leave_one_out   le strategie di Evaluation
+    excel          save_results_to_excel (in una cartella temporanea)
+
+Le strategie di Evaluation hanno costo quadratico: oltre --limite-valutazione righe vengono
+saltate (e registrate come tali). Ogni fase viene ripetuta --ripetizioni volte; i risultati
+(tempi, minimo, mediana, righe al secondo, versioni di Python e delle librerie) sono salvati in
+JSON. Con --confronta si indica un file di risultati precedente: le fasi più lente di
+--tolleranza volte vengono segnalate e il comando termina con codice 1.
+
+Con --speedup viene misurato anche il throughput di predict_batch rispetto al percorso originale
+a una riga alla volta (speedup_predict_batch), per 700 e 5000 campioni di training.
+
+Con --recall viene misurata la recall dell'indice IVF rispetto alla ricerca esaustiva
+(ClassificatoreKNN.report_recall) sulla dimensione più grande tra quelle richieste.
+
+Uso: python -m benchmarks.esegui [--righe 1000 10000 100000] [--duplicati 0.1] [--rumore 0.05]
+     [--seme 0] [--ripetizioni 3] [--output results/benchmark.json] [--confronta riferimento.json]
+     [--speedup] [--recall]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.dati_sintetici import scrivi_dataset
+from models import ClassificatoreKNN
+from preprocessing.data_cleaner import DataCleaner, MissingValueHandler
+from preprocessing.importdata import DatasetProcessor
+from preprocessing.normalizzazione import FeatureScaler
+from validation.evaluation import Evaluation
+
+FASI = ("caricamento", "pulizia", "imputazione", "scaling", "train", "predict_batch",
+        "holdout", "k_fold", "leave_one_out", "excel")
+METRICHE = ["Accuracy Rate", "Error Rate", "Sensitivity", "Specificity", "Geometric Mean", "AUC"]
+CARTELLA_DATI = os.path.join(".cache", "benchmark")
+
+
+def misura(funzione, ripetizioni: int) -> tuple:
+    """
+    Esegue funzione ripetizioni volte senza stampare nulla.
+
+    Ritorna:
+    tupla (tempi in secondi, risultato dell'ultima esecuzione)
+    """
+    tempi = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(ripetizioni):
+            inizio = time.perf_counter()
+            risultato = funzione()
+            tempi.append(time.perf_counter() - inizio)
+    return tempi, risultato
+
+
+def ambiente() -> dict:
+    """Versioni e macchina, per confrontare solo risultati ottenuti nelle stesse condizioni."""
+    return {"python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "sistema": platform.platform(), "processore": platform.machine(), "cpu": os.cpu_count()}
+
+
+def file_dataset(n_righe: int, duplicati: float, rumore: float, seme: int, cartella: str = CARTELLA_DATI) -> str:
+    """Percorso del dataset sintetico con questi parametri, generato solo se non esiste già."""
+    os.makedirs(cartella, exist_ok=True)
+    percorso = os.path.join(cartella, f"sintetico_{n_righe}_{duplicati}_{rumore}_{seme}.csv")
+    if not os.path.exists(percorso):
+        temporaneo = percorso + ".tmp"
+        scrivi_dataset(temporaneo, n_righe, duplicati, rumore, seme)
+        os.replace(temporaneo, percorso)  # un file interrotto a metà non viene mai riusato
+    return percorso
+
+
+def benchmark_dimensione(n_righe: int, duplicati: float = 0.1, rumore: float = 0.05, seme: int = 0,
+                         ripetizioni: int = 3, k: int = 5, query: int = 2000, limite_valutazione: int = 20_000,
+                         cartella: str = CARTELLA_DATI) -> list:
+    """
+    Cronometra tutte le fasi su un dataset sintetico di n_righe righe.
+
+    Ritorna:
+    lista di dizionari, uno per fase, con tempi, minimo, mediana e righe al secondo
+    (oppure il motivo per cui la fase è stata saltata)
+    """
+    percorso = file_dataset(n_righe, duplicati, rumore, seme, cartella)
+    risultati = []
+
+    def registra(fase, tempi, righe_elaborate):
+        minimo = min(tempi)
+        risultati.append({"righe": n_righe, "fase": fase, "ripetizioni": len(tempi), "tempi": tempi,
+                          "minimo": minimo, "mediana": statistics.median(tempi), "righe_elaborate": righe_elaborate,
+                          "righe_al_secondo": righe_elaborate / minimo if minimo > 0 else None})
+
+    def salta(fase, motivo):
+        risultati.append({"righe": n_righe, "fase": fase, "saltata": motivo})
+
+    tempi, grezzo = misura(lambda: DatasetProcessor(percorso).load_data(), ripetizioni)
+    registra("caricamento", tempi, len(grezzo))
+    tempi, pulito = misura(lambda: DataCleaner("classtype_v1", fusa=True).clean(grezzo), ripetizioni)
+    registra("pulizia", tempi, len(grezzo))
+    tempi, riempito = misura(lambda: MissingValueHandler("mean").clean(pulito), ripetizioni)
+    registra("imputazione", tempi, len(pulito))
+    tempi, scalato = misura(lambda: FeatureScaler().scale_features(riempito, "normalize"), ripetizioni)
+    registra("scaling", tempi, len(riempito))
+
+    features, target = scalato.drop(columns=["classtype_v1"]), scalato["classtype_v1"]
+    ordine = np.random.default_rng(seme).permutation(len(features))
+    n_train = int(0.8 * len(features))
+    train, test = ordine[:n_train], ordine[n_train:n_train + query]
+
+    def addestra():
+        modello = ClassificatoreKNN(k, seme=seme)
+        modello.train(features.iloc[train], target.iloc[train])
+        return modello
+
+    tempi, modello = misura(addestra, ripetizioni)
+    registra("train", tempi, len(train))
+    tempi, previsioni = misura(lambda: modello.predict_batch(features.iloc[test]), ripetizioni)
+    registra("predict_batch", tempi, len(test))
+
+    # metriche e predizioni per l'export in Excel: quelle dell'holdout se eseguito
+    metriche = {"Accuracy Rate": float((previsioni.to_numpy() == target.iloc[test].to_numpy()).mean())}
+    y_test, y_pred = target.iloc[test], previsioni.to_numpy()
+
+    if len(features) > limite_valutazione:
+        for fase in ("holdout", "k_fold", "leave_one_out"):
+            salta(fase, f"{len(features)} righe pulite oltre il limite di valutazione ({limite_valutazione})")
+    else:
+        def valuta(strategia):
+            np.random.seed(seme)
+            evaluation = Evaluation(features, target, k_folds=5, metriche_scelte=METRICHE, k=k)
+            if strategia == "holdout":
+                return evaluation.valutazione_holdout(train_size=0.8)
+            if strategia == "k_fold":
+                return evaluation.valutazione_k_fold()
+            return evaluation.valutazione_leave_one_out()
+
+        for fase in ("holdout", "k_fold", "leave_one_out"):
+            tempi, esito = misura(lambda: valuta(fase), ripetizioni)
+            registra(fase, tempi, len(features))
+            if fase == "holdout":
+                metriche, y_pred, y_test = esito
+
+    from save_results_to_excel import save_results_to_excel  # importa matplotlib e openpyxl
+
+    with tempfile.TemporaryDirectory() as cartella_excel:
+        tempi, _ = misura(lambda: save_results_to_excel(metriche, pd.Series(y_test), y_pred, results_dir=cartella_excel),
+                          ripetizioni)
+    registra("excel", tempi, len(y_pred))
+    return risultati
+
+
+def speedup_predict_batch(n_training: int, n_query: int = 10_000, righe_originale: int = 50, k: int = 5,
+                          n_feature: int = 9, seme: int = 0, ripetizioni: int = 3) -> dict:
+    """
+    Throughput di predict_batch rispetto al percorso originale, che classificava una riga alla
+    volta con pandas (Euclidian_distance su tutto il training, nsmallest, value_counts e pareggi). Le
+    feature sono punteggi interi da 1 a 10 normalizzati, come version_1.csv dopo lo scaling; il
+    percorso originale viene cronometrato solo su righe_originale query.
+
+    Ritorna:
+    dict con secondi per query dei due percorsi e speedup
+    """
+    rng = np.random.default_rng(seme)
+    features = pd.DataFrame((rng.integers(1, 11, (n_training, n_feature)) - 1) / 9)
+    labels = pd.Series(rng.choice([2, 4], n_training))
+    query = pd.DataFrame((rng.integers(1, 11, (n_query, n_feature)) - 1) / 9)
+    modello = ClassificatoreKNN(k, seme=seme)
+    modello.train(features, labels)
+
+    def originale(riga):  # ClassificatoreKNN.predict prima del motore in batch
+        conteggi = modello.labels.loc[modello.Euclidian_distance(riga).nsmallest(k).index].value_counts()
+        if (conteggi == conteggi.max()).sum() > 1:
+            return int(random.choice(conteggi[conteggi == conteggi.max()].index.tolist()))
+        return int(conteggi.idxmax())
+
+    tempi_batch, _ = misura(lambda: modello.predict_batch(query), ripetizioni)
+    tempi_originale, _ = misura(lambda: query.iloc[:righe_originale].apply(originale, axis=1), ripetizioni)
+    batch = min(tempi_batch) / n_query
+    per_riga = min(tempi_originale) / righe_originale
+    return {"righe_training": n_training, "secondi_per_query": batch, "secondi_per_query_originale": per_riga,
+            "speedup": per_riga / batch}
+
+
+def recall_ivf(n_training: int, n_query: int = 500, k: int = 5, n_feature: int = 9, n_probe: int = 8,
+               seme: int = 0) -> dict:
+    """
+    Recall e speedup dell'indice IVF rispetto alla ricerca esaustiva (ClassificatoreKNN.report_recall),
+    su feature come quelle di speedup_predict_batch.
+
+    Ritorna:
+    dict di report_recall con il numero di campioni di training
+    """
+    rng = np.random.default_rng(seme)
+    features = pd.DataFrame((rng.integers(1, 11, (n_training, n_feature)) - 1) / 9)
+    labels = pd.Series(rng.choice([2, 4], n_training))
+    query = pd.DataFrame((rng.integers(1, 11, (n_query, n_feature)) - 1) / 9)
+    modello = ClassificatoreKNN(k, algoritmo="ivf", n_probe=n_probe, seme=seme)
+    modello.train(features, labels)
+    return dict(modello.report_recall(query, n_campioni=n_query, seme=seme), righe_training=n_training)
+
+
+def esegui_benchmark(righe: list, duplicati: float = 0.1, rumore: float = 0.05, seme: int = 0,
+                     ripetizioni: int = 3, **opzioni) -> dict:
+    """Esegue il benchmark per tutte le dimensioni e restituisce il report completo."""
+    report = {"ambiente": ambiente(),
+              "parametri": {"righe": list(righe), "duplicati": duplicati, "rumore": rumore, "seme": seme,
+                            "ripetizioni": ripetizioni, **opzioni},
+              "risultati": []}
+    for n_righe in righe:
+        risultati = benchmark_dimensione(n_righe, duplicati, rumore, seme, ripetizioni, **opzioni)
+        report["risultati"].extend(risultati)
+        for risultato in risultati:
+            if "saltata" in risultato:
+                print(f"{n_righe:>10} {risultato['fase']:<14} saltata")
+            else:
+                print(f"{n_righe:>10} {risultato['fase']:<14} {risultato['minimo']:10.4f} s "
+                      f"{risultato['righe_al_secondo']:14.0f} righe/s")
+    return report
+
+
+def confronta(report: dict, riferimento: dict, tolleranza: float = 1.25) -> list:
+    """
+    Confronta il tempo minimo di ogni fase con quello di un report precedente.
+
+    Ritorna:
+    lista di dizionari (righe, fase, minimo, riferimento, rapporto) per le fasi più lente di
+    tolleranza volte
+    """
+    precedenti = {(r["righe"], r["fase"]): r["minimo"] for r in riferimento["risultati"] if "minimo" in r}
+    regressioni = []
+    for risultato in report["risultati"]:
+        chiave = (risultato["righe"], risultato["fase"])
+        if "minimo" not in risultato or not precedenti.get(chiave):
+            continue
+        rapporto = risultato["minimo"] / precedenti[chiave]
+        if rapporto > tolleranza:
+            regressioni.append({"righe": chiave[0], "fase": chiave[1], "minimo": risultato["minimo"],
+                                "riferimento": precedenti[chiave], "rapporto": rapporto})
+    return regressioni
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark della pipeline su dataset sintetici")
+    parser.add_argument("--righe", type=int, nargs="+", default=[1000, 10_000, 100_000],
+                        help="dimensioni dei dataset generati (da 10^3 a 10^7)")
+    parser.add_argument("--duplicati", type=float, default=0.1, help="frazione di righe duplicate")
+    parser.add_argument("--rumore", type=float, default=0.05, help="frazione di valori mancanti o sporchi")
+    parser.add_argument("--seme", type=int, default=0)
+    parser.add_argument("--ripetizioni", type=int, default=3)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--query", type=int, default=2000, help="righe classificate nella fase predict_batch")
+    parser.add_argument("--limite-valutazione", type=int, default=20_000,
+                        help="righe oltre le quali le strategie di Evaluation vengono saltate")
+    parser.add_argument("--output", default=os.path.join("results", "benchmark.json"))
+    parser.add_argument("--confronta", help="report JSON di riferimento per cercare regressioni")
+    parser.add_argument("--tolleranza", type=float, default=1.25,
+                        help="rapporto tra i tempi oltre il quale una fase è una regressione")
+    parser.add_argument("--speedup", action="store_true",
+                        help="misura anche predict_batch rispetto al percorso originale a una riga alla volta")
+    parser.add_argument("--recall", action="store_true",
+                        help="misura anche la recall dell'indice IVF rispetto alla ricerca esaustiva")
+    argomenti = parser.parse_args(argv)
+
+    report = esegui_benchmark(argomenti.righe, argomenti.duplicati, argomenti.rumore, argomenti.seme,
+                              argomenti.ripetizioni, k=argomenti.k, query=argomenti.query,
+                              limite_valutazione=argomenti.limite_valutazione)
+    if argomenti.speedup:
+        report["speedup_predict_batch"] = [speedup_predict_batch(n, k=argomenti.k, seme=argomenti.seme,
+                                                                 ripetizioni=argomenti.ripetizioni)
+                                           for n in (700, 5000)]
+        for misura_speedup in report["speedup_predict_batch"]:
+            print(f"predict_batch con {misura_speedup['righe_training']} campioni di training: "
+                  f"{misura_speedup['speedup']:.0f}x rispetto al percorso a una riga alla volta")
+    if argomenti.recall:
+        misura_recall = recall_ivf(max(argomenti.righe), k=argomenti.k, seme=argomenti.seme)
+        report["recall_ivf"] = misura_recall
+        print(f"IVF con {misura_recall['righe_training']} campioni di training: recall@{misura_recall['k']} "
+              f"{misura_recall['recall']:.3f} su {misura_recall['campioni']} query "
+              f"(speedup {misura_recall['speedup']:.1f}x rispetto alla ricerca esaustiva)")
+    if os.path.dirname(argomenti.output):
+        os.makedirs(os.path.dirname(argomenti.output), exist_ok=True)
+    with open(argomenti.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    print(f"\nRisultati salvati in {argomenti.output}")
+
+    if argomenti.confronta:
+        with open(argomenti.confronta, encoding="utf-8") as file:
+            regressioni = confronta(report, json.load(file), argomenti.tolleranza)
+        for regressione in regressioni:
+            print(f"REGRESSIONE {regressione['righe']} righe, {regressione['fase']}: {regressione['minimo']:.4f} s "
+                  f"contro {regressione['riferimento']:.4f} s ({regressione['rapporto']:.2f}x)")
+        if regressioni:
+            return 1
+        print("Nessuna regressione rispetto al riferimento.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,72 @@
+"""
+Tempo di importazione dei moduli del progetto, misurato in processi Python nuovi (senza moduli
+già in memoria), e librerie pesanti caricate da ciascuno (matplotlib, openpyxl).
+
+Serve a verificare che i moduli usati dagli script brevi (score.py, server.py, controlli di
+salute del container) non importino le librerie di grafici ed Excel finché non servono.
+
+Uso: python -m benchmarks.importazioni [--moduli main score ...] [--ripetizioni 5] [--output risultati.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+MODULI = ["main", "score", "server", "batch", "preprocessing", "preprocessing.importdata",
+          "validation.evaluation", "validation.metriche", "save_results_to_excel"]
+LIBRERIE_PESANTI = ["matplotlib", "openpyxl"]
+
+# eseguito in un processo nuovo: stampa il tempo di importazione e le librerie pesanti caricate
+_MISURA = """
+import json, sys, time
+inizio = time.perf_counter()
+import {modulo}
+durata = time.perf_counter() - inizio
+print(json.dumps({{"tempo": durata, "librerie": [l for l in {librerie!r} if l in sys.modules]}}))
+"""
+
+
+def tempo_importazione(modulo: str, ripetizioni: int = 5) -> dict:
+    """
+    Importa modulo in ripetizioni processi nuovi.
+
+    Ritorna:
+    dict con tempi (secondi), mediana, minimo e librerie pesanti caricate dall'importazione
+    """
+    radice = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    ambiente = dict(os.environ, PYTHONPATH=radice + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    tempi, librerie = [], []
+    for _ in range(ripetizioni):
+        uscita = subprocess.run([sys.executable, "-c", _MISURA.format(modulo=modulo, librerie=LIBRERIE_PESANTI)],
+                                capture_output=True, text=True, check=True, cwd=radice, env=ambiente)
+        misura = json.loads(uscita.stdout.strip().splitlines()[-1])
+        tempi.append(misura["tempo"])
+        librerie = misura["librerie"]
+    return {"modulo": modulo, "tempi": tempi, "mediana": statistics.median(tempi), "minimo": min(tempi),
+            "librerie_pesanti": librerie}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tempo di importazione dei moduli del progetto")
+    parser.add_argument("--moduli", nargs="+", default=MODULI)
+    parser.add_argument("--ripetizioni", type=int, default=5)
+    parser.add_argument("--output", help="file JSON in cui salvare i risultati")
+    argomenti = parser.parse_args(argv)
+
+    risultati = []
+    for modulo in argomenti.moduli:
+        risultato = tempo_importazione(modulo, argomenti.ripetizioni)
+        risultati.append(risultato)
+        print(f"{modulo:<28} {risultato['mediana'] * 1000:8.1f} ms  {', '.join(risultato['librerie_pesanti']) or '-'}")
+
+    if argomenti.output:
+        with open(argomenti.output, "w", encoding="utf-8") as file:
+            json.dump(risultati, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
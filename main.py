@@ -1,12 +1,15 @@
+import argparse
 import pandas as pd
 import os
+from preprocessing.cache import CARTELLA_CACHE
 from preprocessing.importdata import DatasetProcessor, load_and_prepare_data
 from preprocessing.data_cleaner import DataCleaner, MissingValueHandler, choose_missing_value_method
 from preprocessing.normalizzazione import FeatureScaler, user_choose_scaling_method
 from validation.evaluation import Evaluation, evaluate_model
-from validation.visualizzazione import plot_confusion_matrix, plot_metriche_bar, plot_roc_curve
 from models import ClassificatoreKNN
+from models.artefatto import addestra_e_salva
 from save_results_to_excel import save_results_to_excel
+from profilazione import attiva_da_ambiente, disattiva
 
 def get_user_inputs():
     """Chiede tutti gli input all'utente in una singola funzione."""
@@ -35,16 +38,35 @@ def get_user_inputs():
     return file_path, strategy, param, k, metrics
 
 
-def main():
+def main(argv=None):
     """Funzione principale del programma."""
+    parser = argparse.ArgumentParser(description="Validazione interattiva del classificatore KNN")
+    parser.add_argument("--salva", metavar="PERCORSO",
+                        help="dopo la validazione addestra il modello su tutto il dataset e lo salva "
+                             "(con il preprocessing) in PERCORSO, ad esempio results/modello.knn")
+    parser.add_argument("--cache", nargs="?", const=CARTELLA_CACHE, metavar="CARTELLA",
+                        help="salva il dataset pre-processato in una cache su disco (default: "
+                             f"{CARTELLA_CACHE}) e lo riusa nelle esecuzioni successive")
+    argomenti = parser.parse_args(argv)
+
     file_path, strategy, param, k, metrics = get_user_inputs()
+    profilatore = attiva_da_ambiente()  # PROFILAZIONE=1 (o cprofile) misura i tempi di ogni fase
 
-    features, target = load_and_prepare_data(file_path)
-    if features is None or target is None:
-        return
+    try:
+        features, target, trasformazioni = load_and_prepare_data(file_path, cache=argomenti.cache or False,
+                                                                 restituisci_trasformazioni=True)
+        if features is None or target is None:
+            return
 
-    y_test, y_pred, metrics_result = evaluate_model(features, target, strategy, param, k, metrics)
-    save_results_to_excel(metrics_result, y_test, y_pred)
+        y_test, y_pred, metrics_result = evaluate_model(features, target, strategy, param, k, metrics)
+        save_results_to_excel(metrics_result, y_test, y_pred)
+        if argomenti.salva:
+            modello = addestra_e_salva(features, target, argomenti.salva, trasformazioni, k)
+            print(f"\nModello addestrato su {len(modello.labels)} campioni salvato in {argomenti.salva}")
+    finally:
+        if profilatore is not None:
+            disattiva()
+            print(f"\nProfilazione salvata in {profilatore.salva(os.path.join('results', 'profilazione.json'))}")
   
 if __name__ == "__main__":
     main()
@@ -0,0 +1,168 @@
+## salvataggio e caricamento di un ClassificatoreKNN addestrato in un unico file binario
+
+"""
+Formato del file (versione 1):
+
+- intestazione fissa: 8 byte di firma (FIRMA), versione (uint32) e lunghezza (uint64) di
+  un'intestazione JSON con parametri del modello, nomi delle colonne, parametri del
+  preprocessing e, per ogni array, posizione nel file, dtype e forma
+- intestazione JSON
+- gli array (matrice di training nel formato del modello, etichette, classi, eventuali
+  griglia del formato "uint8" e indice di ricerca), ognuno
+  allineato a ALLINEAMENTO byte
+
+In caricamento il file viene mappato in memoria e gli array sono viste in sola lettura sulla
+mappa: non c'è parsing né copia, e più processi che caricano lo stesso file condividono le
+stesse pagine fisiche (la cache del sistema operativo).
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+from models.ivf import IndiceIVF
+from models.kd_tree import KDTree
+
+FIRMA = b"KNNMRS\x00\x00"
+VERSIONE = 1
+ALLINEAMENTO = 64
+
+_INTESTAZIONE = struct.Struct("<8sIQ")  # firma, versione, lunghezza dell'intestazione JSON
+
+
+def _allinea(posizione: int) -> int:
+    return -(-posizione // ALLINEAMENTO) * ALLINEAMENTO
+
+
+def salva_modello(modello, percorso: str, preprocessing: dict = None):
+    """
+    Salva un ClassificatoreKNN addestrato.
+
+    INPUT:
+    modello (ClassificatoreKNN) modello addestrato
+    percorso (str) file di destinazione
+    preprocessing (dict) opzionale: trasformazioni già calcolate da salvare con il modello,
+    ad esempio {"imputazione": MissingValueHandler, "scaling": FeatureScaler}
+    """
+    if modello._X is None:
+        raise ValueError("Il modello non è addestrato! Importante usare fit prima di salvarlo")
+
+    array = {"X": modello._X, "y": modello._y, "classi": modello._classi, "codici": modello._codici}
+    if pd.api.types.is_integer_dtype(modello.features.index):
+        array["righe"] = modello.features.index.to_numpy()
+    if modello._griglia is not None:
+        array["griglia.offset"], array["griglia.passo"] = modello._griglia
+    if modello._indice is not None:
+        array.update({f"indice.{nome}": valori for nome, valori in modello._indice.array().items()})
+    array = {nome: np.ascontiguousarray(valori) for nome, valori in array.items()}
+    for nome, valori in array.items():
+        if valori.dtype.hasobject:
+            raise TypeError(f"L'array '{nome}' non è numerico e non può essere salvato")
+
+    preprocessing = preprocessing if preprocessing is not None else modello.preprocessing
+    intestazione = {
+        "parametri": {"k": modello.k, "algoritmo": modello.algoritmo, "leaf_size": modello.leaf_size,
+                      "seme": modello.seme, "n_liste": modello.n_liste, "n_probe": modello.n_probe,
+                      "formato": modello.formato, "metrica": modello.metrica, "p": modello.p},
+        "colonne": modello.features.columns.tolist(),
+        "target": modello.labels.name,
+        "preprocessing": {nome: {"tipo": type(oggetto).__name__, "parametri": oggetto.parametri()}
+                          for nome, oggetto in preprocessing.items()},
+        "array": {},
+    }
+
+    # le posizioni degli array dipendono dalla lunghezza dell'intestazione, che a sua volta contiene
+    # le posizioni: le calcolo con un margine e ripeto finché la lunghezza non si stabilizza
+    lunghezza = 0
+    while True:
+        posizione = _allinea(_INTESTAZIONE.size + lunghezza)
+        for nome, valori in array.items():
+            intestazione["array"][nome] = {"offset": posizione, "dtype": valori.dtype.str, "forma": list(valori.shape)}
+            posizione = _allinea(posizione + valori.nbytes)
+        testo = json.dumps(intestazione).encode("utf-8")
+        if len(testo) <= lunghezza:
+            break
+        lunghezza = len(testo) + 64
+
+    with open(percorso, "wb") as file:
+        file.write(_INTESTAZIONE.pack(FIRMA, VERSIONE, lunghezza))
+        file.write(testo.ljust(lunghezza))
+        for nome, valori in array.items():
+            file.seek(intestazione["array"][nome]["offset"])
+            file.write(valori.tobytes())
+
+
+def addestra_e_salva(features, target, percorso: str, preprocessing: dict = None, k: int = 5, **parametri):
+    """
+    Addestra un ClassificatoreKNN su tutto il dataset e lo salva in percorso con le trasformazioni
+    di preprocessing calcolate (vedi preprocessing.importdata.prepare_features), pronto per
+    score.py e server.py. Le cartelle mancanti del percorso vengono create.
+
+    INPUT:
+    features, target dataset già pre-processato
+    percorso (str) file di destinazione
+    preprocessing (dict) opzionale: {"imputazione": MissingValueHandler, "scaling": FeatureScaler}
+    k, parametri: parametri del ClassificatoreKNN (algoritmo, metrica, p, formato, ...)
+
+    OUTPUT:
+    il ClassificatoreKNN addestrato
+    """
+    from models.k_nearest_neighbor import ClassificatoreKNN
+
+    modello = ClassificatoreKNN(k, **parametri)
+    modello.train(features, target)
+    if os.path.dirname(percorso):
+        os.makedirs(os.path.dirname(percorso), exist_ok=True)
+    modello.salva(percorso, preprocessing)
+    return modello
+
+
+def carica_modello(percorso: str):
+    """
+    Carica un ClassificatoreKNN salvato con salva_modello mappando il file in memoria.
+    Le trasformazioni di preprocessing salvate sono in modello.preprocessing.
+    """
+    from models.k_nearest_neighbor import ClassificatoreKNN
+    from preprocessing.data_cleaner import MissingValueHandler
+    from preprocessing.normalizzazione import FeatureScaler
+
+    with open(percorso, "rb") as file:
+        firma, versione, lunghezza = _INTESTAZIONE.unpack(file.read(_INTESTAZIONE.size))
+        if firma != FIRMA:
+            raise ValueError(f"{percorso} non è un modello knn salvato")
+        if versione != VERSIONE:
+            raise ValueError(f"Versione del modello non supportata: {versione} (attesa {VERSIONE})")
+        intestazione = json.loads(file.read(lunghezza))
+
+    mappa = np.memmap(percorso, dtype=np.uint8, mode="r")
+    array = {}
+    for nome, descrizione in intestazione["array"].items():
+        dtype, forma = np.dtype(descrizione["dtype"]), tuple(descrizione["forma"])
+        if np.prod(forma) == 0:
+            array[nome] = np.empty(forma, dtype=dtype)
+        else:
+            array[nome] = np.ndarray(forma, dtype=dtype, buffer=mappa, offset=descrizione["offset"])
+
+    parametri = intestazione["parametri"]
+    modello = ClassificatoreKNN(**parametri)
+    modello._X, modello._y = array["X"], array["y"]
+    modello._classi, modello._codici = array["classi"], array["codici"]
+    if "griglia.offset" in array:
+        modello._griglia = (array["griglia.offset"], array["griglia.passo"])
+    righe = pd.Index(array["righe"]) if "righe" in array else pd.RangeIndex(len(modello._X))
+    modello.features = pd.DataFrame(modello._X, index=righe, columns=intestazione["colonne"], copy=False)
+    modello.labels = pd.Series(modello._y, index=righe, name=intestazione["target"], copy=False)
+
+    indice = {nome.split(".", 1)[1]: valori for nome, valori in array.items() if nome.startswith("indice.")}
+    if parametri["algoritmo"] == "kd_tree":
+        modello._indice = KDTree.da_array(indice, parametri["leaf_size"], modello._metrica)
+    elif parametri["algoritmo"] == "ivf":
+        modello._indice = IndiceIVF.da_array(indice, parametri["n_probe"], modello._metrica)
+
+    classi = {"MissingValueHandler": MissingValueHandler, "FeatureScaler": FeatureScaler}
+    modello.preprocessing = {nome: classi[voce["tipo"]].da_parametri(voce["parametri"])
+                             for nome, voce in intestazione["preprocessing"].items()}
+    return modello
@@ -0,0 +1,112 @@
+## cache dei vicini più prossimi di ogni campione, condivisa tra fold, ripetizioni e strategie
+
+"""
+La matrice delle feature non cambia tra i fold della validazione: CacheVicini calcola una sola
+volta, a blocchi di righe, gli m campioni più vicini di ogni campione del dataset (ordinati per
+distanza e, a parità di distanza, per posizione, come k_minimi). La ricerca dei k vicini di un
+fold diventa una lettura della cache: delle liste dei campioni di test si tengono solo i
+campioni di training del fold e si prendono i primi k.
+
+La lettura dà esattamente i vicini della ricerca esaustiva quando la k-esima distanza trovata è
+minore dell'ultima distanza della lista: tutti i campioni che potrebbero entrare tra i k vicini
+(pareggi compresi) sono allora nella lista. Le righe per cui non vale (troppi campioni della
+lista fuori dal training, o pareggi che continuano oltre la lista) vengono cercate normalmente
+con il modello del fold, quindi i risultati coincidono sempre con quelli senza cache.
+"""
+
+import numpy as np
+
+from models.distanze import Metrica
+
+# numero minimo di vicini conservati per ogni campione (vedi numero_vicini)
+VICINI_PREDEFINITI = 32
+
+
+def numero_vicini(k: int) -> int:
+    """
+    Vicini da conservare per cercarne k nei fold: con l'80% dei campioni in training (K-Fold a 5
+    fold, Holdout 0.8) una lista di max(32, 4k) campioni ne contiene quasi sempre almeno k.
+    """
+    return max(VICINI_PREDEFINITI, 4 * k)
+
+
+class CacheVicini:
+    def __init__(self, X: np.ndarray, m: int = VICINI_PREDEFINITI, metrica: str = "euclidea", p: float = 2):
+        """
+        Calcola gli m vicini più prossimi di ogni riga di X (lei stessa compresa) con la metrica
+        indicata (vedi models.distanze.Metrica).
+
+        INPUT:
+        X (np.ndarray) matrice n x n_feature senza valori mancanti
+        m (int) vicini conservati per ogni riga (al massimo n)
+        """
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if np.isnan(X).any():
+            raise ValueError("La cache dei vicini richiede feature senza valori mancanti")
+        self.X = X
+        self.metrica = metrica
+        self.p = p
+        self._metrica = Metrica(metrica, p)
+        self.m = min(m, len(X))
+        self.interrogate = 0  # righe cercate nella cache
+        self.ricalcolate = 0  # righe per cui la cache non bastava, cercate con il modello del fold
+
+        # liste dei vicini calcolate a blocchi di righe (n x m, distanze senza radice come Metrica.distanze)
+        preparata = self._metrica.prepara(X)
+        self.distanze, self.indici = self._metrica.cerca(preparata, preparata, self.m)
+
+    def compatibile(self, X: np.ndarray, metrica: str, p: float) -> bool:
+        """True se la cache è stata calcolata su questa matrice con questa metrica."""
+        return (self.metrica == metrica and (metrica != "minkowski" or self.p == p)
+                and X.shape == self.X.shape and (X is self.X or np.array_equal(X, self.X)))
+
+    def vicini(self, righe: np.ndarray, train_indices: np.ndarray, k: int, modello, escludi: bool = False) -> tuple:
+        """
+        Vicini delle righe di X indicate tra i campioni train_indices, come li troverebbe
+        modello._vicini_batch con il modello addestrato su X[train_indices].
+
+        INPUT:
+        righe (np.ndarray) posizioni in X dei punti da classificare
+        train_indices (np.ndarray) posizioni in X dei campioni di training, nell'ordine del modello
+        k (int) numero di vicini
+        modello (ClassificatoreKNN) addestrato su X[train_indices], usato per le righe da ricalcolare
+        escludi (bool) se True ogni riga non può essere vicina di sé stessa (Leave-One-Out
+        con il modello addestrato su tutto il dataset)
+
+        OUTPUT:
+        tupla (distanze, indici) di matrici len(righe) x k, con indici posizionali nel training
+        """
+        righe = np.asarray(righe)
+        k = min(k, len(train_indices) - 1 if escludi else len(train_indices))
+        posizione = np.full(len(self.X), len(self.X), dtype=np.intp)  # n = fuori dal training
+        posizione[train_indices] = np.arange(len(train_indices))
+
+        lista = self.indici[righe]
+        posizioni = posizione[lista]
+        fuori = posizioni == len(self.X)
+        if escludi:
+            fuori |= lista == righe[:, None]
+        distanze = np.where(fuori, np.inf, self.distanze[righe])
+
+        # primi k campioni del training per distanza e, a parità, per posizione nel training
+        ordine = np.lexsort((posizioni, distanze), axis=-1)[:, :k]
+        scelte = np.take_along_axis(distanze, ordine, axis=1)
+        indici = np.take_along_axis(posizioni, ordine, axis=1)
+
+        # esatte: la k-esima distanza è minore dell'ultima della lista (o la lista contiene tutti i campioni)
+        if k == 0:
+            esatte = np.ones(len(righe), dtype=bool)
+        elif self.m == len(self.X):
+            esatte = np.isfinite(scelte[:, -1])
+        else:
+            esatte = scelte[:, -1] < self.distanze[righe, -1]
+        scelte = self._metrica.finale(scelte)
+
+        da_ricalcolare = np.flatnonzero(~esatte)
+        if len(da_ricalcolare):
+            escluse = righe[da_ricalcolare] if escludi else None
+            scelte[da_ricalcolare], indici[da_ricalcolare] = modello._vicini_batch(self.X[righe[da_ricalcolare]],
+                                                                                  escluse, k)
+        self.interrogate += len(righe)
+        self.ricalcolate += len(da_ricalcolare)
+        return scelte, indici
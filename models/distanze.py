@@ -0,0 +1,380 @@
+## kernel di distanza vettorizzati usati dal classificatore knn
+
+"""
+Le funzioni di questo modulo lavorano su matrici NumPy contigue e calcolano in un colpo solo
+le distanze tra un blocco di punti di query e tutti i campioni di training.
+"""
+
+import numpy as np
+
+# numero massimo di elementi delle matrici temporanee (n_query x n_training) allocate per ogni
+# blocco: blocchi piccoli restano in cache e tengono limitata la memoria anche su batch grandi
+ELEMENTI_PER_BLOCCO = 2 ** 16
+# lo stesso limite per il percorso BLAS (vicini_euclidei): il prodotto matriciale rende meglio su
+# blocchi più grandi e sulla matrice n_query x n_training fa meno passate del kernel a feature
+ELEMENTI_PER_BLOCCO_BLAS = 2 ** 19
+_RIGHE_MINIME_BLAS = 16  # con meno righe il prodotto matriciale degenera in prodotti matrice-vettore lenti
+# ricerca della soglia di vicini_euclidei: colonne per gruppo (al massimo) e gruppi per vicino
+# (almeno, se le colonne bastano), perché il k-esimo minimo dei gruppi resti vicino alla k-esima distanza
+_COLONNE_PER_GRUPPO = 32
+_GRUPPI_PER_VICINO = 32
+
+
+def dimensione_blocco(n_training: int, elementi: int = ELEMENTI_PER_BLOCCO) -> int:
+    """
+    Restituisce quante righe di query elaborare per blocco senza superare elementi (di default
+    ELEMENTI_PER_BLOCCO).
+    """
+    return max(1, elementi // max(1, n_training))
+
+
+def distanze_euclidee_quadrate(query: np.ndarray, dati: np.ndarray) -> np.ndarray:
+    """
+    Calcola il quadrato della distanza euclidea tra ogni riga di query e ogni riga di dati.
+    La radice non cambia l'ordinamento dei vicini, quindi viene applicata solo alle distanze
+    selezionate. Il calcolo procede una feature alla volta: ogni coppia (query, campione) riceve
+    sempre la stessa sequenza di operazioni, qualunque sia la composizione del blocco.
+
+    INPUT:
+    query (np.ndarray) matrice n_query x n_feature
+    dati (np.ndarray) matrice n_dati x n_feature
+
+    OUTPUT:
+    np.ndarray matrice n_query x n_dati delle distanze al quadrato
+    """
+    somma = np.zeros((query.shape[0], dati.shape[0]), dtype=np.float64)
+    diff = np.empty_like(somma)
+    for j in range(dati.shape[1]):
+        np.subtract(query[:, j, None], dati[:, j], out=diff)
+        np.square(diff, out=diff)
+        somma += diff
+    return somma
+
+
+def k_minimi(distanze: np.ndarray, k: int) -> np.ndarray:
+    """
+    Seleziona per ogni riga le posizioni delle k distanze più piccole, ordinate per distanza
+    crescente e, a parità di distanza, per posizione crescente (come nsmallest con keep='first').
+    Usa un ordinamento parziale (argpartition) e ricade su un ordinamento stabile solo per le
+    righe che hanno valori pari a cavallo della k-esima posizione.
+
+    INPUT:
+    distanze (np.ndarray) matrice n_query x n_dati
+    k (int) numero di vicini da selezionare (k <= n_dati)
+
+    OUTPUT:
+    np.ndarray matrice n_query x k di indici posizionali
+    """
+    n_dati = distanze.shape[1]
+    if k >= n_dati:
+        return np.argsort(distanze, axis=1, kind="stable")[:, :k]
+
+    indici = np.argpartition(distanze, k - 1, axis=1)[:, :k]
+    selezionate = np.take_along_axis(distanze, indici, axis=1)
+
+    # righe in cui più di k valori sono <= della k-esima distanza: la partizione potrebbe aver
+    # scelto un campione pari con posizione più alta. Per queste righe (frequenti con dati a
+    # griglia come i punteggi 1-10) si ordinano solo i candidati <= soglia, per distanza e
+    # posizione, invece dell'intera riga
+    soglia = selezionate.max(axis=1, keepdims=True)
+    candidati = distanze <= soglia
+    ambigue = np.flatnonzero(candidati.sum(axis=1) > k)
+    if len(ambigue):
+        riga, colonna = np.nonzero(candidati[ambigue])  # candidati per riga, in ordine di posizione
+        valori = distanze[ambigue[riga], colonna]
+        ordine = np.lexsort((colonna, valori, riga))
+        inizio = np.concatenate(([0], np.cumsum(np.bincount(riga, minlength=len(ambigue)))[:-1]))
+        scelte = ordine[inizio[:, None] + np.arange(k)]  # i primi k candidati di ogni riga
+        indici[ambigue] = colonna[scelte]
+        selezionate[ambigue] = valori[scelte]
+
+    ordine = np.lexsort((indici, selezionate), axis=-1)
+    return np.take_along_axis(indici, ordine, axis=1)
+
+
+def norme_quadrate(dati: np.ndarray) -> np.ndarray:
+    """Somma dei quadrati di ogni riga di dati (float64), usata da vicini_euclidei."""
+    dati = np.asarray(dati, dtype=np.float64)
+    return np.einsum("ij,ij->i", dati, dati)
+
+
+def vicini_euclidei(query: np.ndarray, dati: np.ndarray, k: int, norme_query: np.ndarray = None,
+                    norme_dati: np.ndarray = None) -> tuple:
+    """
+    k vicini per distanza euclidea quadrata con il prodotto matriciale (BLAS), con lo stesso
+    risultato, bit per bit, di distanze_euclidee_quadrate seguita da k_minimi.
+
+    Le distanze approssimate |x|^2 - 2 q.x (|q|^2 è costante sulla riga e non cambia l'ordine)
+    differiscono da quelle del kernel a feature, meno |q|^2, al più di
+    margine = 8 (n_feature + 2) eps (|q|^2 + max |x|^2). Ogni vicino esatto, pareggi compresi,
+    ha quindi una distanza approssimata entro 2 * margine da un qualunque valore che abbia almeno
+    k distanze approssimate minori o uguali: si usa il k-esimo tra i minimi di gruppi di colonne,
+    molto più economico di un ordinamento parziale della riga intera. Solo per i
+    campioni sotto questa soglia la distanza viene ricalcolata con la stessa sequenza di
+    operazioni di distanze_euclidee_quadrate, e la scelta per distanza e posizione avviene sui
+    valori esatti.
+
+    INPUT:
+    query (np.ndarray) matrice n_query x n_feature float64 a valori finiti
+    dati (np.ndarray) matrice n_dati x n_feature float64 a valori finiti
+    k (int) numero di vicini (k < n_dati)
+    norme_query, norme_dati (np.ndarray) norme_quadrate di query e dati, se già calcolate
+
+    OUTPUT:
+    tupla (distanze quadrate n_query x k, indici n_query x k)
+    """
+    if norme_query is None:
+        norme_query = norme_quadrate(query)
+    if norme_dati is None:
+        norme_dati = norme_quadrate(dati)
+    n_dati = len(dati)
+    margine = 8 * (dati.shape[1] + 2) * np.finfo(np.float64).eps * (norme_query + norme_dati.max())
+
+    approssimate = (-2 * query) @ dati.T  # moltiplicare per -2 è esatto
+    approssimate += norme_dati
+
+    # la colonna c < n_gruppi * passo appartiene al gruppo c % n_gruppi: il minimo per gruppo è un
+    # minimo elemento per elemento tra righe contigue. Le ultime colonne (meno di passo) non
+    # entrano nei gruppi e vengono confrontate sempre con la soglia
+    passo = max(1, min(_COLONNE_PER_GRUPPO, n_dati // (_GRUPPI_PER_VICINO * k)))
+    n_gruppi = n_dati // passo
+    minimi = np.min(approssimate[:, :n_gruppi * passo].reshape(len(query), passo, n_gruppi), axis=1)
+    soglia = np.partition(minimi, k - 1, axis=1)[:, k - 1] + 2 * margine
+
+    riga, gruppo = np.nonzero(minimi <= soglia[:, None])
+    colonna = (gruppo[:, None] + n_gruppi * np.arange(passo)).ravel()
+    riga = np.repeat(riga, passo)
+    if n_dati > n_gruppi * passo:
+        coda = np.arange(n_gruppi * passo, n_dati)
+        riga = np.concatenate((riga, np.repeat(np.arange(len(query)), len(coda))))
+        colonna = np.concatenate((colonna, np.tile(coda, len(query))))
+    sotto = approssimate.ravel()[riga * n_dati + colonna] <= soglia[riga]
+    riga, colonna = riga[sotto], colonna[sotto]
+
+    esatte = np.zeros(len(riga), dtype=np.float64)
+    diff = np.empty_like(esatte)
+    for j in range(dati.shape[1]):
+        np.subtract(query[riga, j], dati[colonna, j], out=diff)
+        np.square(diff, out=diff)
+        esatte += diff
+
+    # come in k_minimi: per ogni riga i primi k candidati per distanza esatta e posizione
+    ordine = np.lexsort((colonna, esatte, riga))
+    inizio = np.concatenate(([0], np.cumsum(np.bincount(riga, minlength=len(query)))[:-1]))
+    scelte = ordine[inizio[:, None] + np.arange(k)]
+    return esatte[scelte], colonna[scelte]
+
+
+## formato compatto a griglia intera (formato="uint8" del classificatore), usato da Metrica.distanze
+
+# massimo scarto tra il codice di una query e un codice di training (0..255) ammesso dal kernel
+# intero: le query fuori da questo intervallo usano il kernel in virgola mobile
+SCARTO_MASSIMO = 511
+_TOLLERANZA_GRIGLIA = 1e-6
+
+
+def quantizza(dati: np.ndarray) -> tuple:
+    """
+    Rappresenta una matrice i cui valori, colonna per colonna, stanno su una griglia regolare
+    (offset + passo * intero, come le feature 1-10 di version_1.csv anche dopo lo scaling) con
+    codici interi uint8.
+
+    INPUT:
+    dati (np.ndarray) matrice n x n_feature in virgola mobile
+
+    OUTPUT:
+    tupla (codici uint8 n x n_feature, offset, passo) con offset e passo float64 per colonna
+
+    Solleva ValueError se una colonna non sta su una griglia di al massimo 256 valori.
+    """
+    codici = np.empty(dati.shape, dtype=np.uint8)
+    offset = np.zeros(dati.shape[1])
+    passo = np.ones(dati.shape[1])
+    for j in range(dati.shape[1]):
+        valori = np.unique(dati[:, j])
+        if len(valori) == 0:
+            continue
+        offset[j] = valori[0]
+        if len(valori) > 1:
+            passo[j] = np.diff(valori).min()
+        posizioni = (dati[:, j] - offset[j]) / passo[j]
+        interi = np.rint(posizioni)
+        if np.abs(posizioni - interi).max() > _TOLLERANZA_GRIGLIA or interi.max() > 255:
+            raise ValueError(f"La colonna {j} non ha valori su una griglia regolare di al massimo 256 valori: "
+                             "usare formato='float32'")
+        codici[:, j] = interi
+    return codici, offset, passo
+
+
+def codici_griglia(query: np.ndarray, offset: np.ndarray, passo: np.ndarray):
+    """
+    Codici interi (int16) delle righe di query sulla griglia (offset, passo), oppure None se
+    qualche valore non sta sulla griglia o è troppo lontano dall'intervallo dei dati.
+    """
+    posizioni = (query - offset) / passo
+    interi = np.rint(posizioni)
+    if (np.abs(posizioni - interi) > _TOLLERANZA_GRIGLIA).any():  # vale anche per i NaN
+        return None
+    if len(interi) and (interi.min() < 255 - SCARTO_MASSIMO or interi.max() > SCARTO_MASSIMO):
+        return None
+    return interi.astype(np.int16)
+
+
+def dequantizza(codici: np.ndarray, offset, passo) -> np.ndarray:
+    """Valori reali (float64) corrispondenti ai codici della griglia."""
+    return codici * passo + offset
+
+
+METRICHE = ("euclidea", "manhattan", "chebyshev", "minkowski", "coseno")
+
+
+class Metrica:
+    """
+    Metrica di distanza del classificatore knn, usata sia dalla ricerca esaustiva sia dagli
+    indici (KD-tree e IVF).
+
+    - euclidea: radice della somma dei quadrati degli scarti
+    - manhattan: somma dei valori assoluti degli scarti
+    - chebyshev: massimo dei valori assoluti degli scarti
+    - minkowski: (somma |scarto|^p)^(1/p), con p >= 1
+    - coseno: 1 - similarità del coseno. Le righe vengono normalizzate a norma 1 (prepara) e per
+      vettori di norma 1 vale 1 - cos = |u - v|^2 / 2, quindi il calcolo è quello euclideo e
+      funziona anche con gli indici. Un vettore nullo resta nullo: è a distanza 0 dagli altri
+      vettori nulli e 0.5 da tutti gli altri.
+
+    distanze() restituisce una grandezza con lo stesso ordinamento della distanza vera ma più
+    economica (senza radice: la somma dei quadrati per l'euclidea, delle potenze p-esime per
+    Minkowski); finale() la converte nella distanza vera e si applica solo ai k vicini scelti.
+    """
+
+    def __init__(self, nome: str = "euclidea", p: float = 2):
+        if nome not in METRICHE:
+            raise ValueError(f"Metrica non valida: {nome}. Valori ammessi: {METRICHE}")
+        if nome == "minkowski" and not p >= 1:
+            raise ValueError("La metrica di Minkowski richiede p >= 1")
+        self.nome = nome
+        self.p = p
+        # esponente degli scarti nella somma; np.inf per chebyshev, che usa il massimo
+        self.potenza = {"euclidea": 2, "coseno": 2, "manhattan": 1, "chebyshev": np.inf, "minkowski": p}[nome]
+
+    def prepara(self, dati: np.ndarray) -> np.ndarray:
+        """Trasformazione applicata a campioni e query prima della ricerca (la normalizzazione per il coseno)."""
+        if self.nome != "coseno":
+            return dati
+        norme = np.linalg.norm(dati, axis=1, keepdims=True)
+        return dati / np.where(norme > 0, norme, 1)
+
+    def distanze(self, query: np.ndarray, dati: np.ndarray, griglia: tuple = None) -> np.ndarray:
+        """
+        Distanze (senza radice) tra ogni riga di query e ogni riga di dati, una feature alla volta
+        come distanze_euclidee_quadrate. Con griglia=(offset, passo) dati contiene i codici uint8
+        di quantizza: per query sulla griglia si usa un kernel intero, esatto; altrimenti ogni
+        colonna dei campioni viene ricostruita in float64.
+
+        OUTPUT:
+        np.ndarray matrice n_query x n_dati
+        """
+        if griglia is not None and self.potenza in (1, 2, np.inf):
+            codici_query = codici_griglia(query, *griglia)
+            if codici_query is not None:
+                return self._distanze_intere(codici_query, dati, griglia[1])
+
+        somma = np.zeros((query.shape[0], dati.shape[0]), dtype=np.float64)
+        diff = np.empty_like(somma)
+        for j in range(dati.shape[1]):
+            colonna = dati[:, j] if griglia is None else dequantizza(dati[:, j], griglia[0][j], griglia[1][j])
+            np.subtract(query[:, j, None], colonna, out=diff)
+            self._accumula(somma, diff)
+        return somma
+
+    def cerca(self, query: np.ndarray, dati: np.ndarray, k: int, griglia: tuple = None,
+              norme: np.ndarray = None) -> tuple:
+        """
+        Ricerca esaustiva dei k vicini di ogni riga di query tra le righe di dati, a blocchi di
+        query, con la scelta per distanza e posizione di k_minimi. Per le metriche con potenza 2
+        su dati float64 (euclidea, coseno, minkowski con p=2) usa vicini_euclidei, con lo stesso
+        risultato; le righe con valori non finiti o con norme troppo grandi usano distanze().
+
+        INPUT:
+        query (np.ndarray) matrice n_query x n_feature già trasformata con prepara
+        dati (np.ndarray) matrice n_dati x n_feature (codici uint8 se griglia non è None)
+        k (int) numero di vicini (k <= n_dati)
+        griglia (tuple) (offset, passo) dei codici di dati, come in distanze()
+        norme (np.ndarray) norme_quadrate(dati), se già calcolate
+
+        OUTPUT:
+        tupla (distanze senza radice n_query x k, indici n_query x k)
+        """
+        distanze = np.empty((len(query), k), dtype=np.float64)
+        indici = np.empty((len(query), k), dtype=np.intp)
+        blas = self.potenza == 2 and griglia is None and dati.dtype == np.float64 and k < len(dati)
+        if blas:
+            norme = norme_quadrate(dati) if norme is None else norme
+            blas = bool(np.isfinite(norme).all())
+        passo = max(_RIGHE_MINIME_BLAS, dimensione_blocco(len(dati), ELEMENTI_PER_BLOCCO_BLAS)) if blas \
+            else dimensione_blocco(len(dati))
+
+        for inizio in range(0, len(query), passo):
+            righe = np.arange(inizio, min(inizio + passo, len(query)))
+            if blas:
+                norme_query = norme_quadrate(query[righe])
+                finite = np.isfinite(norme_query + norme.max())
+                if finite.any():
+                    distanze[righe[finite]], indici[righe[finite]] = vicini_euclidei(
+                        query[righe[finite]], dati, k, norme_query[finite], norme)
+                righe = righe[~finite]
+                if not len(righe):
+                    continue
+            d = self.distanze(query[righe], dati, griglia)
+            vicini = k_minimi(d, k)
+            indici[righe] = vicini
+            distanze[righe] = np.take_along_axis(d, vicini, axis=1)
+
+        return distanze, indici
+
+    def _distanze_intere(self, query: np.ndarray, dati: np.ndarray, passo: np.ndarray) -> np.ndarray:
+        """
+        Kernel sui codici interi (query int16, dati uint8). Se tutte le feature hanno lo stesso
+        passo la somma è intera e viene scalata alla fine (i pareggi sono pareggi veri);
+        altrimenti ogni contributo viene pesato con il passo della sua feature.
+        """
+        esponente = 1 if self.potenza == np.inf else self.potenza
+        uniforme = np.allclose(passo, passo[0], rtol=1e-9, atol=0)  # stesso passo per tutte le feature
+        forma = (query.shape[0], dati.shape[0])
+        if uniforme:
+            somma = np.zeros(forma, dtype=np.int32 if dati.shape[1] * SCARTO_MASSIMO ** esponente < 2 ** 31 else np.int64)
+            pesi, pesati = None, None
+        else:
+            somma = np.zeros(forma, dtype=np.float64)
+            pesi, pesati = passo ** esponente, np.empty(forma, dtype=np.float64)
+
+        diff = np.empty(forma, dtype=np.int32)
+        for j in range(dati.shape[1]):
+            np.subtract(query[:, j, None], dati[:, j], out=diff, dtype=np.int32)
+            self._accumula(somma, diff, None if pesi is None else pesi[j], pesati)
+        return somma * passo[0] ** esponente if uniforme else somma
+
+    def _accumula(self, somma: np.ndarray, diff: np.ndarray, peso: float = None, pesati: np.ndarray = None):
+        """Aggiunge a somma il contributo degli scarti di una feature (diff viene sovrascritto)."""
+        if self.potenza == 2:
+            np.square(diff, out=diff)
+        else:
+            np.abs(diff, out=diff)
+            if self.potenza not in (1, np.inf):
+                np.power(diff, self.potenza, out=diff)
+        if peso is not None:
+            diff = np.multiply(diff, peso, out=pesati)
+        if self.potenza == np.inf:
+            np.maximum(somma, diff, out=somma)
+        else:
+            somma += diff
+
+    def finale(self, distanze: np.ndarray) -> np.ndarray:
+        """Converte (sul posto) le distanze di distanze() nelle distanze vere."""
+        if self.nome == "euclidea" or (self.nome == "minkowski" and self.p == 2):
+            np.sqrt(distanze, out=distanze)
+        elif self.nome == "minkowski" and self.p != 1:
+            np.power(distanze, 1 / self.p, out=distanze)
+        elif self.nome == "coseno":
+            distanze /= 2
+        return distanze
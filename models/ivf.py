@@ -0,0 +1,152 @@
+## indice approssimato a liste invertite (IVF) per la ricerca dei vicini del classificatore knn
+
+"""
+L'indice IVF raggruppa i campioni di training con un k-means in n_liste gruppi (liste invertite).
+Per ogni punto di query si calcola la distanza dai centroidi e si cercano i vicini solo nelle
+n_probe liste più vicine: la ricerca è approssimata, ma molto più rapida di quella esaustiva.
+
+Le due manopole sono:
+- n_liste: più liste rendono ogni lista più piccola (ricerca più veloce, recall più bassa)
+- n_probe: più liste visitate aumentano la recall a scapito della velocità
+"""
+
+import numpy as np
+
+from models.distanze import Metrica, distanze_euclidee_quadrate, dimensione_blocco, k_minimi
+
+# numero massimo di campioni per lista usati per addestrare il k-means
+_CAMPIONI_PER_LISTA = 64
+
+# righe di query elaborate insieme: limita la memoria delle matrici temporanee per lista
+_QUERY_PER_BLOCCO = 8192
+
+
+class IndiceIVF:
+    """
+    Indice a liste invertite: i campioni sono riordinati per lista, così ogni lista è un
+    blocco contiguo [inizi[l], inizi[l + 1]) della matrice dati.
+    """
+
+    def __init__(self, dati: np.ndarray, n_liste: int = None, n_probe: int = 8, iterazioni: int = 10, seme: int = 0,
+                 metrica: Metrica = None):
+        n = len(dati)
+        if n_liste is None:
+            n_liste = int(np.sqrt(n))
+        n_liste = max(1, min(n_liste, n))
+        if n_probe < 1:
+            raise ValueError("n_probe deve essere un intero positivo")
+        self.n_probe = n_probe
+        self.metrica = Metrica() if metrica is None else metrica
+
+        # il k-means raggruppa i campioni in distanza euclidea qualunque sia la metrica: le liste
+        # servono solo a scegliere dove cercare, le distanze vere usano la metrica dell'indice
+        self.centroidi = self._kmeans(dati, n_liste, iterazioni, np.random.default_rng(seme))
+        assegnazioni = self._piu_vicino(dati, self.centroidi)
+
+        self.permutazione = np.argsort(assegnazioni, kind="stable")
+        self.inizi = np.searchsorted(assegnazioni[self.permutazione], np.arange(len(self.centroidi) + 1))
+        self.dati = np.ascontiguousarray(dati[self.permutazione])
+
+    # array che descrivono l'indice: bastano a ricostruirlo senza ripetere il k-means
+    ARRAY = ("centroidi", "permutazione", "inizi", "dati")
+
+    def array(self) -> dict:
+        """Restituisce gli array dell'indice, ad esempio per salvarlo su file."""
+        return {nome: getattr(self, nome) for nome in self.ARRAY}
+
+    @classmethod
+    def da_array(cls, array: dict, n_probe: int = 8, metrica: Metrica = None):
+        """Ricostruisce un indice dagli array restituiti da array() (anche mappati in memoria)."""
+        indice = cls.__new__(cls)
+        indice.n_probe = n_probe
+        indice.metrica = Metrica() if metrica is None else metrica
+        for nome in cls.ARRAY:
+            setattr(indice, nome, array[nome])
+        return indice
+
+    @staticmethod
+    def _piu_vicino(dati: np.ndarray, centroidi: np.ndarray) -> np.ndarray:
+        """Restituisce per ogni campione la posizione del centroide più vicino."""
+        assegnazioni = np.empty(len(dati), dtype=np.intp)
+        passo = dimensione_blocco(len(centroidi))
+        for inizio in range(0, len(dati), passo):
+            blocco = slice(inizio, inizio + passo)
+            assegnazioni[blocco] = np.argmin(distanze_euclidee_quadrate(dati[blocco], centroidi), axis=1)
+        return assegnazioni
+
+    def _kmeans(self, dati: np.ndarray, n_liste: int, iterazioni: int, generatore) -> np.ndarray:
+        """K-means (algoritmo di Lloyd) su un sottocampione dei dati."""
+        n_campioni = min(len(dati), n_liste * _CAMPIONI_PER_LISTA)
+        campione = dati[generatore.choice(len(dati), n_campioni, replace=False)]
+        centroidi = campione[generatore.choice(n_campioni, n_liste, replace=False)].copy()
+
+        for _ in range(iterazioni):
+            assegnazioni = self._piu_vicino(campione, centroidi)
+            conteggi = np.bincount(assegnazioni, minlength=n_liste)
+            somme = np.zeros_like(centroidi)
+            np.add.at(somme, assegnazioni, campione)
+            pieni = conteggi > 0  # i centroidi rimasti senza campioni restano dove sono
+            centroidi[pieni] = somme[pieni] / conteggi[pieni, None]
+        return centroidi
+
+    def query(self, query: np.ndarray, k: int, n_probe: int = None) -> tuple:
+        """
+        Trova (in modo approssimato) i k vicini più vicini di ogni riga di query.
+
+        INPUT:
+        query (np.ndarray) matrice n_query x n_feature
+        k (int) numero di vicini
+        n_probe (int) opzionale: liste da visitare al posto di self.n_probe
+
+        OUTPUT:
+        tupla (distanze senza radice, come Metrica.distanze, e indici) di matrici n_query x k
+        ordinate per distanza crescente; gli indici si riferiscono ai dati originali
+        """
+        n_probe = min(n_probe or self.n_probe, len(self.centroidi))
+        distanze = np.empty((len(query), k), dtype=np.float64)
+        indici = np.empty((len(query), k), dtype=np.intp)
+        for inizio in range(0, len(query), _QUERY_PER_BLOCCO):
+            blocco = slice(inizio, inizio + _QUERY_PER_BLOCCO)
+            distanze[blocco], indici[blocco] = self._query_blocco(query[blocco], k, n_probe)
+        return distanze, indici
+
+    def _query_blocco(self, query: np.ndarray, k: int, n_probe: int) -> tuple:
+        """Ricerca approssimata per un blocco di query."""
+        migliori_d = np.full((len(query), k), np.inf)
+        migliori_i = np.full((len(query), k), -1, dtype=np.intp)
+
+        # liste da visitare per ogni query
+        sonde = np.empty((len(query), n_probe), dtype=np.intp)
+        passo = dimensione_blocco(len(self.centroidi))
+        for inizio in range(0, len(query), passo):
+            blocco = slice(inizio, inizio + passo)
+            sonde[blocco] = k_minimi(self.metrica.distanze(query[blocco], self.centroidi), n_probe)
+
+        # una lista alla volta: tutte le query che la visitano vengono confrontate con i suoi campioni
+        righe_per_lista = np.argsort(sonde.ravel(), kind="stable") // n_probe
+        confini = np.searchsorted(np.sort(sonde.ravel()), np.arange(len(self.centroidi) + 1))
+        for lista in range(len(self.centroidi)):
+            righe = righe_per_lista[confini[lista]:confini[lista + 1]]
+            inizio, fine = self.inizi[lista], self.inizi[lista + 1]
+            if len(righe) == 0 or fine == inizio:
+                continue
+            d = self.metrica.distanze(query[righe], self.dati[inizio:fine])
+            candidati_d = np.concatenate((migliori_d[righe], d), axis=1)
+            candidati_i = np.concatenate((migliori_i[righe], np.broadcast_to(self.permutazione[inizio:fine], d.shape)), axis=1)
+            scelti = k_minimi(candidati_d, k)
+            migliori_d[righe] = np.take_along_axis(candidati_d, scelti, axis=1)
+            migliori_i[righe] = np.take_along_axis(candidati_i, scelti, axis=1)
+
+        # le query con meno di k candidati nelle liste visitate vengono completate in modo esaustivo
+        incomplete = np.flatnonzero(migliori_i[:, -1] < 0)
+        passo = dimensione_blocco(len(self.dati))
+        for inizio in range(0, len(incomplete), passo):
+            righe = incomplete[inizio:inizio + passo]
+            d = self.metrica.distanze(query[righe], self.dati)
+            scelti = k_minimi(d, k)
+            migliori_d[righe] = np.take_along_axis(d, scelti, axis=1)
+            migliori_i[righe] = self.permutazione[scelti]
+
+        # a parità di distanza ordino per indice, come la ricerca esaustiva
+        ordine = np.lexsort((migliori_i, migliori_d), axis=-1)
+        return np.take_along_axis(migliori_d, ordine, axis=1), np.take_along_axis(migliori_i, ordine, axis=1)
@@ -1,132 +1,481 @@
-## file riguardante il classificatore knn 
-
-"""
-Il classificatore knn è un algoritmo che verrà usato per classificare i tumori come benigni o maligni.
-- Implementeremo dapprima la metrica di distanza Euclidea per confrontare i campioni 
-- Identificheremo i k vicini più vicini a un dato campione 
-- Assegneremo una classe in base alla maggioranza dei vicini gestendo anche il caso di pareggio tra classi 
-"""""
-
-# knn prende in input features e labels per il training (X_train, y_train) e il parametro k (nummero dei vicini da considerare)
-# in output verranno restituite le predizioni y_pred e il modello knn addestrato 
-
-import random 
-import pandas as pd 
-import numpy as np 
-from collections import Counter 
-
-class ClassificatoreKNN: 
-    def __init__(self, k = 5):   #inizializzo il classificatore knn e imposto un valore di default per k
-        self.k = k
-        self.features = None # dati training 
-        self.labels = None # etichette training 
-
-    def train(self, features, labels):
-
-        """Salva i dati di training assicurandosi che siano DataFrame e Series"""
-
-        # Se features è un array NumPy, lo converto in DataFrame
-        if isinstance(features, np.ndarray):
-            self.features = pd.DataFrame(features)
-        else:
-            self.features = features.copy()  # Se è già un DataFrame, faccio una copia
-
-        # Se labels è un array NumPy, lo converto in Series
-        if isinstance(labels, np.ndarray):
-            self.labels = pd.Series(labels)
-        else:
-            self.labels = labels.copy()
-
-        
-        
-        self.features = features.apply(pd.to_numeric, errors='coerce') # converto le features in numeri
-        self.labels = labels.apply(pd.to_numeric, errors='coerce') # converto le labels in numeri
-        
-        """
-        Rimuove le righe con NaN
-        
-        """
-        mask= self.features.notnull().all(axis=1) & self.labels.notnull() # maschera per rimuovere i valori nulli
-        self.features = self.features[mask]
-        self.labels = self.labels[mask]
-
-
-    def Euclidian_distance(self, point:pd.Series) -> pd.Series: 
-        """ 
-        con la funzione Euclidian_distances viene calcolata la distanza euclidea tra il punto di test e i campioni di training 
-
-        INPUT: 
-        point (pd.Series) che è il punto che si cuole classificare 
-
-        OUTPUT: 
-        pd.Series che sono le distanze calcolate 
-
-        """
-        point = np.array(point).reshape(1,-1)  # Assicura che point sia un array NumPy
-        
-        return np.sqrt(((self.features - point)**2).sum(axis=1))
-
-    def k_nearest_neighbor(self, point: pd.Series) -> pd.Series:
-        """
-        la funzione k_nearest_neighbor trova i vicini più vicini al punto specificato 
-
-        INPUT: 
-        point (pd.Series) che è il punto da classificare 
-
-        OUTPUT: 
-        tipo p.Series ovvero le etichette dei k più vicini 
-        """
-        distances = self.Euclidian_distance(point)
-        nearest_idx = distances.nsmallest(self.k).index
-        return self.labels.loc[nearest_idx]
-
-    def predict(self, point: pd.Series) -> int: 
-        """
-        la funzione predict ha lo scopo di predire la classe di un punto 
-
-        INPUT: 
-        point (pd.Series) che è il punto che vogliamo classificare 
-
-        OUTPUT: 
-        restituisce un intero che corrisponde alla classe predetta 
-        """
-        if self.features is None or self.labels is None: # verifico se il modello è stato addestrato attraverso fit 
-            raise ValueError("Il modello non è addestrato! Importante usare fit prima di predict")
-        neighbors = self.k_nearest_neighbor(point) # chiamo il metodo k_nearest_neighbor per trovare i k vicini più vicini al mio punto. neighbors sarà del tipo pd.Series e conterrà le labels dei vicini trovati
-        c = neighbors.value_counts() # attraverso il metodo value.counts() conto quante volte appare una classe nei vicini 
-
-        # GESTISCO IL CASO DI PAREGGIO 
-
-        if(c == c.max()).sum() >1: # se le classi appaiono lo stesso numero di volte abbiamo il caso di pareggio
-            return int(random.choice(c [c == c.max()].index.tolist())) # nel caso di pareggio si gestisca casualemte
-        return int(c.idxmax())
-    
-    def predict_batch(self, points: pd.DataFrame) -> pd.Series: 
-        """
-        Predice le classi per più punti contemporaneamente.
-
-        INPUT:
-        points (pd.DataFrame) sono i dataset di punti che vogliamo classificare
-
-        OUTPUT:
-        pd.Series che corrispondono alle labels predette per ogni punto
-        """
-        return points.apply(lambda row: self.predict(row), axis=1)  #garantisce che ogni riga venga passata come pd.series
-
-    ## necessari per la metrica AUC 
-    
-    def predict_proba(self, point: pd.Series) -> float:
-        """
-        Restituisce la "probabilità" che il punto appartenga alla classe 1
-        come frazione di vicini di classe 1.
-        """
-        neighbors = self.k_nearest_neighbor(point)  # etichette dei k vicini
-        # Calcoliamo la frazione di vicini che sono == 1
-        return neighbors.mean()  # Se i vicini sono [1,0,1,1,0] => 3/5 = 0.6
-
-    def predict_proba_batch(self, points: pd.DataFrame) -> pd.Series:
-        """
-        Restituisce la 'probabilità' in batch come frazione di vicini di classe 1
-        per ogni campione.
-        """
-        return points.apply(lambda row: self.predict_proba(row), axis=1)
+## file riguardante il classificatore knn 
+
+"""
+Il classificatore knn è un algoritmo che verrà usato per classificare i tumori come benigni o maligni.
+- Implementeremo dapprima la metrica di distanza Euclidea per confrontare i campioni 
+- Identificheremo i k vicini più vicini a un dato campione 
+- Assegneremo una classe in base alla maggioranza dei vicini gestendo anche il caso di pareggio tra classi 
+"""""
+
+# knn prende in input features e labels per il training (X_train, y_train) e il parametro k (nummero dei vicini da considerare)
+# in output verranno restituite le predizioni y_pred e il modello knn addestrato 
+
+import random 
+import time
+import pandas as pd 
+import numpy as np 
+from collections import Counter 
+from models.distanze import Metrica, dequantizza, norme_quadrate, quantizza
+from models.kd_tree import KDTree
+from models.ivf import IndiceIVF
+from profilazione import misurata
+
+ALGORITMI = ("brute", "kd_tree", "ivf")
+FORMATI = ("float64", "float32", "uint8")
+
+class ClassificatoreKNN: 
+    def __init__(self, k = 5, algoritmo = "brute", leaf_size = 30, seme = None, n_liste = None, n_probe = 8, formato = "float64",
+                 metrica = "euclidea", p = 2):   #inizializzo il classificatore knn e imposto un valore di default per k
+        """
+        algoritmo: "brute" confronta ogni punto con tutti i campioni di training,
+                   "kd_tree" (sperimentale, mai scelto automaticamente) costruisce in train un
+                   KD-tree, più veloce di "brute" solo con poche feature (fino a circa 8): con le
+                   11 feature di version_1.csv è più lento; vedi models.kd_tree,
+                   "ivf" costruisce in train un indice approssimato a liste invertite
+        leaf_size: numero massimo di campioni in una foglia del KD-tree
+        n_liste, n_probe: numero di liste dell'indice IVF (default: radice del numero di campioni)
+                   e numero di liste visitate per ogni query; vedi report_recall per sceglierli
+        seme: se indicato, i pareggi delle predizioni in batch sono risolti con un generatore
+              casuale inizializzato con questo seme (risultati riproducibili anche tra processi)
+        formato: tipo con cui viene conservata la matrice di training dopo lo scaling:
+                 "float64" (default), "float32" (metà memoria, con tutti gli algoritmi) oppure
+                 "uint8", un byte per valore (un ottavo della memoria) per feature che stanno su
+                 una griglia regolare come i punteggi 1-10 di version_1.csv, normalizzati o
+                 standardizzati; solo con algoritmo="brute". Le distanze tra punti della griglia
+                 vengono calcolate con un kernel intero, esatto. Con i formati compatti features
+                 è una vista sulla matrice compatta (con "uint8" contiene i codici della griglia).
+        metrica: distanza usata per cercare i vicini, con tutti gli algoritmi: "euclidea" (default),
+                 "manhattan", "chebyshev", "minkowski" (con esponente p) oppure "coseno"; vedi
+                 models.distanze.Metrica. Con "coseno" la matrice di training contiene le righe
+                 normalizzate a norma 1, e non è disponibile con formato="uint8".
+        """
+        if algoritmo not in ALGORITMI:
+            raise ValueError(f"Algoritmo non valido: {algoritmo}. Valori ammessi: {ALGORITMI}")
+        if formato not in FORMATI:
+            raise ValueError(f"Formato non valido: {formato}. Valori ammessi: {FORMATI}")
+        if formato == "uint8" and algoritmo != "brute":
+            raise ValueError("Il formato 'uint8' è disponibile solo con algoritmo='brute'")
+        if formato == "uint8" and metrica == "coseno":
+            raise ValueError("La metrica 'coseno' non è disponibile con formato='uint8'")
+        self._metrica = Metrica(metrica, p)
+        self.k = k
+        self.algoritmo = algoritmo
+        self.leaf_size = leaf_size
+        self.seme = seme
+        self.n_liste = n_liste
+        self.n_probe = n_probe
+        self.formato = formato
+        self.metrica = metrica
+        self.p = p
+        self.features = None # dati training 
+        self.labels = None # etichette training 
+
+        # copie NumPy contigue usate dal motore di predizione vettorizzato
+        self._X = None # matrice delle features (n_training x n_feature) nel tipo indicato da formato
+        self._griglia = None # (offset, passo) per feature con formato="uint8": valore = offset + passo * codice
+        self._norme = None # somme dei quadrati delle righe di _X per il percorso BLAS della ricerca esaustiva
+        self._y = None # valori delle etichette
+        self._classi = None # classi distinte ordinate
+        self._codici = None # per ogni campione di training, la posizione della sua classe in _classi
+        self._indice = None # KD-tree o indice IVF costruito in train (None con algoritmo="brute")
+        self.preprocessing = {} # trasformazioni già calcolate (es. imputazione, scaling) salvate con il modello
+
+    @misurata("train")
+    def train(self, features, labels):
+
+        """Salva i dati di training assicurandosi che siano DataFrame e Series"""
+
+        # Se features è un array NumPy, lo converto in DataFrame
+        if isinstance(features, np.ndarray):
+            features = pd.DataFrame(features)
+
+        # Se labels è un array NumPy, lo converto in Series
+        if isinstance(labels, np.ndarray):
+            labels = pd.Series(labels, index=features.index)
+
+        self.features = features.apply(pd.to_numeric, errors='coerce') # converto le features in numeri (apply restituisce una copia)
+        self.labels = pd.to_numeric(labels, errors='coerce') # converto le labels in numeri
+        
+        """
+        Rimuove le righe con NaN
+        
+        """
+        mask= self.features.notnull().all(axis=1) & self.labels.notnull() # maschera per rimuovere i valori nulli
+        self.features = self.features[mask]
+        self.labels = self.labels[mask]
+
+        self._prepara_matrici()
+
+    def _prepara_matrici(self):
+        """Costruisce le matrici NumPy contigue su cui lavora il motore di predizione in batch."""
+        X = self._metrica.prepara(self.features.to_numpy(dtype=np.float64))
+        self._griglia = None
+        self._norme = None
+        if self.formato == "float32":
+            X = X.astype(np.float32)
+        elif self.formato == "uint8":
+            X, offset, passo = quantizza(X)
+            self._griglia = (offset, passo)
+        self._X = np.ascontiguousarray(X)
+        if self.formato != "float64":
+            # la copia float64 delle features non serve più: features diventa una vista sulla matrice compatta
+            self.features = pd.DataFrame(self._X, index=self.features.index, columns=self.features.columns, copy=False)
+        self._y = self.labels.to_numpy()
+        self._classi, self._codici = np.unique(self._y, return_inverse=True)
+        if self.algoritmo == "kd_tree":
+            self._indice = KDTree(self._X, self.leaf_size, self._metrica)
+        elif self.algoritmo == "ivf":
+            self._indice = IndiceIVF(self._X, self.n_liste, self.n_probe, metrica=self._metrica)
+        else:
+            self._indice = None
+
+    def salva(self, percorso: str, preprocessing: dict = None):
+        """
+        Salva il modello addestrato (matrice di training, etichette, indice di ricerca e
+        trasformazioni di preprocessing) in un file binario versionato; vedi models.artefatto.
+        """
+        from models.artefatto import salva_modello
+        salva_modello(self, percorso, preprocessing)
+
+    @classmethod
+    def carica(cls, percorso: str):
+        """
+        Carica un modello salvato con salva. Il file viene mappato in memoria: i processi che
+        caricano lo stesso file condividono una sola copia fisica dei dati.
+        """
+        from models.artefatto import carica_modello
+        return carica_modello(percorso)
+
+
+    def Euclidian_distance(self, point:pd.Series) -> pd.Series: 
+        """ 
+        con la funzione Euclidian_distances viene calcolata la distanza euclidea tra il punto di test e i campioni di training 
+
+        INPUT: 
+        point (pd.Series) che è il punto che si cuole classificare 
+
+        OUTPUT: 
+        pd.Series che sono le distanze calcolate 
+
+        """
+        if self.formato != "float64":
+            query, _ = self._matrice_query(point)
+            return pd.Series(np.sqrt(Metrica().distanze(query, self._X, self._griglia)[0]), index=self.features.index)
+
+        point = np.array(point).reshape(1,-1)  # Assicura che point sia un array NumPy
+        
+        return np.sqrt(((self.features - point)**2).sum(axis=1))
+
+    def distanze(self, point: pd.Series) -> pd.Series:
+        """
+        Distanze, secondo la metrica del modello, tra il punto e tutti i campioni di training.
+
+        INPUT:
+        point (pd.Series) punto da confrontare
+
+        OUTPUT:
+        pd.Series delle distanze, con l'indice dei dati di training
+        """
+        query, _ = self._matrice_query(point)
+        distanze = self._distanze(self._metrica.prepara(query))[0].astype(np.float64)
+        return pd.Series(self._metrica.finale(distanze), index=self.features.index)
+
+    def k_nearest_neighbor(self, point: pd.Series) -> pd.Series:
+        """
+        la funzione k_nearest_neighbor trova i vicini più vicini al punto specificato 
+        (usando il KD-tree se è stato costruito in train)
+
+        INPUT: 
+        point (pd.Series) che è il punto da classificare 
+
+        OUTPUT: 
+        tipo p.Series ovvero le etichette dei k più vicini 
+        """
+        query, _ = self._matrice_query(point)
+        _, vicini = self._vicini_batch(query)
+        return self.labels.iloc[vicini[0]]
+
+    def predict(self, point: pd.Series) -> int: 
+        """
+        la funzione predict ha lo scopo di predire la classe di un punto 
+
+        INPUT: 
+        point (pd.Series) che è il punto che vogliamo classificare 
+
+        OUTPUT: 
+        restituisce un intero che corrisponde alla classe predetta 
+        """
+        if self.features is None or self.labels is None: # verifico se il modello è stato addestrato attraverso fit 
+            raise ValueError("Il modello non è addestrato! Importante usare fit prima di predict")
+        neighbors = self.k_nearest_neighbor(point) # chiamo il metodo k_nearest_neighbor per trovare i k vicini più vicini al mio punto. neighbors sarà del tipo pd.Series e conterrà le labels dei vicini trovati
+        c = neighbors.value_counts() # attraverso il metodo value.counts() conto quante volte appare una classe nei vicini 
+
+        # GESTISCO IL CASO DI PAREGGIO 
+
+        if(c == c.max()).sum() >1: # se le classi appaiono lo stesso numero di volte abbiamo il caso di pareggio
+            return int(random.choice(c [c == c.max()].index.tolist())) # nel caso di pareggio si gestisca casualemte
+        return int(c.idxmax())
+    
+    def predict_batch(self, points: pd.DataFrame) -> pd.Series: 
+        """
+        Predice le classi per più punti contemporaneamente.
+
+        INPUT:
+        points (pd.DataFrame) sono i dataset di punti che vogliamo classificare
+
+        OUTPUT:
+        pd.Series che corrispondono alle labels predette per ogni punto
+        """
+        query, indice = self._matrice_query(points)
+        _, vicini = self._vicini_batch(query)
+        return pd.Series(self._vota(vicini), index=indice)
+
+    def _matrice_query(self, points):
+        """
+        Converte i punti da classificare in un'unica matrice NumPy contigua in float64.
+
+        OUTPUT:
+        tupla (matrice n_query x n_feature, indice da usare per i risultati)
+        """
+        if self._X is None: # verifico se il modello è stato addestrato
+            raise ValueError("Il modello non è addestrato! Importante usare fit prima di predict")
+        indice = points.index if isinstance(points, pd.DataFrame) else None
+        query = np.ascontiguousarray(np.asarray(points, dtype=np.float64))
+        if query.ndim == 1:
+            query = query.reshape(1, -1)
+        if indice is None:
+            indice = pd.RangeIndex(len(query))
+        return query, indice
+
+    @misurata("ricerca_vicini")
+    def _vicini_batch(self, query: np.ndarray, escludi: np.ndarray = None, k: int = None) -> tuple:
+        """
+        Trova i k vicini più vicini di tutte le righe di query.
+
+        INPUT:
+        query (np.ndarray) matrice n_query x n_feature
+        escludi (np.ndarray) opzionale: per ogni riga di query la posizione di un campione di
+        training da non considerare (es. il punto stesso nel leave-one-out), -1 per nessuno
+        k (int) opzionale: numero di vicini da cercare al posto di self.k
+
+        OUTPUT:
+        tupla (distanze, indici) di matrici n_query x k ordinate per distanza crescente;
+        gli indici sono posizionali rispetto ai dati di training
+        """
+        k = self.k if k is None else k
+        query = self._metrica.prepara(query)
+        if escludi is None:
+            distanze, indici = self._cerca(query, min(k, len(self._X)))
+            return self._metrica.finale(distanze), indici
+
+        # cerco un vicino in più e tolgo il campione escluso; se non compare tra i k+1
+        # (ad esempio perché ha più di k duplicati con posizione minore) tolgo l'ultimo
+        k = min(k, len(self._X) - 1)
+        distanze, indici = self._cerca(query, k + 1)
+        tieni = indici != np.asarray(escludi)[:, None]
+        tieni[tieni.all(axis=1), -1] = False
+        distanze = distanze[tieni].reshape(len(query), k)
+        indici = indici[tieni].reshape(len(query), k)
+        return self._metrica.finale(distanze), indici
+
+    def _cerca(self, query: np.ndarray, k: int) -> tuple:
+        """
+        Ricerca dei k vicini con l'indice costruito in train o, in sua assenza, in modo esaustivo.
+        Le query devono essere già trasformate con Metrica.prepara; restituisce le distanze
+        senza radice (Metrica.distanze).
+        """
+        if self._indice is not None:
+            return self._indice.query(query, k)
+        return self._cerca_esaustiva(query, k)
+
+    def _cerca_esaustiva(self, query: np.ndarray, k: int) -> tuple:
+        """
+        Ricerca esaustiva dei k vicini elaborando le query a blocchi (Metrica.cerca).
+        Restituisce le distanze senza radice (Metrica.distanze).
+        """
+        if self._norme is None and self._griglia is None and self._X.dtype == np.float64 and self._metrica.potenza == 2:
+            self._norme = norme_quadrate(self._X)  # calcolate alla prima ricerca, anche per i modelli caricati
+        return self._metrica.cerca(query, self._X, k, self._griglia, self._norme)
+
+    def _distanze(self, query: np.ndarray) -> np.ndarray:
+        """Distanze (senza radice) tra le righe di query e tutti i campioni di training, nel formato di _X."""
+        return self._metrica.distanze(query, self._X, self._griglia)
+
+    def report_recall(self, points: pd.DataFrame = None, n_campioni: int = 500, seme: int = 0) -> dict:
+        """
+        Confronta la ricerca dell'indice costruito in train (ad esempio IVF) con la ricerca
+        esaustiva su un campione di punti, per scegliere n_liste e n_probe con numeri reali.
+
+        INPUT:
+        points (pd.DataFrame) punti su cui misurare la recall; se None si usa un campione
+        casuale dei dati di training
+        n_campioni (int) numero massimo di punti usati
+        seme (int) seme per l'estrazione del campione
+
+        OUTPUT:
+        dict con recall media (frazione dei k vicini esatti trovati), tempi delle due ricerche
+        in secondi e speedup; non stampa nulla (vedi python -m benchmarks.esegui --recall)
+        """
+        if points is None:
+            query = self._X if self._griglia is None else dequantizza(self._X, *self._griglia)
+        else:
+            query = self._metrica.prepara(self._matrice_query(points)[0])
+        if len(query) > n_campioni:
+            query = query[np.random.default_rng(seme).choice(len(query), n_campioni, replace=False)]
+        k = min(self.k, len(self._X))
+
+        inizio = time.perf_counter()
+        _, esatti = self._cerca_esaustiva(query, k)
+        tempo_esatto = time.perf_counter() - inizio
+
+        inizio = time.perf_counter()
+        _, trovati = self._cerca(query, k)
+        tempo_indice = time.perf_counter() - inizio
+
+        trovati_giusti = [len(np.intersect1d(e, t)) for e, t in zip(esatti, trovati)]
+        report = {
+            "algoritmo": self.algoritmo,
+            "k": k,
+            "campioni": len(query),
+            "recall": float(np.mean(trovati_giusti) / k) if len(query) else 1.0,
+            "tempo_esatto": tempo_esatto,
+            "tempo_indice": tempo_indice,
+            "speedup": tempo_esatto / tempo_indice if tempo_indice > 0 else float("inf"),
+        }
+        return report
+
+    def _vota(self, vicini: np.ndarray) -> np.ndarray:
+        """
+        Assegna a ogni punto la classe di maggioranza tra i suoi vicini.
+
+        INPUT:
+        vicini (np.ndarray) matrice n_query x k di indici posizionali dei vicini
+
+        OUTPUT:
+        np.ndarray delle classi predette (intere)
+        """
+        n_classi = len(self._classi)
+        codici = self._codici[vicini]
+        righe = np.arange(len(codici))[:, None] * n_classi
+        conteggi = np.bincount((codici + righe).ravel(), minlength=len(codici) * n_classi)
+        return self._scegli_classe(conteggi.reshape(-1, n_classi))
+
+    def _scegli_classe(self, conteggi: np.ndarray) -> np.ndarray:
+        """Converte i conteggi per classe (n_query x n_classi) nelle classi predette."""
+        generatore = np.random.default_rng(self.seme) if self.seme is not None else None
+        return self._classi[vota_da_conteggi(conteggi, generatore)].astype(int)
+
+    ## necessari per la metrica AUC 
+    
+    def predict_proba(self, point: pd.Series) -> float:
+        """
+        Restituisce la "probabilità" che il punto appartenga alla classe 1
+        come frazione di vicini di classe 1.
+        """
+        neighbors = self.k_nearest_neighbor(point)  # etichette dei k vicini
+        # Calcoliamo la frazione di vicini che sono == 1
+        return neighbors.to_numpy(dtype=np.float64).mean()  # Se i vicini sono [1,0,1,1,0] => 3/5 = 0.6
+
+    def predict_proba_batch(self, points: pd.DataFrame) -> pd.Series:
+        """
+        Restituisce la 'probabilità' in batch come frazione di vicini di classe 1
+        per ogni campione.
+        """
+        query, indice = self._matrice_query(points)
+        _, vicini = self._vicini_batch(query)
+        return pd.Series(self._y[vicini].mean(axis=1, dtype=np.float64), index=indice)
+
+    def predict_e_proba_batch(self, points: pd.DataFrame, restituisci_vicini: bool = False, escludi: np.ndarray = None) -> tuple:
+        """
+        Con una sola ricerca dei vicini restituisce sia le classi predette sia le 'probabilità'
+        di classe 1, evitando di ripetere il calcolo delle distanze come farebbero
+        predict_batch e predict_proba_batch chiamati uno dopo l'altro.
+
+        INPUT:
+        points (pd.DataFrame) punti da classificare
+        restituisci_vicini (bool) se True restituisce anche indici e distanze dei vicini
+        escludi (np.ndarray) opzionale: per ogni punto la posizione di un campione di training
+        da ignorare, usato per il leave-one-out sui dati di training stessi
+
+        OUTPUT:
+        tupla (previsioni, probabilita) di pd.Series; con restituisci_vicini=True anche
+        (indici, distanze), matrici n_punti x k con indici posizionali nei dati di training
+        """
+        query, indice = self._matrice_query(points)
+        distanze, vicini = self._vicini_batch(query, escludi)
+        previsioni, probabilita = self.predict_e_proba_vicini(vicini)
+        previsioni, probabilita = pd.Series(previsioni, index=indice), pd.Series(probabilita, index=indice)
+        if restituisci_vicini:
+            return previsioni, probabilita, vicini, distanze
+        return previsioni, probabilita
+
+    def predict_e_proba_vicini(self, vicini: np.ndarray) -> tuple:
+        """
+        Classi predette e 'probabilità' di classe 1 a partire dai vicini già trovati (ad esempio
+        letti da una models.cache_vicini.CacheVicini).
+
+        INPUT:
+        vicini (np.ndarray) matrice n_punti x k di indici posizionali nei dati di training
+
+        OUTPUT:
+        tupla (previsioni, probabilita) di array NumPy
+        """
+        return self._vota(vicini), self._y[vicini].mean(axis=1, dtype=np.float64)
+
+    def predict_e_proba_multi_k(self, points: pd.DataFrame, valori_k: list, escludi: np.ndarray = None) -> dict:
+        """
+        Predizioni e 'probabilità' per più valori di k con una sola ricerca dei vicini: i vicini
+        vengono cercati ordinati fino a max(valori_k) e, per ogni k, voto e probabilità si
+        ricavano dai conteggi cumulativi delle etichette sui primi k vicini.
+
+        INPUT:
+        points (pd.DataFrame) punti da classificare
+        valori_k (list) valori di k da valutare
+        escludi (np.ndarray) opzionale, come in predict_e_proba_batch
+
+        OUTPUT:
+        dict {k: (previsioni, probabilita)} con array NumPy
+        """
+        query, _ = self._matrice_query(points)
+        _, vicini = self._vicini_batch(query, escludi, k=max(valori_k))
+        return self.multi_k_da_vicini(vicini, valori_k)
+
+    def multi_k_da_vicini(self, vicini: np.ndarray, valori_k: list) -> dict:
+        """
+        Come predict_e_proba_multi_k, a partire dai vicini già trovati e ordinati per distanza
+        (n_punti x max(valori_k) indici posizionali nei dati di training).
+        """
+        # conteggi cumulativi: cumulati[:, j, c] = vicini di classe c tra i primi j+1
+        codici = self._codici[vicini]
+        cumulati = np.cumsum(codici[:, :, None] == np.arange(len(self._classi)), axis=1)
+        somme = np.cumsum(self._y[vicini], axis=1, dtype=np.float64)
+
+        risultati = {}
+        for k in valori_k:
+            j = min(k, vicini.shape[1]) - 1
+            risultati[k] = (self._scegli_classe(cumulati[:, j, :]), somme[:, j] / (j + 1))
+        return risultati
+
+
+def vota_da_conteggi(conteggi: np.ndarray, generatore=None) -> np.ndarray:
+    """
+    Sceglie per ogni riga la classe con il conteggio massimo. In caso di pareggio sceglie
+    casualmente (in modo uniforme) tra le classi pari, come fa predict.
+
+    INPUT:
+    conteggi (np.ndarray) matrice n_query x n_classi con il numero di vicini per classe
+    generatore: generatore casuale NumPy per i pareggi (default: np.random)
+
+    OUTPUT:
+    np.ndarray con la posizione della classe scelta per ogni riga
+    """
+    pari = conteggi == conteggi.max(axis=1, keepdims=True)
+    scelta = np.argmax(pari, axis=1)
+
+    # il generatore casuale viene usato solo se c'è almeno un pareggio
+    con_pareggio = pari.sum(axis=1) > 1
+    if con_pareggio.any():
+        generatore = np.random if generatore is None else generatore
+        casuali = np.where(pari[con_pareggio], generatore.random(pari[con_pareggio].shape), -1.0)
+        scelta[con_pareggio] = np.argmax(casuali, axis=1)
+    return scelta
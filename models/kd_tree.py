@@ -0,0 +1,274 @@
+## indice spaziale KD-tree per la ricerca dei vicini del classificatore knn
+
+"""
+Il KD-tree viene costruito una sola volta in fase di training: divide ricorsivamente i campioni
+lungo la feature con l'intervallo più ampio finché ogni foglia contiene al più leaf_size campioni.
+In fase di ricerca ogni nodo ha un riquadro (minimo e massimo di ogni feature sui suoi campioni)
+e si scartano i nodi il cui riquadro è più lontano del k-esimo vicino già trovato.
+
+Le distanze nelle foglie sono calcolate con lo stesso kernel della ricerca esaustiva e i pareggi
+sono risolti per indice crescente, quindi i risultati coincidono con quelli del metodo brute.
+La potatura funziona con tutte le metriche di models.distanze.Metrica: la distanza da un
+riquadro si ricava dagli scarti lungo le singole feature, accumulati come nel kernel.
+
+La ricerca è vettorizzata su blocchi di query: la discesa nell'albero procede per livelli su
+tutte le coppie (query, nodo) ancora entro la soglia e le foglie vengono visitate a turni, una
+per query a ogni turno. La potatura perde comunque efficacia al crescere del numero di feature.
+Su 300.000 campioni uniformi una query costa 0,04 ms con 3 feature e 0,9 ms con 8 (contro circa
+2 ms della ricerca esaustiva), ma con 11 feature, come in version_1.csv, visita quasi tutte le
+foglie e costa circa 5 ms, più della ricerca esaustiva. L'indice è quindi sperimentale: non viene mai scelto
+automaticamente e conviene solo con poche feature; oltre circa 8 feature conviene
+algoritmo="brute" o "ivf".
+"""
+
+import numpy as np
+
+from models.distanze import Metrica, dimensione_blocco
+
+# margine relativo usato per scartare un nodo: compensa gli arrotondamenti tra il calcolo della
+# distanza dalla regione del nodo e quello delle distanze vere, così un nodo non viene mai scartato a torto
+_TOLLERANZA = 1e-9
+# massimo di coppie (query, nodo) per blocco di query: le query di un blocco vengono elaborate
+# insieme (ogni turno di visita delle foglie è vettorizzato su di esse) e nel caso peggiore,
+# con molte feature, ogni query visita tutti i nodi
+_COPPIE_PER_BLOCCO = 2 ** 24
+
+
+class KDTree:
+    """
+    Indice KD-tree su una matrice di campioni.
+
+    Ogni nodo è descritto da array paralleli: intervallo [inizio, fine) nella permutazione dei
+    campioni, figli sinistro e destro (-1 per le foglie), feature e soglia di divisione.
+    """
+
+    def __init__(self, dati: np.ndarray, leaf_size: int = 30, metrica: Metrica = None):
+        if leaf_size < 1:
+            raise ValueError("leaf_size deve essere un intero positivo")
+        self.leaf_size = leaf_size
+        self.metrica = Metrica() if metrica is None else metrica
+
+        n = len(dati)
+        self.permutazione = np.arange(n)
+
+        inizi, fini, sinistri, destri, assi, soglie = [], [], [], [], [], []
+        da_dividere = [(0, n, -1, False)]  # (inizio, fine, padre, è figlio destro)
+        while da_dividere:
+            inizio, fine, padre, destro = da_dividere.pop()
+            nodo = len(inizi)
+            inizi.append(inizio)
+            fini.append(fine)
+            sinistri.append(-1)
+            destri.append(-1)
+            assi.append(0)
+            soglie.append(0.0)
+            if padre >= 0:
+                (destri if destro else sinistri)[padre] = nodo
+
+            if fine - inizio <= leaf_size:
+                continue
+
+            # divido lungo la feature con l'intervallo più ampio, alla mediana
+            blocco = dati[self.permutazione[inizio:fine]]
+            asse = int(np.argmax(blocco.max(axis=0) - blocco.min(axis=0)))
+            meta = (fine - inizio) // 2
+            ordine = np.argpartition(blocco[:, asse], meta)
+            self.permutazione[inizio:fine] = self.permutazione[inizio:fine][ordine]
+            assi[nodo] = asse
+            soglie[nodo] = float(blocco[ordine[meta], asse])  # a sinistra valori <= soglia, a destra >= soglia
+
+            da_dividere.append((inizio + meta, fine, nodo, True))
+            da_dividere.append((inizio, inizio + meta, nodo, False))
+
+        self.inizi = np.array(inizi, dtype=np.intp)
+        self.fini = np.array(fini, dtype=np.intp)
+        self.sinistri = np.array(sinistri, dtype=np.intp)
+        self.destri = np.array(destri, dtype=np.intp)
+        self.assi = np.array(assi, dtype=np.intp)
+        self.soglie = np.array(soglie, dtype=np.float64)
+
+        # copia dei campioni nell'ordine delle foglie: ogni foglia è un blocco contiguo
+        self.dati = np.ascontiguousarray(dati[self.permutazione])
+        self._prepara_riquadri()
+
+    # array che descrivono l'albero: bastano a ricostruirlo senza ripetere la costruzione
+    ARRAY = ("inizi", "fini", "sinistri", "destri", "assi", "soglie", "permutazione", "dati")
+
+    def array(self) -> dict:
+        """Restituisce gli array dell'albero, ad esempio per salvarlo su file."""
+        return {nome: getattr(self, nome) for nome in self.ARRAY}
+
+    @classmethod
+    def da_array(cls, array: dict, leaf_size: int = 30, metrica: Metrica = None):
+        """Ricostruisce un albero dagli array restituiti da array() (anche mappati in memoria)."""
+        albero = cls.__new__(cls)
+        albero.leaf_size = leaf_size
+        albero.metrica = Metrica() if metrica is None else metrica
+        for nome in cls.ARRAY:
+            setattr(albero, nome, array[nome])
+        albero._prepara_riquadri()
+        return albero
+
+    def _prepara_riquadri(self):
+        """
+        Riquadri (minimo e massimo di ogni feature sui campioni) di tutti i nodi e intervalli delle
+        foglie. Le foglie, in ordine di posizione, sono blocchi contigui che coprono tutta la
+        permutazione: il riquadro di un nodo è l'unione di quelli delle foglie del suo intervallo.
+        """
+        foglie = np.flatnonzero(self.sinistri < 0)
+        foglie = foglie[np.argsort(self.inizi[foglie])]
+        inizi_foglie = self.inizi[foglie]
+        self._dimensione_foglie = int((self.fini[foglie] - inizi_foglie).max()) if len(foglie) else 0
+        self._minimi = np.empty((len(self.inizi), self.dati.shape[1]), dtype=self.dati.dtype)
+        self._massimi = np.empty_like(self._minimi)
+        if not len(self.dati):
+            return
+        minimi = np.minimum.reduceat(self.dati, inizi_foglie, axis=0)
+        massimi = np.maximum.reduceat(self.dati, inizi_foglie, axis=0)
+        # foglie [prima, ultima) di ogni nodo; con reduceat sugli estremi alternati le posizioni
+        # pari sono le riduzioni sugli intervalli (la riga aggiunta in fondo rende valido ultima)
+        prima = np.searchsorted(inizi_foglie, self.inizi)
+        ultima = np.searchsorted(inizi_foglie, self.fini)
+        estremi = np.column_stack((prima, ultima)).ravel()
+        self._minimi[:] = np.minimum.reduceat(np.vstack((minimi, minimi[:1])), estremi, axis=0)[::2]
+        self._massimi[:] = np.maximum.reduceat(np.vstack((massimi, massimi[:1])), estremi, axis=0)[::2]
+
+    def query(self, query: np.ndarray, k: int) -> tuple:
+        """
+        Trova i k vicini più vicini di ogni riga di query, elaborando le query a blocchi (vedi
+        _query_blocco). Le righe con valori non finiti usano la ricerca esaustiva.
+
+        INPUT:
+        query (np.ndarray) matrice n_query x n_feature
+        k (int) numero di vicini (k <= numero di campioni)
+
+        OUTPUT:
+        tupla (distanze senza radice, come Metrica.distanze, e indici) di matrici n_query x k ordinate
+        per distanza crescente e, a parità, per indice crescente; gli indici si riferiscono ai dati originali
+        """
+        distanze = np.empty((len(query), k), dtype=np.float64)
+        indici = np.empty((len(query), k), dtype=np.intp)
+        finite = np.isfinite(query).all(axis=1)
+        if not finite.all():
+            distanze[~finite], vicini = self.metrica.cerca(query[~finite], self.dati, k)
+            indici[~finite] = self.permutazione[vicini]
+
+        righe = np.flatnonzero(finite)
+        passo = dimensione_blocco(len(self.inizi), _COPPIE_PER_BLOCCO)
+        for inizio in range(0, len(righe), passo):
+            blocco = righe[inizio:inizio + passo]
+            distanze[blocco], vicini = self._query_blocco(query[blocco], k)
+            indici[blocco] = self.permutazione[vicini]
+        return distanze, indici
+
+    def _distanze_coppie(self, query: np.ndarray, posizioni: np.ndarray) -> np.ndarray:
+        """
+        Distanze (senza radice) tra ogni riga di query e i campioni di self.dati alle posizioni
+        della riga corrispondente di posizioni (-1 = nessun campione, distanza infinita), con la
+        stessa sequenza di operazioni di Metrica.distanze.
+        """
+        vuote = posizioni < 0
+        campioni = self.dati[np.where(vuote, 0, posizioni)]
+        somma = np.zeros(posizioni.shape, dtype=np.float64)
+        diff = np.empty_like(somma)
+        for j in range(query.shape[1]):
+            np.subtract(query[:, j, None], campioni[:, :, j], out=diff)
+            self.metrica._accumula(somma, diff)
+        somma[vuote] = np.inf
+        return somma
+
+    def _query_blocco(self, query: np.ndarray, k: int) -> tuple:
+        """
+        Ricerca per un blocco di query, vettorizzata sulle query:
+
+        1. ogni query scende dalla radice finché il figlio dalla sua parte ha almeno k campioni;
+           la k-esima distanza dai campioni di quel nodo limita dall'alto la k-esima distanza vera
+        2. le coppie (query, nodo) scendono per livelli, dalla radice alle foglie, finché il
+           limite inferiore della distanza dal riquadro del nodo (_limiti) resta entro la soglia
+        3. le foglie entro il limite vengono visitate in ordine di limite crescente, a turni: a ogni
+           turno ogni query ancora attiva visita la sua foglia successiva e aggiorna i k migliori
+           (per distanza e, a parità, per posizione). Una query si ferma alla prima foglia più
+           lontana del suo k-esimo vicino
+
+        Restituisce distanze e posizioni in self.dati (n_query x k).
+        """
+        n_query = len(query)
+        righe = np.arange(n_query)
+
+        # 1. discesa fino al nodo più piccolo con almeno k campioni
+        nodo = np.zeros(n_query, dtype=np.intp)
+        while True:
+            sinistro = self.sinistri[nodo]
+            interno = sinistro >= 0
+            figlio = np.where(query[righe, self.assi[nodo]] <= self.soglie[nodo], sinistro, self.destri[nodo])
+            figlio[~interno] = 0
+            scendi = interno & (self.fini[figlio] - self.inizi[figlio] >= k)
+            if not scendi.any():
+                break
+            nodo[scendi] = figlio[scendi]
+        inizi, fini = self.inizi[nodo], self.fini[nodo]
+        posizioni = inizi[:, None] + np.arange((fini - inizi).max())
+        posizioni[posizioni >= fini[:, None]] = -1
+        soglia = np.partition(self._distanze_coppie(query, posizioni), k - 1, axis=1)[:, k - 1]
+        soglia *= 1 + _TOLLERANZA
+
+        # 2. discesa per livelli sulle coppie (query, nodo) il cui riquadro è entro la soglia
+        q, nodo = righe, np.zeros(n_query, dtype=np.intp)
+        limite = self._limiti(query, q, nodo)
+        riga, foglia, limite_foglia = [], [], []
+        while len(q):
+            entro = limite <= soglia[q]
+            q, nodo, limite = q[entro], nodo[entro], limite[entro]
+            interno = self.sinistri[nodo] >= 0
+            riga.append(q[~interno])
+            foglia.append(nodo[~interno])
+            limite_foglia.append(limite[~interno])
+            q = np.repeat(q[interno], 2)
+            nodo = np.column_stack((self.sinistri[nodo[interno]], self.destri[nodo[interno]])).ravel()
+            limite = self._limiti(query, q, nodo)
+
+        # 3. foglie candidate di ogni query in ordine di limite crescente
+        riga, foglia, limite = np.concatenate(riga), np.concatenate(foglia), np.concatenate(limite_foglia)
+        ordine = np.lexsort((limite, riga))
+        riga, foglia, limite = riga[ordine], foglia[ordine], limite[ordine]
+        conteggi = np.bincount(riga, minlength=n_query)
+        prime = np.concatenate(([0], np.cumsum(conteggi)[:-1]))
+
+        migliori_d = np.full((n_query, k), np.inf)
+        migliori_i = np.full((n_query, k), len(self.dati), dtype=np.intp)
+        originali = np.append(self.permutazione, len(self.dati))  # posizione -> indice originale
+        attive = conteggi > 0
+        turno = 0
+        while attive.any():
+            q = np.flatnonzero(attive)
+            scelte = prime[q] + turno
+            visita = limite[scelte] <= migliori_d[q, -1] * (1 + _TOLLERANZA)
+            attive[q[~visita]] = False
+            q, scelte = q[visita], scelte[visita]
+            if len(q):
+                inizi, fini = self.inizi[foglia[scelte]], self.fini[foglia[scelte]]
+                posizioni = inizi[:, None] + np.arange(self._dimensione_foglie)
+                posizioni[posizioni >= fini[:, None]] = -1
+                candidati_d = np.hstack((migliori_d[q], self._distanze_coppie(query[q], posizioni)))
+                candidati_i = np.hstack((migliori_i[q], np.where(posizioni < 0, len(self.dati), posizioni)))
+                # a parità di distanza vince l'indice originale più basso, come nella ricerca esaustiva
+                migliori = np.lexsort((originali[candidati_i], candidati_d), axis=-1)[:, :k]
+                migliori_d[q] = np.take_along_axis(candidati_d, migliori, axis=1)
+                migliori_i[q] = np.take_along_axis(candidati_i, migliori, axis=1)
+            turno += 1
+            attive &= conteggi > turno
+        return migliori_d, migliori_i
+
+    def _limiti(self, query: np.ndarray, righe: np.ndarray, nodi: np.ndarray) -> np.ndarray:
+        """
+        Limite inferiore (nelle unità di Metrica.distanze) della distanza tra query[righe] e i
+        campioni di ogni nodo: gli scarti dal riquadro del nodo, mai maggiori degli scarti dai
+        campioni, vengono accumulati con la stessa sequenza di operazioni del kernel, quindi il
+        limite non supera mai la distanza calcolata di un campione del nodo.
+        """
+        limiti = np.zeros(len(righe), dtype=np.float64)
+        for j in range(query.shape[1]):
+            punto = query[righe, j]
+            scarto = np.maximum(self._minimi[nodi, j] - punto, punto - self._massimi[nodi, j])
+            self.metrica._accumula(limiti, np.maximum(scarto, 0, out=scarto))
+        return limiti
@@ -1,3 +1,22 @@
-from .data_cleaner import DataCleaner
-from .importdata import DatasetProcessor
-from .normalizzazione import FeatureScaler
\ No newline at end of file
+"""
+Le classi del pacchetto vengono importate al primo utilizzo (ad esempio preprocessing.DataCleaner):
+importare un solo modulo del pacchetto non carica anche gli altri.
+"""
+
+import importlib
+
+# nome esportato -> modulo del pacchetto che lo definisce
+_ESPORTATI = {"DataCleaner": ".data_cleaner", "DatasetProcessor": ".importdata", "FeatureScaler": ".normalizzazione"}
+__all__ = list(_ESPORTATI)
+
+
+def __getattr__(nome):
+    if nome not in _ESPORTATI:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valore = getattr(importlib.import_module(_ESPORTATI[nome], __name__), nome)
+    globals()[nome] = valore  # le richieste successive non passano più da __getattr__
+    return valore
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+# cartella predefinita della cache e dimensione massima occupata su disco (in byte)
+CARTELLA_CACHE = os.path.join(".cache", "preprocessing")
+DIMENSIONE_MASSIMA = 1 << 30
+
+# da incrementare quando cambia il preprocessing o il formato dei file salvati:
+# le voci create con una versione diversa non vengono più trovate e sono rimosse dall'eviction
+# (2: target in float64 e trasformazioni calcolate salvate in meta.json)
+VERSIONE_CACHE = 2
+
+
+def hash_file(file_path: str, dimensione_blocco: int = 1 << 20) -> str:
+    """Calcola lo SHA-256 del contenuto di un file leggendolo a blocchi."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for blocco in iter(lambda: file.read(dimensione_blocco), b""):
+            digest.update(blocco)
+    return digest.hexdigest()
+
+
+class CachePreprocessing:
+    """
+    Cache su disco dei dataset già pre-processati, indirizzata per contenuto: la chiave dipende
+    dall'hash del file e dai metodi di imputazione e di scaling, quindi un file modificato o una
+    scelta diversa producono una nuova voce.
+
+    Ogni voce è una cartella con la matrice delle feature e il target in formato .npy (ricaricati
+    con memory mapping, senza parsing) e un file meta.json con nomi delle colonne e parametri
+    delle trasformazioni calcolate (imputazione e scaling), per salvare un modello anche quando
+    il dataset viene letto dalla cache.
+    Quando la cache supera dimensione_massima vengono rimosse le voci usate meno di recente.
+    """
+
+    def __init__(self, cartella: str = CARTELLA_CACHE, dimensione_massima: int = DIMENSIONE_MASSIMA):
+        self.cartella = cartella
+        self.dimensione_massima = dimensione_massima
+
+    def chiave(self, file_path: str, metodo_imputazione: str, metodo_scaling: str, hash_contenuto: str = None) -> str:
+        """
+        Restituisce la chiave della voce per il file e i metodi indicati. hash_contenuto permette
+        di riusare l'hash del file già calcolato (hash_file) quando si provano più metodi.
+        """
+        descrizione = json.dumps({
+            "file": hash_contenuto or hash_file(file_path),
+            "imputazione": metodo_imputazione,
+            "scaling": metodo_scaling,
+            "versione": VERSIONE_CACHE,
+        }, sort_keys=True)
+        return hashlib.sha256(descrizione.encode()).hexdigest()
+
+    def carica(self, chiave: str):
+        """
+        Ricarica una voce della cache.
+
+        Ritorna:
+        tupla (features, target) con i valori mappati in memoria in sola lettura,
+        oppure (None, None) se la voce non esiste
+        """
+        percorso = os.path.join(self.cartella, chiave)
+        try:
+            with open(os.path.join(percorso, "meta.json"), encoding="utf-8") as file:
+                meta = json.load(file)
+            matrice = np.load(os.path.join(percorso, "features.npy"), mmap_mode="r")
+            valori_target = np.load(os.path.join(percorso, "target.npy"), mmap_mode="r")
+            indice = np.load(os.path.join(percorso, "indice.npy"))
+        except (OSError, ValueError):
+            return None, None
+
+        os.utime(os.path.join(percorso, "meta.json"))  # ultimo utilizzo, per l'eviction
+        indice = pd.Index(indice)
+        features = pd.DataFrame(matrice, index=indice, columns=meta["colonne"], copy=False)
+        target = pd.Series(valori_target, index=indice, name=meta["target"], copy=False)
+        return features, target
+
+    def trasformazioni(self, chiave: str):
+        """
+        Trasformazioni calcolate salvate con una voce della cache.
+
+        Ritorna:
+        dict {"imputazione": MissingValueHandler, "scaling": FeatureScaler} già calcolati,
+        oppure None se la voce non esiste o non le contiene
+        """
+        from preprocessing.data_cleaner import MissingValueHandler
+        from preprocessing.normalizzazione import FeatureScaler
+
+        classi = {"MissingValueHandler": MissingValueHandler, "FeatureScaler": FeatureScaler}
+        try:
+            with open(os.path.join(self.cartella, chiave, "meta.json"), encoding="utf-8") as file:
+                voci = json.load(file).get("trasformazioni")
+        except (OSError, ValueError):
+            return None
+        if not voci:
+            return None
+        return {nome: classi[voce["tipo"]].da_parametri(voce["parametri"]) for nome, voce in voci.items()}
+
+    def salva(self, chiave: str, features: pd.DataFrame, target: pd.Series, trasformazioni: dict = None):
+        """
+        Salva feature e target sotto la chiave indicata e applica l'eviction. La voce viene
+        scritta in una cartella temporanea e rinominata alla fine, così non è mai visibile a metà.
+        trasformazioni: opzionale, {nome: MissingValueHandler o FeatureScaler} già calcolati,
+        salvati come parametri (vedi trasformazioni)
+        """
+        os.makedirs(self.cartella, exist_ok=True)
+        percorso = os.path.join(self.cartella, chiave)
+        temporanea = f"{percorso}.{os.getpid()}.tmp"
+        os.makedirs(temporanea, exist_ok=True)
+
+        np.save(os.path.join(temporanea, "features.npy"), np.ascontiguousarray(features.to_numpy(dtype=np.result_type(*features.dtypes))))
+        np.save(os.path.join(temporanea, "target.npy"), target.to_numpy())
+        np.save(os.path.join(temporanea, "indice.npy"), features.index.to_numpy())
+        with open(os.path.join(temporanea, "meta.json"), "w", encoding="utf-8") as file:
+            json.dump({"colonne": list(features.columns), "target": target.name, "creata": time.time(),
+                       "trasformazioni": {nome: {"tipo": type(oggetto).__name__, "parametri": oggetto.parametri()}
+                                          for nome, oggetto in (trasformazioni or {}).items()}}, file)
+
+        shutil.rmtree(percorso, ignore_errors=True)
+        os.replace(temporanea, percorso)
+        self.eviction(mantieni=chiave)
+
+    def eviction(self, mantieni: str = None):
+        """Rimuove le voci usate meno di recente finché la cache non rientra in dimensione_massima."""
+        voci = []
+        for nome in os.listdir(self.cartella):
+            percorso = os.path.join(self.cartella, nome)
+            if not os.path.isdir(percorso) or nome.endswith(".tmp"):
+                continue
+            meta = os.path.join(percorso, "meta.json")
+            ultimo_uso = os.path.getmtime(meta) if os.path.exists(meta) else 0.0
+            dimensione = sum(os.path.getsize(os.path.join(percorso, f)) for f in os.listdir(percorso))
+            voci.append((ultimo_uso, nome, dimensione))
+
+        totale = sum(dimensione for _, _, dimensione in voci)
+        for _, nome, dimensione in sorted(voci):
+            if totale <= self.dimensione_massima:
+                break
+            if nome == mantieni:
+                continue
+            shutil.rmtree(os.path.join(self.cartella, nome), ignore_errors=True)
+            totale -= dimensione
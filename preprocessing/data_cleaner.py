@@ -1,13 +1,23 @@
+import tracemalloc
+
+import numpy as np
 import pandas as pd
 
+from profilazione import misurata
+
 class DataCleaner:
     """
     Classe per la pulizia del dataset: rimuove duplicati e righe con target mancante.
+
+    Con fusa=True usa una pulizia a passata unica che evita le copie intermedie del dataset
+    (vedi _clean_fusa); confronta_memoria misura il picco di memoria delle due modalità.
     """
 
-    def __init__(self, target_column="Target"):  # Imposta "Target" come valore predefinito
+    def __init__(self, target_column="Target", fusa=False):  # Imposta "Target" come valore predefinito
         self.target_column = target_column
+        self.fusa = fusa
 
+    @misurata("pulizia")
     def clean(self, df):
         """
         Pulisce il dataset rimuovendo duplicati e righe senza target.
@@ -18,6 +28,9 @@ class DataCleaner:
         Ritorna:
         pd.DataFrame - Dataset pulito
         """
+        if self.fusa:
+            return self._clean_fusa(df)
+
         df = df.drop_duplicates()
         if self.target_column in df.columns:
             df = df.dropna(subset=[self.target_column])  # Elimina righe senza il target
@@ -33,6 +46,86 @@ class DataCleaner:
 
         return df
 
+    def _clean_fusa(self, df):
+        """
+        Pulizia con meno passate e senza copie intermedie del dataset, con lo stesso risultato di clean:
+        - i duplicati vengono trovati con un hash a 64 bit per riga, verificato confrontando i
+          valori con quelli della prima riga con lo stesso hash; insieme si scartano le righe
+          senza target
+        - vengono convertite in numero solo le colonne non numeriche, e solo sulle righe tenute
+        - le righe con valori NaN si trovano con una maschera aggiornata colonna per colonna
+        Il DataFrame finale, con le sole righe rimaste, è l'unica copia del dataset.
+        """
+        if self.target_column not in df.columns:
+            raise KeyError(f"La colonna target '{self.target_column}' non esiste nel dataset.")
+
+        righe = np.flatnonzero(~self._duplicati(df) & df[self.target_column].notna().to_numpy())
+        print("Dataset pulito: duplicati rimossi e target senza valore eliminato.")
+
+        complete = np.ones(len(righe), dtype=bool)
+        valori_nan, convertite = {}, {}
+        for colonna in df.columns:
+            serie = df[colonna]
+            if pd.api.types.is_numeric_dtype(serie):
+                mancanti = serie.isna().to_numpy()[righe]
+            else:
+                convertite[colonna] = pd.to_numeric(serie.iloc[righe], errors='coerce').to_numpy()  # Converte stringhe in NaN
+                mancanti = pd.isna(convertite[colonna])
+            valori_nan[colonna] = int(mancanti.sum())
+            complete &= ~mancanti
+
+        print("Valori NaN dopo conversione numerica:\n", pd.Series(valori_nan))
+        df = df.take(righe[complete])  # Rimuove tutte le righe con almeno un valore NaN
+        for colonna, valori in convertite.items():
+            df[colonna] = valori[complete]
+        return df
+
+    @staticmethod
+    def _duplicati(df):
+        """
+        Segna le righe uguali a una riga precedente (come drop_duplicates con keep='first').
+        Le righe con lo stesso hash vengono confrontate colonna per colonna con la prima riga
+        con quell'hash: in caso di collisione la riga viene tenuta.
+        """
+        codici, uniche = pd.factorize(pd.util.hash_pandas_object(df, index=False).to_numpy())
+        posizioni = np.arange(len(df))
+        prime = np.empty(len(uniche), dtype=np.intp)
+        prime[codici[::-1]] = posizioni[::-1]  # vince l'ultima assegnazione, cioè la prima riga
+        candidati = np.flatnonzero(prime[codici] != posizioni)
+        originali = prime[codici[candidati]]
+
+        uguali = np.ones(len(candidati), dtype=bool)
+        for colonna in df.columns:
+            valori = df[colonna].to_numpy()
+            a, b = valori[candidati], valori[originali]
+            uguali &= (a == b) | (pd.isna(a) & pd.isna(b))
+
+        duplicati = np.zeros(len(df), dtype=bool)
+        duplicati[candidati[uguali]] = True
+        return duplicati
+
+    def confronta_memoria(self, df):
+        """
+        Esegue sia la pulizia classica sia quella fusa misurando con tracemalloc il picco di
+        memoria allocata da ciascuna e stampa quanto risparmia la modalità fusa.
+
+        Ritorna:
+        dict con i picchi in byte ("picco_classica", "picco_fusa") e il "risparmio"
+        """
+        picchi = {}
+        for nome, fusa in (("picco_classica", False), ("picco_fusa", True)):
+            tracemalloc.start()
+            try:
+                DataCleaner(self.target_column, fusa=fusa).clean(df)
+                picchi[nome] = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+
+        picchi["risparmio"] = picchi["picco_classica"] - picchi["picco_fusa"]
+        print(f"Picco di memoria: classica {picchi['picco_classica'] / 2**20:.1f} MB, "
+              f"fusa {picchi['picco_fusa'] / 2**20:.1f} MB (risparmio {picchi['risparmio'] / 2**20:.1f} MB)")
+        return picchi
+
 
 class MissingValueHandler:
     """
@@ -46,9 +139,12 @@ class MissingValueHandler:
         else:
             self.method = method
 
+    @misurata("imputazione")
     def clean(self, df):
         """
         Riempie i valori mancanti con il metodo scelto.
+        I valori di riempimento restano salvati (vedi fit) e possono essere applicati a nuovi
+        dati con transform.
 
         Parametri:
         df (pd.DataFrame) - Il dataset da processare
@@ -56,18 +152,62 @@ class MissingValueHandler:
         Ritorna:
         pd.DataFrame - Dataset con valori mancanti riempiti
         """
-        for col in df.select_dtypes(include=["number"]).columns:
-            if self.method == "mean":
-                df[col] = df[col].fillna(df[col].dropna().mean())
-            elif self.method == "median":
-                df[col] = df[col].fillna(df[col].dropna().median())
-            elif self.method == "mode":
-                mode_value = df[col].dropna().mode()
-                df[col] = df[col].fillna(mode_value.iloc[0] if not mode_value.empty else df[col].dropna().median())
+        df = self.fit(df).transform(df)
 
         print(f"Valori mancanti riempiti con {self.method}.")
         return df
 
+    def fit(self, df):
+        """
+        Calcola e memorizza il valore di riempimento (media, mediana o moda) di ogni colonna numerica,
+        in float64 anche se le colonne sono memorizzate in float32. Per la moda, se la colonna non
+        ha valori si usa la mediana.
+
+        Ritorna:
+        self
+        """
+        self.colonne = list(df.select_dtypes(include=["number"]).columns)
+        blocco = df[self.colonne].astype(np.float64)
+        if self.method == "mean":
+            valori = blocco.mean()
+        elif self.method == "median":
+            valori = blocco.median()
+        else:  # self.method == "mode"
+            mode_values = blocco.mode()
+            valori = mode_values.iloc[0] if not mode_values.empty else pd.Series(np.nan, index=self.colonne)
+            valori = valori.fillna(blocco.median())
+
+        self.valori = valori.to_numpy(dtype=np.float64)
+        return self
+
+    def transform(self, dati):
+        """
+        Sostituisce i valori mancanti con i valori calcolati da fit.
+
+        Parametri:
+        dati - pd.DataFrame oppure array NumPy con le sole colonne di fit, nello stesso ordine
+        (matrice n x n_colonne o singolo record)
+
+        Ritorna:
+        pd.DataFrame o np.ndarray senza valori mancanti
+        """
+        if isinstance(dati, pd.DataFrame):
+            return dati.fillna(dict(zip(self.colonne, self.valori)))
+        dati = np.asarray(dati, dtype=np.float64)
+        return np.where(np.isnan(dati), self.valori, dati)
+
+    def parametri(self) -> dict:
+        """Valori di riempimento calcolati da fit come dizionario serializzabile (ad esempio in JSON)."""
+        return {"method": self.method, "colonne": list(self.colonne), "valori": self.valori.tolist()}
+
+    @classmethod
+    def da_parametri(cls, parametri: dict):
+        """Ricostruisce un gestore già calcolato dai parametri restituiti da parametri()."""
+        gestore = cls(parametri["method"])
+        gestore.colonne = list(parametri["colonne"])
+        gestore.valori = np.asarray(parametri["valori"], dtype=np.float64)
+        return gestore
+
 
 def choose_missing_value_method():
     """
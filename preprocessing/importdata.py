@@ -1,39 +1,79 @@
+import numpy as np
 import pandas as pd
 import os
 from preprocessing.data_cleaner import DataCleaner, MissingValueHandler, choose_missing_value_method
 from preprocessing.normalizzazione import FeatureScaler, user_choose_scaling_method
+from preprocessing.cache import CachePreprocessing
+from profilazione import misurata
+
+# Tipi delle colonne note del dataset (version_1.csv): dichiararli evita l'inferenza dei tipi e
+# dimezza la memoria delle feature citologiche (valori interi da 1 a 10) rispetto a float64.
+# float32 è solo il formato di memorizzazione: le statistiche di imputazione e scaling sono
+# calcolate in float64. L'identificativo e il target (con possibili valori mancanti, quindi non
+# intero) restano float64, per non perdere cifre e non cambiare il tipo delle etichette.
+SCHEMA_COLONNE = {
+    "Sample code number": "float64",
+    "classtype_v1": "float64",
+    "Blood Pressure": "float32",
+    "Heart Rate": "float32",
+    "Mitoses": "float32",
+    "Normal Nucleoli": "float32",
+    "Single Epithelial Cell Size": "float32",
+    "uniformity_cellsize_xx": "float32",
+    "clump_thickness_ty": "float32",
+    "Marginal Adhesion": "float32",
+    "Bland Chromatin": "float32",
+    "Uniformity of Cell Shape": "float32",
+    "bareNucleix_wrong": "float32",
+}
 
 
 class DatasetProcessor:
     """
     Classe per il caricamento e preprocessing di un dataset in diversi formati.
-    Supporta file CSV, Excel, JSON, TSV e TXT.
+    Supporta file CSV, Excel, JSON, TSV e TXT e i formati binari Parquet, Feather e .npy.
     """
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, schema: dict = SCHEMA_COLONNE):
         """
         Inizializza il processore del dataset con il percorso del file.
+        schema: tipi delle colonne note ({colonna: dtype}); None per usare l'inferenza di pandas.
         """
         self.file_path = file_path
         self.file_extension = os.path.splitext(file_path)[1].lower()  # Estrai l'estensione una sola volta
+        self.schema = schema or {}
         self.data = None  # Memorizza il dataset caricato
 
-    def load_data(self):
+    @misurata("caricamento")
+    def load_data(self, dimensione_chunk: int = None):
         """
         Carica il dataset in base all'estensione del file.
 
+        Parametri:
+        dimensione_chunk (int) - se indicato, i file di testo vengono letti a blocchi di questo
+        numero di righe e convertiti nei tipi dello schema blocco per blocco, come in iter_chunks
+        (picco di memoria del parser limitato a un blocco). Il risultato è comunque l'intero
+        dataset: per file che non entrano in memoria va usato direttamente iter_chunks
+
         Ritorna:
         pd.DataFrame: Dataset caricato, oppure None in caso di errore.
         """
         try:
-            if self.file_extension == ".csv":
-                self.data = pd.read_csv(self.file_path)
+            if self.file_extension in (".csv", ".tsv", ".txt"):
+                if dimensione_chunk:
+                    self.data = pd.concat(self.iter_chunks(dimensione_chunk), ignore_index=True)
+                else:
+                    self.data = self._leggi_testo()
             elif self.file_extension == ".xlsx":
-                self.data = pd.read_excel(self.file_path)
+                self.data = self._applica_schema(pd.read_excel(self.file_path))
             elif self.file_extension == ".json":
-                self.data = pd.read_json(self.file_path)
-            elif self.file_extension in (".tsv", ".txt"):
-                self.data = pd.read_csv(self.file_path, sep="\t")
+                self.data = self._applica_schema(pd.read_json(self.file_path))
+            elif self.file_extension == ".parquet":
+                self.data = self._applica_schema(pd.read_parquet(self.file_path))
+            elif self.file_extension == ".feather":
+                self.data = self._applica_schema(pd.read_feather(self.file_path))
+            elif self.file_extension == ".npy":
+                self.data = self._applica_schema(self._leggi_npy())
             else:
                 raise ValueError(f"Formato di file non supportato: {self.file_extension}")
 
@@ -44,16 +84,159 @@ class DatasetProcessor:
             print(f"Errore nel caricamento del file: {e}")
             return None  # Restituisce None se il caricamento fallisce
 
-def load_and_prepare_data(file_path):
-    """Carica, pulisce e pre-processa il dataset."""
+    def iter_chunks(self, dimensione_chunk: int = 100_000):
+        """
+        Legge il dataset a blocchi di dimensione_chunk righe, per file che non entrano in memoria.
+        Il file viene letto una sola volta e ogni blocco viene convertito nei tipi dello schema
+        appena letto: i valori non numerici delle colonne dello schema (es. "1,0") diventano NaN,
+        come farebbe DataCleaner, così ogni blocco ha gli stessi tipi qualunque sia il suo contenuto.
+        Supporta i file di testo e Parquet (che richiede pyarrow); gli altri formati vengono
+        caricati interi e divisi in blocchi.
+
+        Ritorna:
+        generatore di pd.DataFrame
+        """
+        if self.file_extension in (".csv", ".tsv", ".txt"):
+            for blocco in pd.read_csv(self.file_path, sep=self._separatore(), chunksize=dimensione_chunk):
+                yield self._applica_schema(blocco, forza=True)
+
+        elif self.file_extension == ".parquet":
+            import pyarrow.parquet as pq  # dipendenza opzionale, serve solo per Parquet
+
+            for batch in pq.ParquetFile(self.file_path).iter_batches(batch_size=dimensione_chunk):
+                yield self._applica_schema(batch.to_pandas())
+
+        else:
+            dati = self.load_data()
+            if dati is None:
+                return
+            for inizio in range(0, len(dati), dimensione_chunk):
+                yield dati.iloc[inizio:inizio + dimensione_chunk]
+
+    def _separatore(self):
+        return "," if self.file_extension == ".csv" else "\t"
+
+    def _leggi_testo(self):
+        """
+        Legge un file di testo in una sola passata, con l'inferenza dei tipi di pandas, e converte
+        nei tipi dello schema le colonne note numeriche; le colonne con valori non numerici
+        restano testo e vengono convertite da DataCleaner.
+        """
+        return self._applica_schema(pd.read_csv(self.file_path, sep=self._separatore()))
+
+    def _leggi_npy(self):
+        """
+        Legge un file .npy mappandolo in memoria: un array strutturato diventa un DataFrame
+        con i nomi dei campi come colonne, una matrice 2D un DataFrame con colonne numerate.
+        """
+        array = np.load(self.file_path, mmap_mode="r", allow_pickle=False)
+        if array.dtype.names:
+            return pd.DataFrame({nome: np.asarray(array[nome]) for nome in array.dtype.names})
+        return pd.DataFrame(np.asarray(array))
+
+    def _applica_schema(self, df, forza: bool = False):
+        """
+        Converte nei tipi dello schema le colonne note già numeriche; quelle con valori non
+        numerici restano invariate e vengono gestite da DataCleaner, oppure, con forza=True,
+        vengono convertite con i valori non numerici come NaN.
+        """
+        for colonna, tipo in self.schema.items():
+            if colonna not in df.columns:
+                continue
+            valori = df[colonna]
+            if not pd.api.types.is_numeric_dtype(valori):
+                if not forza:
+                    continue
+                valori = pd.to_numeric(valori, errors="coerce")
+            if valori.dtype != tipo:
+                df[colonna] = valori.astype(tipo)  # una colonna alla volta: la copia originale viene liberata subito
+        return df
+
+def load_and_prepare_data(file_path, metodo_imputazione=None, metodo_scaling=None, cache=False,
+                          restituisci_trasformazioni=False):
+    """
+    Carica, pulisce e pre-processa il dataset.
+
+    Parametri:
+    metodo_imputazione, metodo_scaling (str) - se non indicati vengono chiesti all'utente
+    cache (bool, str o CachePreprocessing) - disattivata di default; se attiva, il risultato
+    viene salvato su disco (True: nella cartella .cache/preprocessing della directory corrente,
+    str: nella cartella indicata) e le esecuzioni successive con lo stesso file e gli stessi
+    metodi saltano il preprocessing. Feature e target letti dalla cache sono mappati in memoria
+    in sola lettura: per modificarli va fatta prima una copia.
+    restituisci_trasformazioni (bool) - se True restituisce anche le trasformazioni calcolate,
+    da salvare con il modello (vedi prepare_features)
+
+    Ritorna:
+    tupla (features, target), oppure (features, target, trasformazioni)
+    """
+    if metodo_imputazione is None:
+        metodo_imputazione = choose_missing_value_method()
+    if metodo_scaling is None:
+        metodo_scaling = user_choose_scaling_method()
+
+    if cache is True:
+        cache = CachePreprocessing()
+    elif isinstance(cache, str):
+        cache = CachePreprocessing(cache)
+    chiave = None
+    if cache:
+        try:
+            chiave = cache.chiave(file_path, metodo_imputazione, metodo_scaling)
+        except OSError:
+            chiave = None  # file non leggibile: l'errore viene segnalato dal caricamento
+        if chiave is not None:
+            features, target = cache.carica(chiave)
+            trasformazioni = cache.trasformazioni(chiave) if features is not None else None
+            if features is not None and (trasformazioni is not None or not restituisci_trasformazioni):
+                print("Dataset pre-processato caricato dalla cache.")
+                return (features, target, trasformazioni) if restituisci_trasformazioni else (features, target)
+
+    df = load_and_clean_data(file_path)
+    if df is None:
+        return (None, None, None) if restituisci_trasformazioni else (None, None)
+    features, target, trasformazioni = prepare_features(df, metodo_imputazione, metodo_scaling, True)
+
+    if cache and chiave is not None:
+        try:
+            cache.salva(chiave, features, target, trasformazioni)
+            features, target = cache.carica(chiave)
+        except OSError as e:
+            print(f"Impossibile salvare il dataset nella cache: {e}")
+    return (features, target, trasformazioni) if restituisci_trasformazioni else (features, target)
+
+
+def load_and_clean_data(file_path):
+    """
+    Carica il dataset e lo pulisce (DataCleaner, nella modalità fusa che dà lo stesso risultato
+    con meno memoria). Il risultato non dipende dai metodi di imputazione e scaling, quindi può
+    essere riusato per più configurazioni.
+    """
     df = DatasetProcessor(file_path).load_data()
     if df is None or df.empty:
         print("Errore: Dataset vuoto o non caricato correttamente.")
-        return None, None
-    df = DataCleaner("classtype_v1").clean(df)
-    df = MissingValueHandler(choose_missing_value_method()).clean(df)
-    df = FeatureScaler(target_column="classtype_v1").scale_features(df, user_choose_scaling_method())
-        
+        return None
+    return DataCleaner("classtype_v1", fusa=True).clean(df)
+
+
+def prepare_features(df, metodo_imputazione, metodo_scaling, restituisci_trasformazioni=False):
+    """
+    Applica imputazione e scaling a un dataset già pulito, senza modificarlo.
+
+    Con restituisci_trasformazioni=True restituisce anche le trasformazioni calcolate, come
+    dizionario {"imputazione": MissingValueHandler, "scaling": FeatureScaler}: è il preprocessing
+    da salvare con il modello (ClassificatoreKNN.salva) per classificare nuovi record grezzi.
+
+    Ritorna:
+    tupla (features, target), oppure (features, target, trasformazioni)
+    """
+    imputazione = MissingValueHandler(metodo_imputazione)
+    scaling = FeatureScaler(target_column="classtype_v1")
+    df = imputazione.clean(df.copy())
+    df = scaling.scale_features(df, metodo_scaling)
+
     features = df.drop(columns=["classtype_v1"], errors='ignore')
     target = df["classtype_v1"]
+    if restituisci_trasformazioni:
+        return features, target, {"imputazione": imputazione, "scaling": scaling}
     return features, target
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+
+class PreprocessingInferenza:
+    """
+    Applica a nuovi record le trasformazioni calcolate sul training (imputazione e scaling), già
+    allineate alle colonne del modello: la trasformazione di un blocco di record è un'unica
+    operazione vettoriale, senza passare da pandas.
+
+    Le colonne del modello che non compaiono nelle trasformazioni restano invariate (e gli
+    eventuali NaN restano NaN).
+    """
+
+    def __init__(self, colonne, imputazione=None, scaling=None):
+        """
+        colonne: colonne del modello, nell'ordine della matrice di training
+        imputazione: MissingValueHandler già calcolato (fit), opzionale
+        scaling: FeatureScaler già calcolato (fit), opzionale
+        """
+        self.colonne = list(colonne)
+        riempimento = dict(zip(imputazione.colonne, imputazione.valori)) if imputazione is not None else {}
+        offset = dict(zip(scaling.colonne, scaling.offset)) if scaling is not None else {}
+        scala = dict(zip(scaling.colonne, scaling.scala)) if scaling is not None else {}
+
+        self.riempimento = np.array([riempimento.get(c, np.nan) for c in self.colonne], dtype=np.float64)
+        self.offset = np.array([offset.get(c, 0.0) for c in self.colonne], dtype=np.float64)
+        self.scala = np.array([scala.get(c, 1.0) for c in self.colonne], dtype=np.float64)
+
+    @classmethod
+    def da_modello(cls, modello):
+        """Costruisce il preprocessing dalle trasformazioni salvate con un ClassificatoreKNN."""
+        return cls(modello.features.columns, modello.preprocessing.get("imputazione"), modello.preprocessing.get("scaling"))
+
+    def matrice(self, dati) -> np.ndarray:
+        """
+        Converte i record in una matrice float64 con le colonne del modello, nell'ordine giusto.
+
+        dati: pd.DataFrame (le colonne mancanti diventano NaN, i valori non numerici NaN),
+        lista di dizionari {colonna: valore}, oppure array già ordinato come le colonne
+        """
+        if isinstance(dati, list) and dati and isinstance(dati[0], dict):
+            dati = pd.DataFrame.from_records(dati)
+        if isinstance(dati, pd.DataFrame):
+            dati = dati.reindex(columns=self.colonne).apply(pd.to_numeric, errors='coerce')
+            return dati.to_numpy(dtype=np.float64, na_value=np.nan)
+        dati = np.asarray(dati, dtype=np.float64)
+        return dati.reshape(1, -1) if dati.ndim == 1 else dati
+
+    def transform(self, dati) -> np.ndarray:
+        """Riempie i valori mancanti e applica lo scaling; restituisce una matrice float64."""
+        matrice = self.matrice(dati)
+        matrice = np.where(np.isnan(matrice), self.riempimento, matrice)
+        return (matrice - self.offset) / self.scala
@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from profilazione import misurata
+
 class FeatureScaler:
     """
     Classe per applicare Normalizzazione (Min-Max) o Standardizzazione (Z-score) su un dataset.
@@ -11,10 +13,13 @@ class FeatureScaler:
         self.target_column = target_column  # Esclude questa colonna dallo scaling
         self.id_column = id_column  # Colonna ID da rimuovere prima del training
 
+    @misurata("scaling")
     def scale_features(self, df, method):
         """
         Applica il metodo scelto (Normalizzazione o Standardizzazione) a tutte le colonne numeriche, 
         escludendo la colonna target. Inoltre, rimuove la colonna identificativa prima del training.
+        I parametri calcolati restano salvati (vedi fit) e possono essere applicati a nuovi dati
+        con transform.
 
         Parametri:
         df (pd.DataFrame) - Il dataset da scalare
@@ -29,34 +34,78 @@ class FeatureScaler:
             print(f"Errore: La colonna target '{self.target_column}' non esiste nel dataset!")
             return None
 
+        df_scaled = self.fit(df, method).transform(df)
+
+        # Rimuove la colonna ID prima del training
+        if self.id_column in df_scaled.columns:
+            df_scaled = df_scaled.drop(columns=[self.id_column])
+            print(f"\n La colonna '{self.id_column}' è stata rimossa prima del training.")
+
+        print(f"\n Metodo applicato a tutte le feature (tranne '{self.target_column}'): {self.method.upper()}")
+        return df_scaled
+
+    def fit(self, df, method):
+        """
+        Calcola e memorizza, per ogni colonna numerica (escluse target e ID), lo scostamento e il
+        fattore di scala: minimo e intervallo (max - min) per la normalizzazione, media e
+        deviazione standard per la standardizzazione, sempre in float64 anche se le colonne sono
+        memorizzate in float32. Le colonne costanti hanno scala 1, così vengono trasformate in 0
+        invece che in NaN.
+
+        Ritorna:
+        self
+        """
         if method not in ["normalize", "standardize"]:
             print("Il metodo non è valido! Uso di default: Normalizzazione (Min-Max).")
             method = "normalize"
 
-        df_scaled = df.copy()
-        numeric_columns = [col for col in df.select_dtypes(include=[np.number]).columns if col not in [self.target_column, self.id_column]]
+        self.method = method
+        self.colonne = [col for col in df.select_dtypes(include=[np.number]).columns if col not in [self.target_column, self.id_column]]
+        blocco = df[self.colonne].astype(np.float64)
 
         if method == "standardize":
-            for column in numeric_columns:
-                mean_val = df[column].mean()
-                std_val = df[column].std()
-                df_scaled[column] = (df[column] - mean_val) / std_val
+            offset, scala = blocco.mean(), blocco.std()
         else:  # method == "normalize"
-            for column in numeric_columns:
-                min_val = df[column].min()
-                max_val = df[column].max()
-                if min_val == max_val: # Evita divisione per zero
-                    df_scaled[column] = 0
-                else:
-                    df_scaled[column] = (df[column] - min_val) / (max_val - min_val)
+            offset = blocco.min()
+            scala = blocco.max() - offset
 
-        # Rimuove la colonna ID prima del training
-        if self.id_column in df_scaled.columns:
-            df_scaled = df_scaled.drop(columns=[self.id_column])
-            print(f"\n La colonna '{self.id_column}' è stata rimossa prima del training.")
+        self.offset = offset.to_numpy(dtype=np.float64)
+        scala = scala.to_numpy(dtype=np.float64)
+        self.scala = np.where((scala == 0) | np.isnan(scala), 1.0, scala)  # Evita divisione per zero
+        return self
 
-        print(f"\n Metodo applicato a tutte le feature (tranne '{self.target_column}'): {method.upper()}")
-        return df_scaled
+    def transform(self, dati):
+        """
+        Applica i parametri calcolati da fit con un'unica operazione vettoriale.
+
+        Parametri:
+        dati - pd.DataFrame (vengono trasformate le colonne viste in fit, le altre restano invariate)
+        oppure array NumPy con le sole colonne di fit, nello stesso ordine: una matrice
+        n x n_colonne o un singolo record
+
+        Ritorna:
+        pd.DataFrame o np.ndarray trasformato
+        """
+        if isinstance(dati, pd.DataFrame):
+            df_scaled = dati.copy()
+            df_scaled[self.colonne] = (dati[self.colonne].to_numpy(dtype=np.float64) - self.offset) / self.scala
+            return df_scaled
+        return (np.asarray(dati, dtype=np.float64) - self.offset) / self.scala
+
+    def parametri(self) -> dict:
+        """Parametri calcolati da fit come dizionario serializzabile (ad esempio in JSON)."""
+        return {"method": self.method, "target_column": self.target_column, "id_column": self.id_column,
+                "colonne": list(self.colonne), "offset": self.offset.tolist(), "scala": self.scala.tolist()}
+
+    @classmethod
+    def da_parametri(cls, parametri: dict):
+        """Ricostruisce uno scaler già calcolato dai parametri restituiti da parametri()."""
+        scaler = cls(parametri["target_column"], parametri["id_column"])
+        scaler.method = parametri["method"]
+        scaler.colonne = list(parametri["colonne"])
+        scaler.offset = np.asarray(parametri["offset"], dtype=np.float64)
+        scaler.scala = np.asarray(parametri["scala"], dtype=np.float64)
+        return scaler
 
 def user_choose_scaling_method():
     """
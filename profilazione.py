@@ -0,0 +1,201 @@
+"""
+Profilazione delle fasi della pipeline: caricamento, pulizia, imputazione, scaling, split,
+addestramento, ricerca dei vicini, metriche ed esportazione dei risultati.
+
+Le funzioni principali sono marcate con il decoratore misurata("nome") e i blocchi con
+"with fase(nome)". Finché la profilazione non è attiva il costo è un solo controllo su una
+variabile globale; dopo attiva() ogni fase registra numero di chiamate, tempo reale
+(perf_counter) e tempo di CPU del processo (process_time). Le fasi annidate sono registrate
+con il loro percorso, ad esempio "k_fold/fold 3/ricerca_vicini", così i tempi si leggono
+anche fold per fold; il riepilogo somma le fasi con lo stesso nome.
+
+Con cprofile=True viene registrato anche un profilo cProfile completo, di cui il report
+riporta le funzioni più costose. Con n_jobs > 1 il lavoro dei processi del pool non è
+misurato fold per fold: resta solo il tempo complessivo della strategia.
+
+Uso:
+    with profilazione() as profilatore:
+        ...
+    profilatore.salva("results/profilazione.json")
+
+oppure, con main.py, la variabile d'ambiente PROFILAZIONE=1 (o PROFILAZIONE=cprofile).
+"""
+
+import contextlib
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import threading
+import time
+
+# profilatore attivo, None se la profilazione è spenta
+_ATTIVO = None
+_NULLA = contextlib.nullcontext()
+
+# variabile d'ambiente che attiva la profilazione negli script (1, oppure cprofile)
+VARIABILE_AMBIENTE = "PROFILAZIONE"
+
+# numero di funzioni di cProfile riportate nel report, ordinate per tempo cumulativo
+FUNZIONI_CPROFILE = 30
+
+
+class Profilatore:
+    """Raccoglie chiamate, tempo reale e tempo di CPU di ogni fase."""
+
+    def __init__(self, cprofile: bool = False):
+        self.misure = {}  # percorso della fase -> [chiamate, tempo reale, tempo di CPU]
+        self._locale = threading.local()  # pila delle fasi aperte, separata per thread
+        self._cprofile = cProfile.Profile() if cprofile else None
+        self._inizio = None
+        self.durata = None
+        self.durata_cpu = None
+
+    def avvia(self):
+        self._inizio = (time.perf_counter(), time.process_time())
+        if self._cprofile is not None:
+            self._cprofile.enable()
+        return self
+
+    def ferma(self):
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        self.durata = time.perf_counter() - self._inizio[0]
+        self.durata_cpu = time.process_time() - self._inizio[1]
+        return self
+
+    def fase(self, nome: str):
+        return _Misura(self, nome)
+
+    def _pila(self) -> list:
+        pila = getattr(self._locale, "pila", None)
+        if pila is None:
+            pila = self._locale.pila = []
+        return pila
+
+    def riepilogo(self) -> dict:
+        """Chiamate e tempi sommati per nome della fase (l'ultimo elemento del percorso)."""
+        totali = {}
+        for percorso, (chiamate, reale, cpu) in self.misure.items():
+            nome = percorso.rsplit("/", 1)[-1]
+            if nome.startswith("fold ") or nome.startswith("blocco "):
+                nome = nome.split(" ", 1)[0]
+            somma = totali.setdefault(nome, [0, 0.0, 0.0])
+            somma[0] += chiamate
+            somma[1] += reale
+            somma[2] += cpu
+        return {nome: {"chiamate": c, "tempo": r, "tempo_cpu": p} for nome, (c, r, p) in totali.items()}
+
+    def report(self) -> dict:
+        """Report completo, serializzabile in JSON."""
+        report = {
+            "tempo_totale": self.durata, "tempo_cpu_totale": self.durata_cpu,
+            "fasi": [{"fase": percorso, "chiamate": chiamate, "tempo": reale, "tempo_cpu": cpu}
+                     for percorso, (chiamate, reale, cpu) in self.misure.items()],
+            "riepilogo": self.riepilogo(),
+        }
+        if self._cprofile is not None:
+            statistiche = pstats.Stats(self._cprofile, stream=io.StringIO())
+            funzioni = sorted(statistiche.stats.items(), key=lambda voce: voce[1][3], reverse=True)
+            report["cprofile"] = [{"funzione": f"{file}:{riga}({nome})", "chiamate": chiamate,
+                                   "tempo_proprio": proprio, "tempo_cumulativo": cumulativo}
+                                  for (file, riga, nome), (_, chiamate, proprio, cumulativo, _)
+                                  in funzioni[:FUNZIONI_CPROFILE]]
+        return report
+
+    def salva(self, percorso: str) -> str:
+        """Scrive il report in JSON e, con cProfile, il profilo completo in un file .prof accanto."""
+        if os.path.dirname(percorso):
+            os.makedirs(os.path.dirname(percorso), exist_ok=True)
+        with open(percorso, "w", encoding="utf-8") as file:
+            json.dump(self.report(), file, indent=2)
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(os.path.splitext(percorso)[0] + ".prof")
+        return percorso
+
+
+class _Misura:
+    """Context manager di una fase: al termine aggiunge i tempi al percorso corrente."""
+
+    __slots__ = ("profilatore", "nome", "percorso", "inizio")
+
+    def __init__(self, profilatore: Profilatore, nome: str):
+        self.profilatore = profilatore
+        self.nome = nome
+
+    def __enter__(self):
+        pila = self.profilatore._pila()
+        pila.append(self.nome)
+        self.percorso = "/".join(pila)
+        self.inizio = (time.perf_counter(), time.process_time())
+        return self
+
+    def __exit__(self, *errore):
+        reale = time.perf_counter() - self.inizio[0]
+        cpu = time.process_time() - self.inizio[1]
+        self.profilatore._pila().pop()
+        misura = self.profilatore.misure.setdefault(self.percorso, [0, 0.0, 0.0])
+        misura[0] += 1
+        misura[1] += reale
+        misura[2] += cpu
+        return False
+
+
+def attiva(cprofile: bool = False) -> Profilatore:
+    """Attiva la profilazione (sostituendo un eventuale profilatore già attivo) e lo restituisce."""
+    global _ATTIVO
+    _ATTIVO = Profilatore(cprofile).avvia()
+    return _ATTIVO
+
+
+def disattiva() -> Profilatore:
+    """Spegne la profilazione e restituisce il profilatore che era attivo (o None)."""
+    global _ATTIVO
+    profilatore, _ATTIVO = _ATTIVO, None
+    return profilatore.ferma() if profilatore is not None else None
+
+
+def attivo() -> Profilatore:
+    """Il profilatore attivo, None se la profilazione è spenta."""
+    return _ATTIVO
+
+
+def attiva_da_ambiente() -> Profilatore:
+    """Attiva la profilazione se la variabile d'ambiente PROFILAZIONE lo richiede, altrimenti restituisce None."""
+    valore = os.environ.get(VARIABILE_AMBIENTE, "").strip().lower()
+    if valore in ("", "0", "no", "false"):
+        return None
+    return attiva(cprofile=valore == "cprofile")
+
+
+@contextlib.contextmanager
+def profilazione(cprofile: bool = False):
+    """Attiva la profilazione per la durata del blocco with."""
+    profilatore = attiva(cprofile)
+    try:
+        yield profilatore
+    finally:
+        if _ATTIVO is profilatore:
+            disattiva()
+
+
+def fase(nome: str):
+    """Context manager che misura un blocco di codice come fase nome (nessun costo se spenta)."""
+    profilatore = _ATTIVO
+    return _NULLA if profilatore is None else profilatore.fase(nome)
+
+
+def misurata(nome: str):
+    """Decoratore: ogni chiamata della funzione è misurata come fase nome."""
+    def decoratore(funzione):
+        @functools.wraps(funzione)
+        def misurata_(*args, **kwargs):
+            profilatore = _ATTIVO
+            if profilatore is None:
+                return funzione(*args, **kwargs)
+            with profilatore.fase(nome):
+                return funzione(*args, **kwargs)
+        return misurata_
+    return decoratore
@@ -1,71 +1,88 @@
-import pandas as pd
+import io
 import os
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
-from openpyxl import load_workbook
-from openpyxl.drawing.image import Image
+import numpy as np
+import pandas as pd
 from validation.visualizzazione import plot_confusion_matrix, plot_metriche_bar, plot_roc_curve
+from profilazione import fase, misurata
 
-def save_results_to_excel(metrics_result, y_test, y_pred):
+# righe di un foglio Excel, intestazione compresa: le predizioni oltre questo limite non vengono scritte
+RIGHE_MASSIME_FOGLIO = 1_048_576
+
+@misurata("esportazione")
+def save_results_to_excel(metrics_result, y_test, y_pred, grafici=True, predizioni=True, salva_immagini=True,
+                          results_dir="results"):
     """
     Salva i risultati della validazione in un file Excel e aggiunge i grafici delle metriche.
 
+    Il file viene costruito in un'unica passata in modalità write-only di openpyxl: le righe
+    vengono scritte in streaming senza tenere in memoria le celle del foglio, e i grafici sono
+    disegnati in buffer in memoria (PNG) incorporati direttamente, senza file intermedi.
+    Con molte predizioni il costo è la serializzazione XML di openpyxl, molto più veloce se è
+    installato lxml.
+
     Args:
         metrics_result (dict): Dizionario con le metriche calcolate.
         y_test (pd.Series): Valori reali del target.
         y_pred (array-like): Valori predetti.
+        grafici (bool): se False non disegna i grafici (l'esportazione più costosa).
+        predizioni (bool): se True aggiunge, dopo i fogli dei grafici, il foglio "Predictions" con
+            valore reale e predetto di ogni campione (al massimo RIGHE_MASSIME_FOGLIO - 1 righe).
+        salva_immagini (bool): se True (default) salva anche i grafici come PNG in results_dir,
+            come confusion_matrix.png, roc_curve.png e metrics_bar_chart.png.
+        results_dir (str): cartella del file validation_results.xlsx.
     """
-    results_dir = "results"
+    # matplotlib e openpyxl vengono importati solo al primo salvataggio, non all'avvio del programma
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from openpyxl import Workbook
+    from openpyxl.drawing.image import Image
+
     os.makedirs(results_dir, exist_ok=True)
     excel_file = os.path.join(results_dir, "validation_results.xlsx")
+    y_test = pd.Series(y_test)
+    y_pred = np.asarray(y_pred)
 
-    # Salva le metriche in un file Excel
-    metrics_df = pd.DataFrame(metrics_result.items(), columns=["Metric", "Value"])
-    metrics_df.to_excel(excel_file, index=False)
-    print(f"\nRisultati salvati in {excel_file}")
-
-    # Salva i grafici come immagini
-    confusion_matrix_file = os.path.join(results_dir, "confusion_matrix.png")
-    roc_curve_file = os.path.join(results_dir, "roc_curve.png")
-    metrics_bar_chart_file = os.path.join(results_dir, "metrics_bar_chart.png")
+    wb = Workbook(write_only=True)
 
-    plot_confusion_matrix(y_test.to_numpy(), y_pred)
-    plt.savefig(confusion_matrix_file, bbox_inches='tight')
-    plt.close()
+    # Foglio delle metriche (stesso nome e stesse colonne del file scritto in precedenza con to_excel)
+    ws = wb.create_sheet(title="Sheet1")
+    ws.append(["Metric", "Value"])
+    for metrica, valore in metrics_result.items():
+        ws.append([metrica, None if valore is None else float(valore)])
 
-    plot_roc_curve(y_test.to_numpy(), y_pred)
-    plt.savefig(roc_curve_file, bbox_inches='tight')
-    plt.close()
+    if grafici:
+        # Lista di grafici e relativi nomi di fogli e di file
+        figure = [
+            (lambda: plot_confusion_matrix(y_test.to_numpy(), y_pred), "Confusion Matrix", "confusion_matrix.png"),
+            (lambda: plot_roc_curve(y_test.to_numpy(), y_pred), "ROC Curve", "roc_curve.png"),
+            (lambda: plot_metriche_bar(metrics_result), "Metrics", "metrics_bar_chart.png"),
+        ]
+        with fase("grafici"):
+            for disegna, sheet_name, nome_file in figure:
+                buffer = io.BytesIO()
+                disegna()
+                plt.savefig(buffer, format="png", bbox_inches='tight')
+                plt.close()
+                if salva_immagini:
+                    with open(os.path.join(results_dir, nome_file), "wb") as file:
+                        file.write(buffer.getvalue())
 
-    plot_metriche_bar(metrics_result)
-    plt.savefig(metrics_bar_chart_file, bbox_inches='tight')
-    plt.close()
+                ws = wb.create_sheet(title=sheet_name)  # Ogni grafico in un foglio separato
+                buffer.seek(0)
+                ws.add_image(Image(buffer), "A1")  # Inserisci l'immagine nella cella A1
 
-    print(f"\nGrafici salvati in {results_dir}")
+    # Predizioni campione per campione, scritte in streaming dopo i fogli già presenti nel file originale
+    if predizioni:
+        ws = wb.create_sheet(title="Predictions")
+        ws.append(["Sample", "Actual", "Predicted"])
+        n = min(len(y_pred), RIGHE_MASSIME_FOGLIO - 1)
+        if n < len(y_pred):
+            print(f"\nAttenzione: solo le prime {n} predizioni su {len(y_pred)} entrano nel foglio Excel")
+        for riga in zip(y_test.index[:n].tolist(), y_test.to_numpy()[:n].tolist(), y_pred[:n].tolist()):
+            ws.append(riga)
 
-    # Apre il file Excel e aggiungi le immagini in fogli separati
-    wb = load_workbook(excel_file)
-
-    # Lista di immagini e relativi nomi di fogli
-    image_files = [
-        (confusion_matrix_file, "Confusion Matrix"),
-        (roc_curve_file, "ROC Curve"),
-        (metrics_bar_chart_file, "Metrics")
-    ]
-
-    # Aggiungi ogni immagine in un foglio separato
-    for img_file, sheet_name in image_files:
-        ws = wb.create_sheet(title=sheet_name)  # Crea un nuovo foglio
-        img = Image(img_file)
-        ws.add_image(img, "A1")  # Inserisci l'immagine nella cella A1
-
-    # Elimina il foglio vuoto iniziale (se presente)
-    if "Sheet" in wb.sheetnames:
-        del wb["Sheet"]
-
-    # Salva il file Excel aggiornato
     wb.save(excel_file)
-    print(f"\nImmagini aggiunte in fogli separati e file aggiornato: {excel_file}")
-
-        
\ No newline at end of file
+    print(f"\nRisultati salvati in {excel_file}")
+    if grafici:
+        print("Grafici inseriti in fogli separati" + (f" e salvati in {results_dir}" if salva_immagini else ""))
@@ -0,0 +1,182 @@
+"""
+Scoring di un file di record non etichettati (CSV, TSV o Parquet) con un ClassificatoreKNN salvato.
+
+Il file viene letto a blocchi di --dimensione-chunk righe: ogni blocco passa per il preprocessing
+salvato nel modello (imputazione e scaling), viene classificato e le predizioni vengono subito
+aggiunte al file di output. Un thread di lettura prepara il blocco successivo mentre il blocco
+corrente viene classificato, e la coda tra i due contiene al massimo un blocco: la memoria usata
+resta limitata a pochi blocchi qualunque sia la dimensione del file.
+
+Il file di input deve contenere tutte le colonne del modello (le altre vengono ignorate),
+altrimenti lo scoring si interrompe con un errore. I valori non numerici sono trattati come
+mancanti. Il file di output contiene le colonne identificative (di default "Sample code number",
+se presente), la classe predetta e la 'probabilità' di classe 1. I record che restano incompleti
+dopo l'imputazione non vengono classificati (classe vuota).
+
+Uso: python score.py modello.knn input.csv output.csv [--dimensione-chunk 100000] [--colonne-id ...]
+"""
+
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from models import ClassificatoreKNN
+from preprocessing.importdata import DatasetProcessor
+from preprocessing.inferenza import PreprocessingInferenza
+
+COLONNE_ID = ["Sample code number"]
+_FINE = object()  # segnala al consumatore che la lettura è terminata
+
+
+def leggi_in_anticipo(blocchi, profondita: int = 1):
+    """
+    Itera sui blocchi leggendoli in un thread separato, al massimo profondita blocchi in anticipo
+    rispetto al consumatore. Un errore di lettura viene risollevato nel thread del consumatore.
+    """
+    coda = queue.Queue(maxsize=profondita)
+    interrompi = threading.Event()
+
+    def inserisci(elemento):
+        while not interrompi.is_set():
+            try:
+                coda.put(elemento, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def lettore():
+        try:
+            for blocco in blocchi:
+                if not inserisci(blocco):
+                    return
+            inserisci(_FINE)
+        except BaseException as e:
+            inserisci(e)
+
+    thread = threading.Thread(target=lettore, daemon=True)
+    thread.start()
+    try:
+        while True:
+            elemento = coda.get()
+            if elemento is _FINE:
+                break
+            if isinstance(elemento, BaseException):
+                raise elemento
+            yield elemento
+    finally:
+        interrompi.set()  # il consumatore si è fermato: sblocco e chiudo il lettore
+        thread.join()
+
+
+class ScrittoreRisultati:
+    """Aggiunge blocchi di risultati a un file CSV o Parquet (pyarrow) senza tenerli in memoria."""
+
+    def __init__(self, percorso: str):
+        self.percorso = percorso
+        self.parquet = percorso.endswith(".parquet")
+        self._scrittore = None
+        self._primo = True
+
+    def scrivi(self, blocco: pd.DataFrame):
+        if self.parquet:
+            import pyarrow as pa  # dipendenza opzionale, serve solo per Parquet
+            import pyarrow.parquet as pq
+
+            tabella = pa.Table.from_pandas(blocco, preserve_index=False)
+            if self._scrittore is None:
+                self._scrittore = pq.ParquetWriter(self.percorso, tabella.schema)
+            self._scrittore.write_table(tabella.cast(self._scrittore.schema))
+        else:
+            blocco.to_csv(self.percorso, mode="w" if self._primo else "a", header=self._primo, index=False)
+        self._primo = False
+
+    def chiudi(self):
+        if self._scrittore is not None:
+            self._scrittore.close()
+
+
+def classifica_blocco(modello: ClassificatoreKNN, preprocessing: PreprocessingInferenza, blocco: pd.DataFrame,
+                      colonne_id: list) -> pd.DataFrame:
+    """
+    Preprocessing e classificazione di un blocco; ritorna le colonne identificative e le predizioni.
+    Solleva ValueError se nel blocco mancano colonne del modello.
+    """
+    mancanti = [colonna for colonna in preprocessing.colonne if colonna not in blocco.columns]
+    if mancanti:
+        raise ValueError(f"Colonne del modello mancanti nel file: {mancanti}; colonne del modello: {preprocessing.colonne}")
+    matrice = preprocessing.transform(blocco)
+    validi = ~np.isnan(matrice).any(axis=1)
+
+    classi = np.zeros(len(blocco), dtype=np.int64)
+    probabilita = np.full(len(blocco), np.nan)
+    if validi.any():
+        previsioni, proba = modello.predict_e_proba_batch(matrice[validi])
+        classi[validi] = previsioni.to_numpy()
+        probabilita[validi] = proba.to_numpy()
+    classi = pd.array(classi, dtype="Int64")
+    classi[~validi] = pd.NA
+
+    risultato = blocco[[c for c in colonne_id if c in blocco.columns]].reset_index(drop=True)
+    risultato["classe"] = classi
+    risultato["probabilita"] = probabilita
+    return risultato
+
+
+def esegui_scoring(modello: ClassificatoreKNN, input_path: str, output_path: str,
+                   dimensione_chunk: int = 100_000, colonne_id: list = None) -> int:
+    """
+    Classifica tutto il file di input a blocchi e scrive le predizioni in output_path.
+
+    Ritorna:
+    numero di record classificati
+    """
+    colonne_id = COLONNE_ID if colonne_id is None else colonne_id
+    preprocessing = PreprocessingInferenza.da_modello(modello)
+    # senza schema: i record da classificare non hanno il target e i valori vengono comunque
+    # convertiti in numeri dal preprocessing
+    processore = DatasetProcessor(input_path, schema=None)
+
+    if os.path.dirname(output_path):
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    scrittore = ScrittoreRisultati(output_path)
+    totale, inizio = 0, time.perf_counter()
+    try:
+        for blocco in leggi_in_anticipo(processore.iter_chunks(dimensione_chunk)):
+            scrittore.scrivi(classifica_blocco(modello, preprocessing, blocco, colonne_id))
+            totale += len(blocco)
+            print(f"{totale} record classificati ({totale / (time.perf_counter() - inizio):.0f} record/s)")
+    finally:
+        scrittore.chiudi()
+    return totale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring a blocchi di un file di record con un modello knn salvato")
+    parser.add_argument("modello", help="file del modello salvato con ClassificatoreKNN.salva")
+    parser.add_argument("input", help="file CSV, TSV o Parquet con i record da classificare")
+    parser.add_argument("output", help="file di output (.csv oppure .parquet)")
+    parser.add_argument("--dimensione-chunk", type=int, default=100_000, help="righe lette e classificate per blocco")
+    parser.add_argument("--colonne-id", nargs="*", default=COLONNE_ID,
+                        help="colonne dell'input da copiare nell'output accanto alle predizioni")
+    argomenti = parser.parse_args(argv)
+
+    modello = ClassificatoreKNN.carica(argomenti.modello)
+    try:
+        totale = esegui_scoring(modello, argomenti.input, argomenti.output, argomenti.dimensione_chunk,
+                                argomenti.colonne_id)
+    except ValueError as e:
+        print(f"Errore: {e}")
+        return 1
+    print(f"\nPredizioni di {totale} record salvate in {argomenti.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
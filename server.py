@@ -0,0 +1,215 @@
+"""
+Servizio locale di predizione per un ClassificatoreKNN salvato (ClassificatoreKNN.salva).
+
+Il server accetta richieste HTTP su una porta TCP o su un socket Unix:
+
+- POST /predict con un record JSON, ad esempio {"Mitoses": 1, "Bland Chromatin": 3, ...}
+  (oppure una lista di valori nell'ordine delle colonne del modello); i valori mancanti
+  vengono riempiti e tutti scalati con il preprocessing salvato nel modello. Risponde con
+  {"classe": 1, "probabilita": 0.8}
+- GET /stats: latenze (media, p50, p95, p99) e dimensioni dei batch
+
+Le richieste che arrivano insieme vengono raccolte per qualche millisecondo (attesa_ms) e
+classificate con un'unica ricerca dei vicini in batch: sotto carico la latenza resta stabile
+perché il costo fisso di ogni ricerca è diviso tra tutte le richieste del batch.
+
+Uso: python server.py modello.knn [--porta 8000 | --socket /tmp/knn.sock] [--attesa-ms 2] [--batch-massimo 256]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from models import ClassificatoreKNN
+from preprocessing.inferenza import PreprocessingInferenza
+
+# numero di latenze e dimensioni dei batch più recenti conservate per le statistiche
+CAMPIONI_STATISTICHE = 10_000
+
+
+class MicroBatcher:
+    """
+    Raccoglie i record in arrivo e li classifica a batch. Il primo record apre un batch, che
+    viene eseguito dopo attesa_ms millisecondi o appena raggiunge batch_massimo record.
+    La ricerca dei vicini gira in un thread separato, così nel frattempo il ciclo asyncio
+    continua a ricevere le richieste del batch successivo.
+    """
+
+    def __init__(self, modello: ClassificatoreKNN, attesa_ms: float = 2.0, batch_massimo: int = 256):
+        self.modello = modello
+        self.preprocessing = PreprocessingInferenza.da_modello(modello)
+        self.attesa = attesa_ms / 1000
+        self.batch_massimo = batch_massimo
+        self.coda = asyncio.Queue()
+        self.esecutore = ThreadPoolExecutor(max_workers=1)
+        self.latenze = deque(maxlen=CAMPIONI_STATISTICHE)
+        self.dimensioni_batch = deque(maxlen=CAMPIONI_STATISTICHE)
+        self.richieste = 0
+        self.batch = 0
+
+    async def predici(self, record) -> dict:
+        """Accoda un record e attende la sua predizione."""
+        arrivo = time.perf_counter()
+        colonne = self.preprocessing.colonne
+        if isinstance(record, dict):
+            # chiavi sconosciute (o scritte male) verrebbero ignorate e i valori imputati in silenzio
+            sconosciute = sorted(set(record) - set(colonne))
+            if sconosciute:
+                return {"errore": f"colonne non presenti nel modello: {sconosciute}; colonne del modello: {colonne}"}
+            if not any(record.get(colonna) is not None for colonna in colonne):
+                return {"errore": f"il record non contiene nessuna colonna del modello: {colonne}"}
+            record = [record.get(colonna) for colonna in colonne]
+        if not isinstance(record, list) or len(record) != len(colonne):
+            return {"errore": f"il record deve avere le {len(colonne)} colonne del modello: {colonne}"}
+        try:
+            riga = np.array(record, dtype=np.float64)  # i valori assenti (None) diventano NaN
+        except (TypeError, ValueError):
+            return {"errore": "record con valori non numerici"}
+
+        futuro = asyncio.get_running_loop().create_future()
+        await self.coda.put((riga, futuro))
+        risultato = await futuro
+        self.latenze.append(time.perf_counter() - arrivo)
+        self.richieste += 1
+        return risultato
+
+    async def esegui(self):
+        """Ciclo principale: forma i batch e li classifica."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.coda.get()]
+            scadenza = loop.time() + self.attesa
+            while len(batch) < self.batch_massimo:
+                rimanente = scadenza - loop.time()
+                if rimanente <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.coda.get(), rimanente))
+                except asyncio.TimeoutError:
+                    break
+
+            righe, futuri = zip(*batch)
+            try:
+                risultati = await loop.run_in_executor(self.esecutore, self._classifica, list(righe))
+            except Exception as e:  # un batch non valido non deve fermare il servizio
+                risultati = [{"errore": str(e)}] * len(futuri)
+            for futuro, risultato in zip(futuri, risultati):
+                if not futuro.done():
+                    futuro.set_result(risultato)
+            self.dimensioni_batch.append(len(batch))
+            self.batch += 1
+
+    def _classifica(self, righe: list) -> list:
+        """Classifica un batch di record con una sola ricerca dei vicini."""
+        matrice = self.preprocessing.transform(np.vstack(righe))
+        validi = ~np.isnan(matrice).any(axis=1)
+        risultati = [{"errore": "record incompleto"}] * len(righe)
+        if validi.any():
+            previsioni, probabilita = self.modello.predict_e_proba_batch(matrice[validi])
+            for i, classe, p in zip(np.flatnonzero(validi), previsioni.to_numpy(), probabilita.to_numpy()):
+                risultati[i] = {"classe": int(classe), "probabilita": float(p)}
+        return risultati
+
+    def statistiche(self) -> dict:
+        """Latenze in millisecondi e dimensioni dei batch sulle ultime CAMPIONI_STATISTICHE richieste."""
+        latenze = np.array(self.latenze) * 1000
+        dimensioni = np.array(self.dimensioni_batch)
+        statistiche = {"richieste": self.richieste, "batch": self.batch}
+        if len(latenze):
+            statistiche["latenza_ms"] = {"media": float(latenze.mean()), "p50": float(np.percentile(latenze, 50)),
+                                         "p95": float(np.percentile(latenze, 95)), "p99": float(np.percentile(latenze, 99)),
+                                         "massima": float(latenze.max())}
+        if len(dimensioni):
+            statistiche["dimensione_batch"] = {"media": float(dimensioni.mean()), "massima": int(dimensioni.max())}
+        return statistiche
+
+
+async def gestisci_connessione(batcher: MicroBatcher, lettore: asyncio.StreamReader, scrittore: asyncio.StreamWriter):
+    """Serve le richieste HTTP/1.1 di una connessione (con keep-alive) finché il client non la chiude."""
+    try:
+        while True:
+            riga = await lettore.readline()
+            if not riga:
+                break
+            metodo, percorso, _ = riga.decode("latin-1").split(" ", 2)
+
+            intestazioni = {}
+            while True:
+                riga = await lettore.readline()
+                if riga in (b"\r\n", b"\n", b""):
+                    break
+                nome, _, valore = riga.decode("latin-1").partition(":")
+                intestazioni[nome.strip().lower()] = valore.strip()
+            corpo = await lettore.readexactly(int(intestazioni.get("content-length", 0)))
+
+            if metodo == "POST" and percorso == "/predict":
+                try:
+                    risposta = await batcher.predici(json.loads(corpo))
+                    stato = "400 Bad Request" if "errore" in risposta else "200 OK"
+                except ValueError:
+                    stato, risposta = "400 Bad Request", {"errore": "JSON non valido"}
+            elif metodo == "GET" and percorso == "/stats":
+                stato, risposta = "200 OK", batcher.statistiche()
+            else:
+                stato, risposta = "404 Not Found", {"errore": f"{metodo} {percorso} non supportato"}
+
+            dati = json.dumps(risposta).encode("utf-8")
+            chiudi = intestazioni.get("connection", "").lower() == "close"
+            scrittore.write(f"HTTP/1.1 {stato}\r\nContent-Type: application/json\r\nContent-Length: {len(dati)}\r\n"
+                            f"Connection: {'close' if chiudi else 'keep-alive'}\r\n\r\n".encode("latin-1") + dati)
+            await scrittore.drain()
+            if chiudi:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass  # richiesta malformata o connessione interrotta: chiudo la connessione
+    finally:
+        scrittore.close()
+
+
+async def avvia_server(modello: ClassificatoreKNN, porta: int = 8000, socket: str = None,
+                       attesa_ms: float = 2.0, batch_massimo: int = 256):
+    """Avvia il servizio e resta in ascolto finché non viene interrotto."""
+    batcher = MicroBatcher(modello, attesa_ms, batch_massimo)
+    ciclo_batch = asyncio.create_task(batcher.esegui())
+
+    async def connessione(lettore, scrittore):
+        await gestisci_connessione(batcher, lettore, scrittore)
+
+    if socket:
+        server = await asyncio.start_unix_server(connessione, path=socket)
+        print(f"Servizio di predizione in ascolto su {socket}")
+    else:
+        server = await asyncio.start_server(connessione, host="127.0.0.1", port=porta)
+        print(f"Servizio di predizione in ascolto su http://127.0.0.1:{porta}")
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        ciclo_batch.cancel()
+        batcher.esecutore.shutdown(wait=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servizio locale di predizione knn con micro-batching")
+    parser.add_argument("modello", help="file del modello salvato con ClassificatoreKNN.salva")
+    parser.add_argument("--porta", type=int, default=8000)
+    parser.add_argument("--socket", help="percorso di un socket Unix da usare al posto della porta TCP")
+    parser.add_argument("--attesa-ms", type=float, default=2.0, help="attesa massima per formare un batch")
+    parser.add_argument("--batch-massimo", type=int, default=256)
+    argomenti = parser.parse_args(argv)
+
+    modello = ClassificatoreKNN.carica(argomenti.modello)
+    try:
+        asyncio.run(avvia_server(modello, argomenti.porta, argomenti.socket, argomenti.attesa_ms, argomenti.batch_massimo))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
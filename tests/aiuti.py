@@ -0,0 +1,42 @@
+"""Dati e modelli sintetici condivisi dai test di score.py e server.py."""
+
+import numpy as np
+import pandas as pd
+from models.k_nearest_neighbor import ClassificatoreKNN
+from preprocessing.data_cleaner import MissingValueHandler
+from preprocessing.normalizzazione import FeatureScaler
+
+COLONNE = ["a", "b", "c"]
+
+
+def dati_grezzi(righe, seme, mancanti_ogni=None):
+    """
+    Record grezzi con identificativo, feature intere da 1 a 10 (COLONNE) e target 2/4 come
+    version_1.csv; con mancanti_ogni la colonna "b" ha un valore mancante ogni mancanti_ogni righe.
+    """
+    rng = np.random.default_rng(seme)
+    grezzi = pd.DataFrame(rng.integers(1, 11, (righe, len(COLONNE))).astype(float), columns=COLONNE)
+    grezzi.insert(0, "Sample code number", np.arange(1000, 1000 + righe))
+    if mancanti_ogni:
+        grezzi.iloc[::mancanti_ogni, grezzi.columns.get_loc("b")] = np.nan
+    grezzi["classtype_v1"] = rng.choice([2, 4], righe)
+    return grezzi
+
+
+def modello_addestrato(grezzi, k, metodo_imputazione, metodo_scaling):
+    """
+    Calcola imputazione e scaling sui record grezzi e addestra un ClassificatoreKNN (seme 0) con le
+    trasformazioni in modello.preprocessing, come un modello salvato con il suo preprocessing.
+
+    Ritorna:
+    tupla (modello, feature scalate del training)
+    """
+    imputazione = MissingValueHandler(metodo_imputazione)
+    riempiti = imputazione.clean(grezzi.copy())
+    scaling = FeatureScaler()
+    scalati = scaling.scale_features(riempiti, metodo_scaling)
+    features = scalati.drop(columns=["classtype_v1"])
+    modello = ClassificatoreKNN(k=k, seme=0)
+    modello.train(features, scalati["classtype_v1"])
+    modello.preprocessing = {"imputazione": imputazione, "scaling": scaling}
+    return modello, features
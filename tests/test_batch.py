@@ -0,0 +1,113 @@
+import json
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from batch import carica_configurazione, esegui_batch
+from models import ClassificatoreKNN
+from preprocessing.importdata import load_and_prepare_data
+from preprocessing.inferenza import PreprocessingInferenza
+from validation.evaluation import Evaluation
+
+class TestBatch(unittest.TestCase):
+    """Test per l'esecuzione non interattiva di una matrice di configurazioni."""
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+        generatore = np.random.default_rng(0)
+        self.file_path = os.path.join(self.cartella.name, "dati.csv")
+        pd.DataFrame({
+            "Mitoses": generatore.integers(1, 11, 60),
+            "Bland Chromatin": generatore.integers(1, 11, 60),
+            "classtype_v1": generatore.choice([2, 4], 60),
+        }).to_csv(self.file_path, index=False)
+
+        self.config_path = os.path.join(self.cartella.name, "config.json")
+        with open(self.config_path, "w") as file:
+            json.dump({
+                "datasets": [self.file_path],
+                "strategie": [{"nome": "k_fold", "param": 3}, {"nome": "leave_one_out"}],
+                "k": [1, 3],
+                "imputazione": ["mean", "median"],
+                "scaling": ["normalize", "standardize"],
+                "metriche": ["Accuracy Rate", "Sensitivity"],
+                "cache": False,
+            }, file)
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    def test_matrice_completa(self):
+        """Una riga per ogni combinazione, con le stesse metriche di una valutazione singola."""
+        risultati = esegui_batch(carica_configurazione(self.config_path))
+        self.assertEqual(len(risultati), 2 * 2 * 2 * 2)
+
+        features, target = load_and_prepare_data(self.file_path, "median", "standardize", cache=False)
+        np.random.seed(0)
+        atteso = Evaluation(features, target, 3, ["Accuracy Rate", "Sensitivity"], 3).sweep_k([1, 3], "k_fold")
+        riga = risultati[(risultati.imputazione == "median") & (risultati.scaling == "standardize")
+                         & (risultati.strategia == "k_fold") & (risultati.k == 3)].iloc[0]
+        self.assertAlmostEqual(riga["Accuracy Rate"], atteso.loc[3, "Accuracy Rate"])
+
+    def test_cache_disattivata_di_default(self):
+        """Senza la chiave "cache" il batch non scrive la cache del preprocessing su disco."""
+        with open(self.config_path, "w") as file:
+            json.dump({"datasets": [self.file_path], "strategie": [{"nome": "holdout", "param": 0.8}], "k": [3],
+                       "metriche": ["Accuracy Rate"]}, file)
+        configurazione = carica_configurazione(self.config_path)
+        self.assertIs(configurazione["cache"], False)
+        directory = os.getcwd()
+        os.chdir(self.cartella.name)
+        try:
+            esegui_batch(configurazione)
+        finally:
+            os.chdir(directory)
+        self.assertFalse(os.path.exists(os.path.join(self.cartella.name, ".cache")))
+
+    def test_distanze(self):
+        """Ogni metrica di distanza della configurazione aggiunge le sue righe."""
+        with open(self.config_path, "w") as file:
+            json.dump({"datasets": [self.file_path], "strategie": [{"nome": "k_fold", "param": 3}], "k": [3],
+                       "distanze": ["euclidea", "chebyshev"], "metriche": ["Accuracy Rate"], "cache": False}, file)
+        risultati = esegui_batch(carica_configurazione(self.config_path))
+        self.assertEqual(risultati["distanza"].tolist(), ["euclidea", "chebyshev"])
+
+        with open(self.config_path, "w") as file:
+            json.dump({"datasets": [self.file_path], "distanze": ["hamming"]}, file)
+        with self.assertRaises(ValueError):
+            carica_configurazione(self.config_path)
+
+    def test_cache_vicini(self):
+        """Con cache_vicini le strategie condividono i vicini precalcolati, con le stesse metriche."""
+        senza = esegui_batch(carica_configurazione(self.config_path))
+        with open(self.config_path) as file:
+            configurazione = {**json.load(file), "cache_vicini": True}
+        with open(self.config_path, "w") as file:
+            json.dump(configurazione, file)
+        con = esegui_batch(carica_configurazione(self.config_path))
+        pd.testing.assert_frame_equal(con.drop(columns="tempo_strategia"), senza.drop(columns="tempo_strategia"))
+
+    def test_salva_modelli(self):
+        """Con "salva" ogni combinazione produce un modello con il suo preprocessing, applicabile ai dati grezzi."""
+        configurazione = {**carica_configurazione(self.config_path), "strategie": [{"nome": "k_fold", "param": 3}],
+                          "imputazione": ["median"], "scaling": ["standardize"],
+                          "salva": os.path.join(self.cartella.name, "modelli")}
+        esegui_batch(configurazione)
+        self.assertEqual(sorted(os.listdir(configurazione["salva"])),
+                         ["dati_median_standardize_euclidea_k1.knn", "dati_median_standardize_euclidea_k3.knn"])
+
+        modello = ClassificatoreKNN.carica(os.path.join(configurazione["salva"], "dati_median_standardize_euclidea_k3.knn"))
+        self.assertEqual(modello.k, 3)
+        grezzi = pd.read_csv(self.file_path).drop(columns=["classtype_v1"]).iloc[modello.features.index]
+        np.testing.assert_allclose(PreprocessingInferenza.da_modello(modello).transform(grezzi.to_dict("records")), modello._X)
+
+    def test_strategia_non_valida(self):
+        """Una strategia sconosciuta viene segnalata alla lettura della configurazione."""
+        with open(self.config_path, "w") as file:
+            json.dump({"datasets": [self.file_path], "strategie": [{"nome": "bootstrap"}]}, file)
+        with self.assertRaises(ValueError):
+            carica_configurazione(self.config_path)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from benchmarks.dati_sintetici import COLONNE, genera_blocco, scrivi_dataset
+from benchmarks.esegui import FASI, benchmark_dimensione, confronta, speedup_predict_batch
+from benchmarks.importazioni import tempo_importazione
+
+class TestBenchmark(unittest.TestCase):
+    """Test per il generatore di dataset sintetici e per il runner dei benchmark."""
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    def test_schema_come_version_1(self):
+        """Il dataset generato ha le colonne di version_1.csv, duplicati e valori mancanti."""
+        originale = pd.read_csv(os.path.join("Data", "version_1.csv"), nrows=5)
+        self.assertEqual(list(originale.columns), COLONNE)
+
+        df = genera_blocco(2000, duplicati=0.2, rumore=0.1)
+        self.assertEqual(list(df.columns), COLONNE)
+        self.assertGreater(df.duplicated().sum(), 200)
+        self.assertGreater(df["Mitoses"].isna().mean(), 0.05)
+        self.assertTrue(df["Bland Chromatin"].dropna().str.contains(",").any())
+        self.assertTrue(set(df["classtype_v1"].dropna()) <= {2.0, 4.0})
+
+    def test_seme_fisso(self):
+        """Lo stesso seme produce lo stesso file, anche scritto a blocchi."""
+        primo = scrivi_dataset(os.path.join(self.cartella.name, "a.csv"), 2500, seme=3, righe_per_blocco=1000)
+        secondo = scrivi_dataset(os.path.join(self.cartella.name, "b.csv"), 2500, seme=3, righe_per_blocco=1000)
+        with open(primo) as a, open(secondo) as b:
+            self.assertEqual(a.read(), b.read())
+        self.assertEqual(len(pd.read_csv(primo)), 2500)
+
+    def test_fasi_e_regressioni(self):
+        """Un benchmark piccolo misura tutte le fasi; il confronto segnala le fasi più lente."""
+        risultati = benchmark_dimensione(300, ripetizioni=1, query=50, cartella=self.cartella.name)
+        self.assertEqual([r["fase"] for r in risultati], list(FASI))
+        for risultato in risultati:
+            self.assertGreater(risultato["minimo"], 0)
+
+        report = {"risultati": risultati}
+        riferimento = {"risultati": [dict(r, minimo=r["minimo"] / 2) if r["fase"] == "train" else r for r in risultati]}
+        regressioni = confronta(report, riferimento, tolleranza=1.25)
+        self.assertEqual([r["fase"] for r in regressioni], ["train"])
+        self.assertEqual(confronta(report, report), [])
+
+    def test_speedup_predict_batch(self):
+        """predict_batch ha almeno 100 volte il throughput del percorso originale a una riga alla volta."""
+        for n_training in (700, 5000):
+            self.assertGreaterEqual(speedup_predict_batch(n_training)["speedup"], 100, n_training)
+
+    def test_importazioni_leggere(self):
+        """Gli script e la validazione non importano matplotlib e openpyxl finché non servono."""
+        for modulo in ("main", "score", "server", "validation.metriche", "save_results_to_excel"):
+            self.assertEqual(tempo_importazione(modulo, ripetizioni=1)["librerie_pesanti"], [], modulo)
+
+if __name__ == "__main__":
+    unittest.main()
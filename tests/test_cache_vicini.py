@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+import pandas as pd
+from models.cache_vicini import CacheVicini
+from models.k_nearest_neighbor import ClassificatoreKNN
+from validation.evaluation import Evaluation
+
+class TestCacheVicini(unittest.TestCase):
+    """Test per la cache dei vicini condivisa tra i fold della validazione."""
+
+    def setUp(self):
+        rng = np.random.default_rng(5)
+        # valori interi su una griglia: molti pareggi di distanza, come in version_1.csv
+        self.X = rng.integers(1, 5, (150, 3)).astype(float)
+        self.y = rng.integers(0, 2, 150).astype(float)
+
+    def test_come_ricerca_esaustiva(self):
+        """La lettura della cache dà gli stessi vicini del modello, anche con training non ordinato."""
+        ordine = np.random.default_rng(1).permutation(len(self.X))
+        train_indices, test_indices = ordine[:110], ordine[110:]
+        modello = ClassificatoreKNN(5)
+        modello.train(self.X[train_indices], self.y[train_indices])
+        distanze_attese, attesi = modello._vicini_batch(self.X[test_indices])
+
+        ricalcolate = {}
+        for m in (8, 150):  # lista corta (righe con pareggi oltre la lista ricalcolate) e lista completa
+            cache = CacheVicini(self.X, m)
+            distanze, vicini = cache.vicini(test_indices, train_indices, 5, modello)
+            np.testing.assert_array_equal(vicini, attesi)
+            np.testing.assert_array_equal(distanze, distanze_attese)
+            ricalcolate[m] = cache.ricalcolate
+        self.assertGreater(ricalcolate[8], 0)
+        self.assertEqual(ricalcolate[150], 0)
+
+    def test_leave_one_out(self):
+        """Con escludi ogni campione non è vicino di sé stesso, come con escludi del modello."""
+        modello = ClassificatoreKNN(3)
+        modello.train(self.X, self.y)
+        righe = np.arange(len(self.X))
+        _, attesi = modello._vicini_batch(self.X, escludi=righe)
+        _, vicini = CacheVicini(self.X, 6).vicini(righe, righe, 3, modello, escludi=True)
+        np.testing.assert_array_equal(vicini, attesi)
+
+    def test_evaluation_con_cache(self):
+        """Holdout, K-Fold ripetuta, Leave-One-Out e sweep_k danno gli stessi risultati con la cache."""
+        features, target = pd.DataFrame(self.X), pd.Series(self.y.astype(int))
+        metriche = ["Accuracy Rate", "AUC"]
+
+        def valuta(evaluation):
+            np.random.seed(3)
+            risultati = [evaluation.valutazione_holdout()[:2], evaluation.valutazione_k_fold(ripetizioni=2),
+                         evaluation.valutazione_leave_one_out()]
+            return risultati, evaluation.sweep_k([1, 3, 5], "k_fold")
+
+        attesi, tabella_attesa = valuta(Evaluation(features, target, 4, metriche, k=3, metrica="manhattan"))
+        condivisa = Evaluation(features, target, 4, metriche, k=3, metrica="manhattan", cache_vicini=True)
+        for evaluation in (condivisa, Evaluation(features, target, 4, metriche, k=3, metrica="manhattan",
+                                                 cache_vicini=condivisa.cache_vicini)):
+            risultati, tabella = valuta(evaluation)
+            for (metriche_cache, previsioni_cache), (metriche_attese, previsioni_attese) in zip(risultati, attesi):
+                self.assertEqual(metriche_cache, metriche_attese)
+                np.testing.assert_array_equal(previsioni_cache, previsioni_attese)
+            pd.testing.assert_frame_equal(tabella, tabella_attesa)
+        self.assertIsInstance(condivisa.cache_vicini, CacheVicini)
+
+        with self.assertRaises(ValueError):
+            Evaluation(features, target, 4, metriche, k=3, cache_vicini=condivisa.cache_vicini).valutazione_k_fold()
+
+if __name__ == "__main__":
+    unittest.main()
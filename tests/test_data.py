@@ -1,7 +1,13 @@
+import os
+import tempfile
 import unittest
 import pandas as pd
 import numpy as np
 from preprocessing.data_cleaner import DataCleaner, MissingValueHandler
+from preprocessing.importdata import DatasetProcessor, load_and_prepare_data
+from preprocessing.cache import CachePreprocessing
+from preprocessing.normalizzazione import FeatureScaler
+import json
 
 class TestDataProcessing(unittest.TestCase):
     """Test per la gestione dei dati, pulizia, duplicati e valori mancanti."""
@@ -35,10 +41,168 @@ class TestDataProcessing(unittest.TestCase):
         cleaned_data = self.cleaner.clean(self.duplicated_data)
         self.assertFalse(cleaned_data['Target'].isna().any(), "Le righe con target mancante dovrebbero essere rimosse.")
 
+    def test_pulizia_fusa(self):
+        """La pulizia fusa dà lo stesso risultato di quella classica, anche con valori non numerici."""
+        dati = pd.DataFrame({
+            "feature1": ["1", "2", "2", "x", "5", "1"],
+            "feature2": [5.0, 6.0, 6.0, 7.0, np.nan, 5.0],
+            "Target": [1, 0, 0, 1, 1, 1]
+        })
+        pd.testing.assert_frame_equal(DataCleaner("Target", fusa=True).clean(dati), self.cleaner.clean(dati))
+        pd.testing.assert_frame_equal(DataCleaner("Target", fusa=True).clean(self.duplicated_data),
+                                      self.cleaner.clean(self.duplicated_data))
+
     def test_missing_values_filling(self):
         """Testa il riempimento dei valori mancanti."""
         filled_data = self.missing_handler.clean(self.data_inconsistent)
         self.assertFalse(filled_data.isnull().any().any(), "Tutti i valori mancanti dovrebbero essere riempiti.")
 
+class TestFitTransform(unittest.TestCase):
+    """Test per i parametri salvati di imputazione e scaling."""
+
+    def setUp(self):
+        self.dati = pd.DataFrame({
+            "Mitoses": [1.0, np.nan, 3.0, 7.0],
+            "Costante": [5.0, 5.0, 5.0, 5.0],
+            "classtype_v1": [2, 4, 2, 4],
+        })
+
+    def test_transform_record_uguale_al_dataset(self):
+        """Un singolo record trasformato con i parametri salvati coincide con la riga del dataset trasformato."""
+        gestore = MissingValueHandler("median").fit(self.dati)
+        riempiti = gestore.transform(self.dati)
+        scaler = FeatureScaler().fit(riempiti, "standardize")
+        scalati = scaler.transform(riempiti)
+
+        record = gestore.transform(self.dati.loc[1, gestore.colonne].to_numpy(dtype=float))
+        record = record[[gestore.colonne.index(c) for c in scaler.colonne]]
+        np.testing.assert_allclose(scaler.transform(record), scalati.loc[1, scaler.colonne].to_numpy(dtype=float))
+        self.assertTrue((scalati["Costante"] == 0).all(), "Le colonne costanti dovrebbero diventare 0.")
+
+    def test_parametri_serializzabili(self):
+        """I parametri passano da JSON e ricostruiscono le stesse trasformazioni."""
+        scaler = FeatureScaler().fit(self.dati.fillna(0), "normalize")
+        ricostruito = FeatureScaler.da_parametri(json.loads(json.dumps(scaler.parametri())))
+        pd.testing.assert_frame_equal(ricostruito.transform(self.dati), scaler.transform(self.dati))
+
+        gestore = MissingValueHandler("mode").fit(self.dati)
+        ricostruito = MissingValueHandler.da_parametri(json.loads(json.dumps(gestore.parametri())))
+        np.testing.assert_array_equal(ricostruito.transform(self.dati.to_numpy()), gestore.transform(self.dati.to_numpy()))
+
+
+class TestDatasetProcessor(unittest.TestCase):
+    """Test per il caricamento tipizzato, a blocchi e dai formati binari."""
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+        self.dati = pd.DataFrame({
+            "Mitoses": [1, 2, 3, 4, 5],
+            "Bland Chromatin": ["1", "2,0", "3", "4", "5"],  # valori sporchi come in version_1.csv
+            "classtype_v1": [2, 4, 2, 4, 2],
+        })
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    def _percorso(self, nome):
+        return os.path.join(self.cartella.name, nome)
+
+    def test_schema_and_chunks(self):
+        """Le feature note sono lette come float32 (il target come float64); quelle sporche restano testo, a blocchi diventano NaN."""
+        percorso = self._percorso("dati.csv")
+        self.dati.to_csv(percorso, index=False)
+        intero = DatasetProcessor(percorso).load_data()
+        self.assertEqual(intero["Mitoses"].dtype, np.float32)
+        self.assertEqual(intero["classtype_v1"].dtype, np.float64)
+        self.assertFalse(pd.api.types.is_numeric_dtype(intero["Bland Chromatin"]))
+
+        a_blocchi = DatasetProcessor(percorso).load_data(dimensione_chunk=2)
+        self.assertEqual(a_blocchi["Bland Chromatin"].dtype, np.float32)
+        self.assertTrue(np.isnan(a_blocchi["Bland Chromatin"].iloc[1]))
+        pd.testing.assert_frame_equal(intero.drop(columns="Bland Chromatin"), a_blocchi.drop(columns="Bland Chromatin"))
+        cleaner = DataCleaner("classtype_v1")
+        pd.testing.assert_frame_equal(cleaner.clean(intero), cleaner.clean(a_blocchi), check_dtype=False)
+
+    def test_statistiche_float64(self):
+        """Con feature memorizzate in float32 imputazione e scaling calcolano le statistiche in float64."""
+        grezzi = pd.DataFrame({"Mitoses": np.random.default_rng(0).integers(1, 11, 1000),
+                               "classtype_v1": np.repeat([2.0, 4.0], 500)})
+        compatti = grezzi.astype({"Mitoses": np.float32})
+        compatti.loc[::9, "Mitoses"] = np.nan
+        atteso = compatti["Mitoses"].astype(np.float64)
+
+        imputazione = MissingValueHandler("mean").fit(compatti)
+        self.assertEqual(imputazione.valori[0], atteso.mean())
+        scaling = FeatureScaler().fit(compatti, "standardize")
+        self.assertEqual(scaling.offset[0], atteso.mean())
+        self.assertEqual(scaling.scala[0], atteso.std())
+
+    def test_npy_strutturato(self):
+        """Un array strutturato .npy diventa un DataFrame con i nomi dei campi come colonne."""
+        percorso = self._percorso("dati.npy")
+        array = np.zeros(3, dtype=[("Mitoses", "f8"), ("classtype_v1", "f8")])
+        array["Mitoses"] = [1, 2, 3]
+        np.save(percorso, array)
+        dati = DatasetProcessor(percorso).load_data()
+        self.assertEqual(list(dati.columns), ["Mitoses", "classtype_v1"])
+        self.assertEqual(dati["Mitoses"].dtype, np.float32)
+        self.assertEqual(dati["Mitoses"].tolist(), [1, 2, 3])
+
+class TestCachePreprocessing(unittest.TestCase):
+    """Test per la cache su disco dei dataset pre-processati."""
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.cartella.name, "dati.csv")
+        pd.DataFrame({
+            "Mitoses": [1, 2, np.nan, 4, 5, 6],
+            "Bland Chromatin": [3, 1, 2, 5, 4, 6],
+            "classtype_v1": [2, 4, 2, 4, 2, 4],
+        }).to_csv(self.file_path, index=False)
+        self.cache = CachePreprocessing(os.path.join(self.cartella.name, "cache"))
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    def test_cache_opzionale(self):
+        """Senza indicarla la cache non scrive nulla; con una cartella la voce viene creata lì."""
+        corrente = os.getcwd()
+        os.chdir(self.cartella.name)
+        try:
+            load_and_prepare_data(self.file_path, "mean", "normalize")
+            self.assertFalse(os.path.exists(".cache"))
+            cartella = os.path.join(self.cartella.name, "altra_cache")
+            load_and_prepare_data(self.file_path, "mean", "normalize", cache=cartella)
+            self.assertEqual(len(os.listdir(cartella)), 1)
+        finally:
+            os.chdir(corrente)
+
+    def test_cache_hit_uguale_al_preprocessing(self):
+        """La seconda esecuzione viene letta dalla cache e coincide con il preprocessing completo."""
+        features, target = load_and_prepare_data(self.file_path, "median", "standardize", cache=False)
+        load_and_prepare_data(self.file_path, "median", "standardize", cache=self.cache)
+        chiave = self.cache.chiave(self.file_path, "median", "standardize")
+        dalla_cache, target_cache = self.cache.carica(chiave)
+        np.testing.assert_array_equal(dalla_cache.to_numpy(), features.to_numpy(dtype=float))
+        np.testing.assert_array_equal(target_cache.to_numpy(), target.to_numpy())
+        self.assertEqual(list(dalla_cache.columns), list(features.columns))
+        self.assertNotEqual(chiave, self.cache.chiave(self.file_path, "mean", "standardize"))
+
+        # le trasformazioni calcolate sono salvate con la voce e restituite anche dalla cache
+        _, _, calcolate = load_and_prepare_data(self.file_path, "median", "standardize", cache=False,
+                                                restituisci_trasformazioni=True)
+        _, _, dalla_cache = load_and_prepare_data(self.file_path, "median", "standardize", cache=self.cache,
+                                                  restituisci_trasformazioni=True)
+        for nome in ("imputazione", "scaling"):
+            self.assertEqual(dalla_cache[nome].parametri(), calcolate[nome].parametri())
+
+    def test_eviction(self):
+        """Oltre la dimensione massima vengono rimosse le voci usate meno di recente."""
+        self.cache.dimensione_massima = 1
+        load_and_prepare_data(self.file_path, "mean", "normalize", cache=self.cache)
+        load_and_prepare_data(self.file_path, "median", "normalize", cache=self.cache)
+        self.assertIsNone(self.cache.carica(self.cache.chiave(self.file_path, "mean", "normalize"))[0])
+        self.assertIsNotNone(self.cache.carica(self.cache.chiave(self.file_path, "median", "normalize"))[0])
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+import pandas as pd
+import numpy as np
+from validation.datasplit import SplitData
+
+class TestSplitData(unittest.TestCase):
+    """Test per i generatori di fold basati su indici."""
+
+    def setUp(self):
+        self.features = pd.DataFrame(np.arange(46).reshape(23, 2))
+        self.target = pd.Series(np.arange(23) % 2)
+        self.split = SplitData(self.features, self.target, k_folds=5)
+
+    def test_iter_k_fold_copre_tutti_i_campioni(self):
+        """Ogni campione deve finire nel test set esattamente una volta per ripetizione."""
+        folds = list(self.split.iter_k_fold(ripetizioni=2))
+        self.assertEqual(len(folds), 10)
+        for ripetizione in (folds[:5], folds[5:]):
+            test = np.concatenate([test_indices for _, test_indices in ripetizione])
+            np.testing.assert_array_equal(np.sort(test), np.arange(23))
+        for train_indices, test_indices in folds:
+            self.assertEqual(len(np.intersect1d(train_indices, test_indices)), 0)
+            self.assertEqual(len(train_indices) + len(test_indices), 23)
+
+    def test_iter_k_fold_come_split_k_fold(self):
+        """Con lo stesso seed il generatore produce gli stessi fold della versione a liste."""
+        np.random.seed(0)
+        _, _, X_test_folds, _, test_indices_folds = self.split.split_k_fold()
+        np.random.seed(0)
+        for (_, test_indices), attesi, X_test in zip(self.split.iter_k_fold(), test_indices_folds, X_test_folds):
+            np.testing.assert_array_equal(test_indices, attesi)
+            self.assertTrue(X_test.equals(self.features.iloc[test_indices]))
+
+    def test_iter_leave_one_out(self):
+        """Il leave-one-out lascia fuori un campione diverso a ogni iterazione."""
+        for i, (train_indices, test_indices) in enumerate(self.split.iter_leave_one_out()):
+            np.testing.assert_array_equal(test_indices, [i])
+            self.assertNotIn(i, train_indices)
+            self.assertEqual(len(train_indices), 22)
+
+if __name__ == "__main__":
+    unittest.main()
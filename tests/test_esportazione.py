@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+from save_results_to_excel import save_results_to_excel
+
+class TestEsportazione(unittest.TestCase):
+    """Test per l'esportazione dei risultati in Excel."""
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(4)
+        self.y_test = pd.Series(rng.integers(0, 2, 40), index=np.arange(100, 140))
+        self.y_pred = rng.integers(0, 2, 40)
+        self.metriche = {"Accuracy Rate": np.float64(0.75), "AUC": None}
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    def test_file_completo(self):
+        """Metriche, grafici e predizioni finiscono nello stesso file; i grafici anche come PNG, come in origine."""
+        save_results_to_excel(self.metriche, self.y_test, self.y_pred, results_dir=self.cartella.name)
+        self.assertEqual(sorted(os.listdir(self.cartella.name)),
+                         ["confusion_matrix.png", "metrics_bar_chart.png", "roc_curve.png", "validation_results.xlsx"])
+        percorso = os.path.join(self.cartella.name, "validation_results.xlsx")
+
+        wb = load_workbook(percorso)
+        self.assertEqual(wb.sheetnames, ["Sheet1", "Confusion Matrix", "ROC Curve", "Metrics", "Predictions"])
+        for foglio in ("Confusion Matrix", "ROC Curve", "Metrics"):
+            self.assertEqual(len(wb[foglio]._images), 1)
+
+        metriche = pd.read_excel(percorso)  # il primo foglio, come il file scritto con to_excel
+        self.assertEqual(list(metriche.columns), ["Metric", "Value"])
+        self.assertEqual(metriche["Value"].iloc[0], 0.75)
+        self.assertTrue(pd.isna(metriche["Value"].iloc[1]))
+
+        predizioni = pd.read_excel(percorso, sheet_name="Predictions")
+        self.assertEqual(predizioni["Sample"].tolist(), list(range(100, 140)))
+        self.assertEqual(predizioni["Actual"].tolist(), self.y_test.tolist())
+        self.assertEqual(predizioni["Predicted"].tolist(), self.y_pred.tolist())
+
+    def test_senza_grafici(self):
+        """Con grafici=False e predizioni=False resta solo il foglio delle metriche, senza immagini su disco."""
+        save_results_to_excel(self.metriche, self.y_test, self.y_pred, grafici=False, predizioni=False,
+                              results_dir=self.cartella.name)
+        wb = load_workbook(os.path.join(self.cartella.name, "validation_results.xlsx"))
+        self.assertEqual(wb.sheetnames, ["Sheet1"])
+        self.assertEqual(os.listdir(self.cartella.name), ["validation_results.xlsx"])
+
+    def test_senza_immagini(self):
+        """Con salva_immagini=False i grafici sono solo nel file Excel."""
+        save_results_to_excel(self.metriche, self.y_test, self.y_pred, predizioni=False, salva_immagini=False,
+                              results_dir=self.cartella.name)
+        self.assertEqual(os.listdir(self.cartella.name), ["validation_results.xlsx"])
+        wb = load_workbook(os.path.join(self.cartella.name, "validation_results.xlsx"))
+        self.assertEqual(wb.sheetnames, ["Sheet1", "Confusion Matrix", "ROC Curve", "Metrics"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -29,6 +29,78 @@ class TestEvaluation(unittest.TestCase):
         self.assertIsInstance(risultati[0], dict)
         self.assertTrue(all(m in risultati[0] for m in self.metriche_scelte))
 
+    def test_leave_one_out_veloce_uguale_a_classico(self):
+        """La modalità veloce deve dare le stesse predizioni e metriche degli n addestramenti."""
+        metriche_veloci, previsioni_veloci = self.evaluator.valutazione_leave_one_out(veloce=True)
+        metriche_classiche, previsioni_classiche = self.evaluator.valutazione_leave_one_out(veloce=False)
+        np.testing.assert_array_equal(previsioni_veloci, previsioni_classiche)
+        for m in self.metriche_scelte:
+            self.assertAlmostEqual(metriche_veloci[m], metriche_classiche[m])
+
+    def test_leave_one_out_con_valori_mancanti(self):
+        """Con NaN nelle feature le due modalità usano le stesse feature riempite e danno le stesse predizioni."""
+        features = self.features.copy()
+        features.iloc[::6, 1] = np.nan
+        features.iloc[::11, 3] = np.nan
+        evaluator = Evaluation(features, self.target, self.k_folds, self.metriche_scelte, self.k)
+        metriche_veloci, previsioni_veloci = evaluator.valutazione_leave_one_out(veloce=True)
+        metriche_classiche, previsioni_classiche = evaluator.valutazione_leave_one_out(veloce=False)
+        self.assertEqual(len(previsioni_veloci), len(features))
+        np.testing.assert_array_equal(previsioni_veloci, previsioni_classiche)
+        for m in self.metriche_scelte:
+            self.assertAlmostEqual(metriche_veloci[m], metriche_classiche[m])
+
+    def test_leave_one_out_con_target_mancante(self):
+        """Con un target mancante il modello scarta una riga: veloce (serie e parallelo), sweep_k e classico coincidono."""
+        target = self.target.astype(float)
+        target.iloc[10] = np.nan
+        seriale = Evaluation(self.features, target, self.k_folds, self.metriche_scelte, self.k)
+        parallelo = Evaluation(self.features, target, self.k_folds, self.metriche_scelte, self.k, n_jobs=2)
+        metriche_classiche, previsioni_classiche = seriale.valutazione_leave_one_out(veloce=False)
+        tabella = seriale.sweep_k([self.k], "leave_one_out")
+        for evaluator in (seriale, parallelo):
+            metriche, previsioni = evaluator.valutazione_leave_one_out(veloce=True)
+            np.testing.assert_array_equal(previsioni, previsioni_classiche)
+            for m in self.metriche_scelte:
+                self.assertAlmostEqual(metriche[m], metriche_classiche[m])
+                self.assertAlmostEqual(tabella.loc[self.k, m], metriche_classiche[m])
+
+    def test_k_fold_parallelo_uguale_a_seriale(self):
+        """Con n_jobs > 1 metriche e predizioni devono coincidere con l'esecuzione seriale."""
+        parallelo = Evaluation(self.features, self.target, self.k_folds, self.metriche_scelte, k=4, n_jobs=2)
+        seriale = Evaluation(self.features, self.target, self.k_folds, self.metriche_scelte, k=4)
+        np.random.seed(7)
+        metriche_p, previsioni_p = parallelo.valutazione_k_fold()
+        np.random.seed(7)
+        metriche_s, previsioni_s = seriale.valutazione_k_fold()
+        self.assertEqual(metriche_p, metriche_s)
+        np.testing.assert_array_equal(previsioni_p, previsioni_s)
+
+        np.random.seed(7)
+        metriche_p, previsioni_p = parallelo.valutazione_leave_one_out()
+        np.random.seed(7)
+        metriche_s, previsioni_s = seriale.valutazione_leave_one_out()
+        self.assertEqual(metriche_p, metriche_s)
+        np.testing.assert_array_equal(previsioni_p, previsioni_s)
+
+    def test_sweep_k_uguale_a_valutazioni_singole(self):
+        """Ogni riga dello sweep deve coincidere con la valutazione eseguita con quel k."""
+        valori_k = [1, 3, 5, 9]
+        np.random.seed(3)
+        tabella = self.evaluator.sweep_k(valori_k, "k_fold")
+        self.assertEqual(list(tabella.index), valori_k)
+        for k in valori_k:
+            np.random.seed(3)
+            metriche, _ = Evaluation(self.features, self.target, self.k_folds, self.metriche_scelte, k).valutazione_k_fold()
+            for m in self.metriche_scelte:
+                self.assertAlmostEqual(tabella.loc[k, m], metriche[m])
+
+        tabella_loo = self.evaluator.sweep_k(valori_k, "leave_one_out")
+        for k in valori_k:
+            metriche, _ = Evaluation(self.features, self.target, self.k_folds, self.metriche_scelte, k).valutazione_leave_one_out()
+            for m in self.metriche_scelte:
+                self.assertAlmostEqual(tabella_loo.loc[k, m], metriche[m])
+
     def test_valutazione_holdout(self):
         """Testa la validazione Holdout."""
         risultati = self.evaluator.valutazione_holdout()
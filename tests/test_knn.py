@@ -1,6 +1,12 @@
+import contextlib
+import io
+import os
+import tempfile
 import unittest
 import pandas as pd
+import numpy as np
 from models.k_nearest_neighbor import ClassificatoreKNN
+from models.distanze import Metrica, distanze_euclidee_quadrate, k_minimi
 
 class TestKNNClassifier(unittest.TestCase):
     """Test per il classificatore KNN, inclusi addestramento, errori e predizioni."""
@@ -19,5 +25,222 @@ class TestKNNClassifier(unittest.TestCase):
         prediction = self.knn.predict(pd.Series([1.5, 2.5]))
         self.assertIn(prediction, [0, 1], "La predizione dovrebbe essere una delle classi previste.")
 
+    def test_predict_batch_uguale_a_predict(self):
+        """Verifica che il motore vettorizzato dia gli stessi risultati della predizione riga per riga."""
+        rng = np.random.default_rng(0)
+        features = pd.DataFrame(rng.random((80, 4)))
+        labels = pd.Series(rng.integers(0, 2, 80))
+        punti = pd.DataFrame(rng.random((25, 4)), index=range(100, 125))
+        self.knn.train(features, labels)
+
+        previsioni = self.knn.predict_batch(punti)
+        self.assertTrue(previsioni.index.equals(punti.index))
+        self.assertEqual(previsioni.tolist(), [self.knn.predict(riga) for _, riga in punti.iterrows()])
+        np.testing.assert_allclose(self.knn.predict_proba_batch(punti),
+                                   [self.knn.predict_proba(riga) for _, riga in punti.iterrows()])
+
+    def test_predict_e_proba_batch(self):
+        """Classi, probabilità e vicini devono coincidere con quelli dei metodi separati."""
+        rng = np.random.default_rng(2)
+        self.knn.train(pd.DataFrame(rng.random((60, 3))), pd.Series(rng.integers(0, 2, 60)))
+        punti = pd.DataFrame(rng.random((15, 3)))
+
+        previsioni, probabilita, vicini, distanze = self.knn.predict_e_proba_batch(punti, restituisci_vicini=True)
+        self.assertEqual(previsioni.tolist(), self.knn.predict_batch(punti).tolist())
+        np.testing.assert_allclose(probabilita, self.knn.predict_proba_batch(punti))
+        self.assertEqual(vicini.shape, (15, 3))
+        self.assertTrue(np.all(np.diff(distanze, axis=1) >= 0))
+
+    def test_probabilita_esatte_con_etichette_float32(self):
+        """Le frazioni di vicini di classe 1 sono calcolate in float64 anche con etichette float32."""
+        knn = ClassificatoreKNN(k=5)
+        knn.train(pd.DataFrame(np.arange(10.0)), pd.Series([1, 1, 1, 0, 0] * 2, dtype=np.float32))
+        punti = pd.DataFrame([[2.0]])
+        _, probabilita = knn.predict_e_proba_batch(punti)
+        self.assertEqual(probabilita.iloc[0], 0.6)
+        self.assertEqual(knn.predict_proba_batch(punti).iloc[0], 0.6)
+        self.assertEqual(knn.predict_e_proba_multi_k(punti, [5])[5][1][0], 0.6)
+
+    def test_predict_batch_pareggio(self):
+        """In caso di pareggio la classe scelta deve essere una di quelle pari."""
+        knn = ClassificatoreKNN(k=2)
+        knn.train(np.array([[0.0], [1.0], [10.0]]), np.array([0, 1, 1]))
+        previsioni = knn.predict_batch(pd.DataFrame([[0.5]] * 50))
+        self.assertTrue(set(previsioni) <= {0, 1})
+
+    def test_kd_tree_uguale_a_brute(self):
+        """Il KD-tree deve restituire gli stessi vicini (pareggi compresi) della ricerca esaustiva."""
+        rng = np.random.default_rng(1)
+        features = pd.DataFrame(rng.integers(1, 11, (300, 5)) / 9)  # dati a griglia: molti pareggi
+        labels = pd.Series(rng.integers(0, 2, 300))
+        punti = rng.integers(1, 11, (40, 5)) / 9
+
+        for k, leaf_size in ((7, 4), (1, 1), (7, 40)):  # anche foglie più piccole di k
+            brute = ClassificatoreKNN(k=k)
+            albero = ClassificatoreKNN(k=k, algoritmo="kd_tree", leaf_size=leaf_size)
+            brute.train(features, labels)
+            albero.train(features, labels)
+
+            distanze_b, vicini_b = brute._vicini_batch(punti)
+            distanze_a, vicini_a = albero._vicini_batch(punti)
+            np.testing.assert_array_equal(vicini_a, vicini_b)
+            np.testing.assert_array_equal(distanze_a, distanze_b)
+
+    def test_ivf(self):
+        """Visitando tutte le liste l'indice IVF è esatto; con poche liste la recall resta misurabile."""
+        rng = np.random.default_rng(3)
+        features = rng.random((500, 4))
+        labels = rng.integers(0, 2, 500)
+        punti = rng.random((30, 4))
+
+        brute = ClassificatoreKNN(k=5)
+        brute.train(features, labels)
+        completo = ClassificatoreKNN(k=5, algoritmo="ivf", n_liste=10, n_probe=10)
+        completo.train(features, labels)
+        np.testing.assert_array_equal(completo._vicini_batch(punti)[1], brute._vicini_batch(punti)[1])
+
+        approssimato = ClassificatoreKNN(k=5, algoritmo="ivf", n_liste=20, n_probe=2)
+        approssimato.train(features, labels)
+        with contextlib.redirect_stdout(io.StringIO()) as uscita:
+            report = approssimato.report_recall(pd.DataFrame(punti))
+        self.assertEqual(uscita.getvalue(), "")
+        self.assertEqual(report["campioni"], 30)
+        self.assertTrue(0.0 < report["recall"] <= 1.0)
+        self.assertEqual(len(approssimato.predict_batch(punti)), 30)
+
+    def test_salva_e_carica(self):
+        """Il modello caricato dal file (mappato in memoria) predice come l'originale, indice compreso."""
+        rng = np.random.default_rng(4)
+        features = pd.DataFrame(rng.integers(1, 11, (200, 3)) / 10, columns=["a", "b", "c"])
+        labels = pd.Series(rng.integers(0, 2, 200), name="classtype_v1")
+        punti = rng.integers(1, 11, (25, 3)) / 10
+
+        with tempfile.TemporaryDirectory() as cartella:
+            percorso = os.path.join(cartella, "modello.knn")
+            for algoritmo in ("brute", "kd_tree"):
+                modello = ClassificatoreKNN(k=5, algoritmo=algoritmo, leaf_size=8, seme=0)
+                modello.train(features, labels)
+                modello.salva(percorso)
+                caricato = ClassificatoreKNN.carica(percorso)
+
+                self.assertEqual(caricato.algoritmo, algoritmo)
+                self.assertEqual(list(caricato.features.columns), ["a", "b", "c"])
+                self.assertFalse(caricato._X.flags.writeable)
+                for attesi, ottenuti in zip(modello.predict_e_proba_batch(punti), caricato.predict_e_proba_batch(punti)):
+                    pd.testing.assert_series_equal(attesi, ottenuti)
+                del caricato  # libera la mappa del file prima di sovrascriverlo
+
+    def test_formati_compatti(self):
+        """float32 e uint8 trovano gli stessi vicini di float64 con una frazione della memoria."""
+        rng = np.random.default_rng(7)
+        # passo 1/8: in float64 le distanze sono esatte, quindi i pareggi coincidono in tutti i formati
+        features = pd.DataFrame(rng.integers(0, 9, (300, 4)) / 8, columns=["a", "b", "c", "d"])
+        labels = pd.Series(rng.integers(0, 2, 300), name="classtype_v1")
+        punti = np.vstack([rng.integers(0, 9, (20, 4)) / 8, rng.random((5, 4))])  # anche fuori griglia
+
+        riferimento = ClassificatoreKNN(k=5, seme=0)
+        riferimento.train(features, labels)
+        distanze, vicini = riferimento._vicini_batch(punti)
+        for formato, byte in (("float32", 4), ("uint8", 1)):
+            modello = ClassificatoreKNN(k=5, seme=0, formato=formato)
+            modello.train(features, labels)
+            self.assertEqual(modello._X.nbytes, 300 * 4 * byte)
+            d, v = modello._vicini_batch(punti)
+            np.testing.assert_array_equal(v, vicini)
+            np.testing.assert_allclose(d, distanze, rtol=1e-6)
+
+        with tempfile.TemporaryDirectory() as cartella:
+            percorso = os.path.join(cartella, "modello.knn")
+            modello.salva(percorso)
+            caricato = ClassificatoreKNN.carica(percorso)
+            self.assertEqual(caricato._X.dtype, np.uint8)
+            np.testing.assert_array_equal(caricato._vicini_batch(punti)[1], vicini)
+            del caricato
+
+    def test_kernel_intero_pareggi_esatti(self):
+        """Con passo 1/9 il kernel intero riconosce come pari distanze che in float64 differiscono per arrotondamento."""
+        features = pd.DataFrame({"a": [1 / 9, 3 / 9, 5 / 9], "b": [0.0, 0.0, 0.0]})
+        modello = ClassificatoreKNN(k=2, formato="uint8")
+        modello.train(features, pd.Series([0, 1, 0]))
+        distanze = modello._distanze(np.array([[3 / 9, 0.0]]))[0]
+        self.assertEqual(distanze[0], distanze[2])
+        self.assertEqual(modello._vicini_batch(np.array([[3 / 9, 0.0]]))[1].tolist(), [[1, 0]])
+
+    def test_k_minimi_pareggi(self):
+        """Con molti pareggi alla k-esima distanza k_minimi coincide con l'ordinamento stabile dell'intera riga."""
+        distanze = np.random.default_rng(3).integers(0, 4, (40, 300)).astype(float)
+        for k in (1, 5, 120, 299):
+            np.testing.assert_array_equal(k_minimi(distanze, k), np.argsort(distanze, axis=1, kind="stable")[:, :k])
+
+    def test_percorso_blas_uguale_al_kernel(self):
+        """Il prodotto matriciale con ricalcolo dei candidati dà le stesse distanze e gli stessi vicini, bit per bit, del kernel a feature."""
+        rng = np.random.default_rng(5)
+        griglia = (rng.integers(1, 11, (900, 9)) - 1) / 9  # molti pareggi esatti e quasi pareggi per arrotondamento
+        casuali = rng.normal(size=(1301, 4)) * 1e3 + 1e5  # norme grandi rispetto alle distanze
+        for dati, query in ((griglia, griglia[:300]), (casuali, casuali[::5] + rng.normal(size=(261, 4)))):
+            query = query.copy()
+            query[7, 2] = np.nan  # un blocco con valori mancanti usa il kernel a feature
+            attese = distanze_euclidee_quadrate(query, dati)
+            for k in (1, 5, 40):
+                vicini = k_minimi(attese, k)
+                distanze, indici = Metrica().cerca(query, dati, k)
+                np.testing.assert_array_equal(indici, vicini)
+                np.testing.assert_array_equal(distanze, np.take_along_axis(attese, vicini, axis=1))
+
+    def test_formato_uint8_non_applicabile(self):
+        """uint8 richiede valori su una griglia regolare e la ricerca esaustiva."""
+        with self.assertRaises(ValueError):
+            ClassificatoreKNN(k=3, algoritmo="kd_tree", formato="uint8")
+        with self.assertRaises(ValueError):
+            ClassificatoreKNN(k=3, formato="uint8").train(pd.DataFrame({"a": [0.0, 0.3, 1.0]}), pd.Series([0, 1, 0]))
+
+    def test_metriche_di_distanza(self):
+        """Ogni metrica dà le distanze attese e gli stessi vicini con ricerca esaustiva e KD-tree."""
+        rng = np.random.default_rng(8)
+        features = pd.DataFrame(rng.random((150, 3)))
+        labels = pd.Series(rng.integers(0, 2, 150))
+        punti = rng.random((10, 3))
+        scarti = features.to_numpy()[None, :, :] - punti[:, None, :]
+        attese = {
+            "euclidea": np.sqrt((scarti ** 2).sum(axis=2)),
+            "manhattan": np.abs(scarti).sum(axis=2),
+            "chebyshev": np.abs(scarti).max(axis=2),
+            "minkowski": (np.abs(scarti) ** 3).sum(axis=2) ** (1 / 3),
+            "coseno": 1 - punti @ features.to_numpy().T / np.outer(np.linalg.norm(punti, axis=1),
+                                                             np.linalg.norm(features.to_numpy(), axis=1)),
+        }
+        for metrica, distanze in attese.items():
+            brute = ClassificatoreKNN(k=4, metrica=metrica, p=3)
+            brute.train(features, labels)
+            albero = ClassificatoreKNN(k=4, algoritmo="kd_tree", leaf_size=8, metrica=metrica, p=3)
+            albero.train(features, labels)
+
+            np.testing.assert_allclose(brute.distanze(punti[0]), distanze[0], atol=1e-12)
+            d, vicini = brute._vicini_batch(punti)
+            np.testing.assert_allclose(d, np.sort(distanze, axis=1)[:, :4], atol=1e-12)
+            np.testing.assert_array_equal(albero._vicini_batch(punti)[1], vicini)
+
+        with self.assertRaises(ValueError):
+            ClassificatoreKNN(k=3, metrica="hamming")
+
+    def test_kernel_intero_altre_metriche(self):
+        """Manhattan e Chebyshev sul formato uint8 coincidono con il calcolo in float64."""
+        rng = np.random.default_rng(9)
+        features = pd.DataFrame(rng.integers(0, 9, (100, 3)) / 8)
+        labels = pd.Series(rng.integers(0, 2, 100))
+        punti = rng.integers(0, 9, (15, 3)) / 8
+        for metrica in ("manhattan", "chebyshev"):
+            compatto = ClassificatoreKNN(k=5, formato="uint8", metrica=metrica)
+            compatto.train(features, labels)
+            riferimento = ClassificatoreKNN(k=5, metrica=metrica)
+            riferimento.train(features, labels)
+            for attesi, ottenuti in zip(riferimento._vicini_batch(punti), compatto._vicini_batch(punti)):
+                np.testing.assert_array_equal(attesi, ottenuti)
+
+    def test_algoritmo_non_valido(self):
+        """Un algoritmo di ricerca sconosciuto deve sollevare un errore."""
+        with self.assertRaises(ValueError):
+            ClassificatoreKNN(k=3, algoritmo="ball_tree")
+
 if __name__ == "__main__":
     unittest.main()
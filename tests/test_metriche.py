@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+from validation.metriche import MetricheCrossValidation, AccumulatoreMetriche, curva_roc
+
+class TestMetriche(unittest.TestCase):
+    """Test per il calcolo della curva ROC e dell'AUC."""
+
+    def setUp(self):
+        self.metriche = MetricheCrossValidation(["AUC"])
+
+    def test_auc_con_pareggi(self):
+        """Con probabilità pari l'AUC coincide con la statistica di Mann-Whitney (pari contati 1/2)."""
+        generatore = np.random.default_rng(0)
+        y_true = generatore.integers(0, 2, 300)
+        y_prob = generatore.integers(0, 5, 300) / 4
+        positivi, negativi = y_prob[y_true == 1], y_prob[y_true == 0]
+        attesa = ((positivi[:, None] > negativi).sum() + 0.5 * (positivi[:, None] == negativi).sum()) / (len(positivi) * len(negativi))
+        self.assertAlmostEqual(self.metriche.calcolo_auc(y_true, y_prob), attesa)
+
+    def test_curva_roc(self):
+        """Un punto per ogni soglia distinta, a partire da (0, 0)."""
+        fpr, tpr, soglie = curva_roc(np.array([1, 0, 1, 0]), np.array([0.9, 0.9, 0.6, 0.1]))
+        np.testing.assert_array_equal(soglie, [np.inf, 0.9, 0.6, 0.1])
+        np.testing.assert_array_equal(fpr, [0, 0.5, 0.5, 1])
+        np.testing.assert_array_equal(tpr, [0, 0.5, 1, 1])
+        self.assertAlmostEqual(self.metriche.calcolo_auc(np.array([1, 0, 1, 0]), np.array([0.9, 0.9, 0.6, 0.1])), 0.625)
+
+    def test_accumulatore(self):
+        """Media per fold e metriche aggregate coincidono con calcolo_metriche sui fold e sull'unione."""
+        scelte = ["Accuracy Rate", "Sensitivity", "Specificity", "Geometric Mean", "AUC"]
+        metriche = MetricheCrossValidation(scelte)
+        accumulatore = AccumulatoreMetriche(scelte)
+        generatore = np.random.default_rng(1)
+        y_true = generatore.integers(0, 2, 90)
+        y_prob = generatore.integers(0, 4, 90) / 3
+        previsioni = (y_prob > 0.5).astype(int)
+
+        fold = [metriche.calcolo_metriche(y_true[i:i + 30], previsioni[i:i + 30], y_prob[i:i + 30]) for i in range(0, 90, 30)]
+        for i in range(0, 90, 30):
+            accumulatore.aggiungi(y_true[i:i + 30], previsioni[i:i + 30], y_prob[i:i + 30])
+
+        medie = accumulatore.metriche_medie()
+        aggregate = metriche.calcolo_metriche(y_true, previsioni, y_prob)
+        for nome in scelte:
+            self.assertAlmostEqual(medie[nome], np.mean([f[nome] for f in fold]))
+            self.assertAlmostEqual(accumulatore.metriche_aggregate()[nome], aggregate[nome])
+
+if __name__ == "__main__":
+    unittest.main()
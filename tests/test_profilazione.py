@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import profilazione
+from validation.evaluation import Evaluation
+
+class TestProfilazione(unittest.TestCase):
+    """Test per la misura dei tempi delle fasi della pipeline."""
+
+    def setUp(self):
+        rng = np.random.default_rng(2)
+        self.features = pd.DataFrame(rng.random((60, 4)))
+        self.target = pd.Series(rng.integers(0, 2, 60))
+
+    def tearDown(self):
+        profilazione.disattiva()
+
+    def test_spenta(self):
+        """Senza profilazione attiva le fasi non registrano nulla e i risultati non cambiano."""
+        self.assertIsNone(profilazione.attivo())
+        np.random.seed(0)
+        senza, _ = Evaluation(self.features, self.target, 3, ["Accuracy Rate"], k=3).valutazione_k_fold()
+        with profilazione.profilazione() as profilatore:
+            np.random.seed(0)
+            con, _ = Evaluation(self.features, self.target, 3, ["Accuracy Rate"], k=3).valutazione_k_fold()
+        self.assertEqual(senza, con)
+        self.assertIsNone(profilazione.attivo())
+        with profilazione.fase("ignorata"):
+            pass
+        self.assertNotIn("ignorata", profilatore.misure)
+
+    def test_fasi_per_fold(self):
+        """Le fasi annidate sono registrate fold per fold e sommate nel riepilogo."""
+        with profilazione.profilazione() as profilatore:
+            Evaluation(self.features, self.target, 3, ["Accuracy Rate", "AUC"], k=3).valutazione_k_fold()
+        for numero in (1, 2, 3):
+            self.assertEqual(profilatore.misure[f"k_fold/fold {numero}/train"][0], 1)
+            self.assertEqual(profilatore.misure[f"k_fold/fold {numero}/ricerca_vicini"][0], 1)
+        riepilogo = profilatore.report()["riepilogo"]
+        self.assertEqual(riepilogo["train"]["chiamate"], 3)
+        self.assertEqual(riepilogo["fold"]["chiamate"], 3)
+        self.assertEqual(riepilogo["split"]["chiamate"], 3)
+        self.assertGreaterEqual(riepilogo["k_fold"]["tempo"], riepilogo["fold"]["tempo"])
+
+    def test_report_con_cprofile(self):
+        """Con cprofile il report contiene le funzioni più costose e il profilo completo è salvato accanto."""
+        with profilazione.profilazione(cprofile=True) as profilatore:
+            Evaluation(self.features, self.target, 3, ["Accuracy Rate"], k=3).valutazione_leave_one_out()
+        with tempfile.TemporaryDirectory() as cartella:
+            percorso = profilatore.salva(os.path.join(cartella, "results", "profilazione.json"))
+            with open(percorso, encoding="utf-8") as file:
+                report = json.load(file)
+            self.assertTrue(os.path.exists(os.path.join(cartella, "results", "profilazione.prof")))
+        self.assertIn("leave_one_out", [fase["fase"] for fase in report["fasi"]])
+        self.assertGreater(len(report["cprofile"]), 0)
+        self.assertGreater(report["tempo_totale"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+import numpy as np
+from score import esegui_scoring, leggi_in_anticipo
+from tests.aiuti import dati_grezzi, modello_addestrato
+
+class TestScoring(unittest.TestCase):
+    """Test per lo scoring a blocchi di file non etichettati."""
+
+    def setUp(self):
+        self.cartella = tempfile.TemporaryDirectory()
+        grezzi = dati_grezzi(90, seme=6)
+        self.modello, _ = modello_addestrato(grezzi, k=3, metodo_imputazione="mean", metodo_scaling="standardize")
+        self.imputazione, self.scaling = self.modello.preprocessing["imputazione"], self.modello.preprocessing["scaling"]
+
+        self.record = grezzi.drop(columns=["classtype_v1"])
+        self.record.loc[[4, 40], "b"] = np.nan
+        self.input_path = os.path.join(self.cartella.name, "record.csv")
+        self.record.to_csv(self.input_path, index=False)
+
+    def tearDown(self):
+        self.cartella.cleanup()
+
+    def test_scoring_a_blocchi(self):
+        """Le predizioni a blocchi coincidono con una classificazione dell'intero file."""
+        output_path = os.path.join(self.cartella.name, "out", "predizioni.csv")
+        self.assertEqual(esegui_scoring(self.modello, self.input_path, output_path, dimensione_chunk=7), 90)
+
+        risultati = pd.read_csv(output_path)
+        self.assertEqual(list(risultati.columns), ["Sample code number", "classe", "probabilita"])
+        self.assertEqual(risultati["Sample code number"].tolist(), list(range(1000, 1090)))
+        attese = self.modello.predict_batch(self.scaling.transform(self.imputazione.transform(self.record))[["a", "b", "c"]])
+        self.assertEqual(risultati["classe"].tolist(), attese.tolist())
+
+    def test_record_incompleti(self):
+        """Senza imputazione salvata i record con valori mancanti restano senza classe."""
+        self.modello.preprocessing = {"scaling": self.scaling}
+        output_path = os.path.join(self.cartella.name, "predizioni.csv")
+        esegui_scoring(self.modello, self.input_path, output_path, dimensione_chunk=50)
+        risultati = pd.read_csv(output_path)
+        self.assertEqual(np.flatnonzero(risultati["classe"].isna()).tolist(), [4, 40])
+        self.assertEqual(risultati["probabilita"].notna().sum(), 88)
+
+    def test_colonne_mancanti(self):
+        """Un file senza tutte le colonne del modello viene rifiutato invece di imputare colonne intere."""
+        parziali = [self.record.drop(columns=["b"]), self.record.rename(columns={"a": "A", "b": "B", "c": "C"})]
+        input_path = os.path.join(self.cartella.name, "parziale.csv")
+        for record in parziali:
+            record.to_csv(input_path, index=False)
+            with self.assertRaises(ValueError) as errore:
+                esegui_scoring(self.modello, input_path, os.path.join(self.cartella.name, "predizioni.csv"))
+            self.assertIn("'b'", str(errore.exception))
+
+    def test_valori_non_numerici(self):
+        """I valori non numerici sono trattati come mancanti: imputati, o senza classe senza imputazione."""
+        self.record["c"] = self.record["c"].astype(object)
+        self.record.loc[7, "c"] = "dieci"
+        self.record.to_csv(self.input_path, index=False)
+        output_path = os.path.join(self.cartella.name, "predizioni.csv")
+
+        self.assertEqual(esegui_scoring(self.modello, self.input_path, output_path, dimensione_chunk=50), 90)
+        self.assertEqual(pd.read_csv(output_path)["classe"].notna().sum(), 90)
+        self.modello.preprocessing = {"scaling": self.scaling}
+        esegui_scoring(self.modello, self.input_path, output_path, dimensione_chunk=50)
+        self.assertEqual(np.flatnonzero(pd.read_csv(output_path)["classe"].isna()).tolist(), [4, 7, 40])
+
+    def test_errore_di_lettura(self):
+        """Un errore nel thread di lettura arriva al consumatore."""
+        def blocchi():
+            yield 1
+            raise OSError("file troncato")
+
+        letti = []
+        with self.assertRaises(OSError):
+            for blocco in leggi_in_anticipo(blocchi()):
+                letti.append(blocco)
+        self.assertEqual(letti, [1])
+
+if __name__ == "__main__":
+    unittest.main()
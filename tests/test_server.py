@@ -0,0 +1,106 @@
+import asyncio
+import json
+import unittest
+import numpy as np
+from preprocessing.inferenza import PreprocessingInferenza
+from server import MicroBatcher, gestisci_connessione
+from tests.aiuti import dati_grezzi, modello_addestrato
+
+class TestServizioPredizione(unittest.TestCase):
+    """Test per il servizio di predizione con micro-batching."""
+
+    def setUp(self):
+        grezzi = dati_grezzi(120, seme=5, mancanti_ogni=7)
+        self.modello, scalati = modello_addestrato(grezzi, k=5, metodo_imputazione="median", metodo_scaling="normalize")
+        self.attese = self.modello.predict_batch(scalati)
+        self.record = grezzi.drop(columns=["Sample code number", "classtype_v1"])
+
+    def test_preprocessing_inferenza(self):
+        """Il preprocessing vettoriale sui record grezzi riproduce la matrice di training."""
+        preprocessing = PreprocessingInferenza.da_modello(self.modello)
+        np.testing.assert_allclose(preprocessing.transform(self.record.to_dict("records")), self.modello._X)
+
+    def test_richieste_concorrenti(self):
+        """Le richieste concorrenti vengono raccolte in batch e ricevono la propria predizione."""
+        async def prova():
+            batcher = MicroBatcher(self.modello, attesa_ms=20, batch_massimo=64)
+            ciclo = asyncio.create_task(batcher.esegui())
+            record = self.record.replace({np.nan: None}).to_dict("records")
+            risposte = await asyncio.gather(*(batcher.predici(r) for r in record))
+            errore = await batcher.predici([1, 2])
+            ciclo.cancel()
+            batcher.esecutore.shutdown()
+            return risposte, errore, batcher.statistiche()
+
+        risposte, errore, statistiche = asyncio.run(prova())
+        self.assertEqual([r["classe"] for r in risposte], self.attese.tolist())
+        self.assertIn("errore", errore)
+        self.assertEqual(statistiche["richieste"], 120)
+        self.assertLess(statistiche["batch"], 120)
+        self.assertLessEqual(statistiche["dimensione_batch"]["massima"], 64)
+
+    def _predici_tutti(self, record):
+        """Risposte del MicroBatcher ai record indicati, uno alla volta."""
+        async def prova():
+            batcher = MicroBatcher(self.modello, attesa_ms=1)
+            ciclo = asyncio.create_task(batcher.esegui())
+            risposte = [await batcher.predici(r) for r in record]
+            ciclo.cancel()
+            batcher.esecutore.shutdown()
+            return risposte
+
+        return asyncio.run(prova())
+
+    def test_record_con_colonne_sconosciute(self):
+        """Chiavi che non sono colonne del modello o record vuoti vengono rifiutati, non imputati."""
+        vuoto, sconosciuta, senza_valori, parziale = self._predici_tutti(
+            [{}, {"A": 3, "b": 1}, {"a": None, "b": None}, {"a": 3}])
+        self.assertIn("errore", vuoto)
+        self.assertIn("'A'", sconosciuta["errore"])
+        self.assertIn("errore", senza_valori)
+        self.assertIn(parziale["classe"], [0, 1])
+
+    def test_record_malformati(self):
+        """Valori non numerici, liste della lunghezza sbagliata e record che non sono oggetti vengono rifiutati."""
+        malformati = [{"a": "tre", "b": 1, "c": 2}, {"a": [1, 2], "b": 1}, [1, "due", 3], [1, 2], [1, 2, 3, 4],
+                      "a=1", 5, None]
+        for record, risposta in zip(malformati, self._predici_tutti(malformati)):
+            self.assertIn("errore", risposta, record)
+
+    def test_protocollo_http(self):
+        """POST /predict e GET /stats sulla stessa connessione keep-alive."""
+        async def prova():
+            batcher = MicroBatcher(self.modello, attesa_ms=1)
+            ciclo = asyncio.create_task(batcher.esegui())
+            server = await asyncio.start_server(lambda l, s: gestisci_connessione(batcher, l, s), "127.0.0.1", 0)
+            porta = server.sockets[0].getsockname()[1]
+            lettore, scrittore = await asyncio.open_connection("127.0.0.1", porta)
+
+            async def richiesta(metodo, percorso, corpo=b""):
+                scrittore.write(f"{metodo} {percorso} HTTP/1.1\r\nContent-Length: {len(corpo)}\r\n\r\n".encode() + corpo)
+                stato = (await lettore.readline()).split()[1]
+                lunghezza = 0
+                while (riga := await lettore.readline()) != b"\r\n":
+                    if riga.lower().startswith(b"content-length"):
+                        lunghezza = int(riga.split(b":")[1])
+                return int(stato), json.loads(await lettore.readexactly(lunghezza))
+
+            risposte = [await richiesta("POST", "/predict", json.dumps({"a": 3, "b": None, "c": 7}).encode()),
+                        await richiesta("POST", "/predict", b"{non json"),
+                        await richiesta("POST", "/predict", json.dumps({"a": "tre", "b": 1, "c": 7}).encode()),
+                        await richiesta("GET", "/stats")]
+            scrittore.close()
+            server.close()
+            ciclo.cancel()
+            batcher.esecutore.shutdown()
+            return risposte
+
+        (stato, predizione), (stato_errore, _), (stato_non_numerico, _), (_, statistiche) = asyncio.run(prova())
+        self.assertEqual(stato, 200)
+        self.assertIn(predizione["classe"], [0, 1])
+        self.assertEqual(stato_errore, 400)
+        self.assertEqual(stato_non_numerico, 400)
+        self.assertEqual(statistiche["richieste"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
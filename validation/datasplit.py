@@ -1,6 +1,8 @@
 import numpy as np
 import pandas as pd
 
+from profilazione import fase, misurata
+
 class SplitData:
 
     """Implementa tre tecniche per la suddivisione dei dati:
@@ -19,13 +21,7 @@ class SplitData:
         """
         Divide i dati in training e test set secondo la proporzione specificata.
         """
-        n = len(self.features) #dimensione totale del dataset
-        indices = np.arange(n) #crea array di indici da 0 a n-1
-        np.random.shuffle(indices) #mescola casualmente gli indici per evitare bias nella divisione
-        train_end = int(n * train_size) #calcola il numero di elementi da assegnare al training set in base al trai_size 
-        
-        train_indices = indices[:train_end] #contiene i primi indici per il training set 
-        test_indices = indices[train_end:] #contiene gli indici rimanenti per il test set
+        train_indices, test_indices = self.indici_holdout(train_size)
         
         """Suddivisione dellle features e target in base agli indici generati"""
 
@@ -33,12 +29,26 @@ class SplitData:
         Y_train, Y_test = self.target.iloc[train_indices], self.target.iloc[test_indices]
         
         return X_train, X_test, Y_train, Y_test
-   
-    def split_k_fold(self):
+
+    @misurata("split")
+    def indici_holdout(self, train_size=0.8):
+        """
+        Restituisce gli indici posizionali (training, test) dell'Holdout senza copiare i dati.
+        """
         n = len(self.features) #dimensione totale del dataset
         indices = np.arange(n) #crea array di indici da 0 a n-1
-        np.random.shuffle(indices) #mescola casualmente gli indici 
-        fold_size = n // self.k_folds #calcola la dimensione di ogni fold (divisione intera)
+        np.random.shuffle(indices) #mescola casualmente gli indici per evitare bias nella divisione
+        train_end = int(n * train_size) #calcola il numero di elementi da assegnare al training set in base al trai_size 
+        
+        train_indices = indices[:train_end] #contiene i primi indici per il training set 
+        test_indices = indices[train_end:] #contiene gli indici rimanenti per il test set
+        return train_indices, test_indices
+   
+    def split_k_fold(self):
+        """
+        Divide i dati in k fold e restituisce le liste di tutti i set di training e test.
+        Per dataset grandi è preferibile iter_k_fold, che non materializza le copie.
+        """
 
         """Inizializziamo le liste per salvare i folds (insiemi di training e test)"""
 
@@ -46,18 +56,7 @@ class SplitData:
         X_test_folds, Y_test_folds = [], []
         test_indices_folds = [] 
 
-        """Generiamo un loop per creare i folds"""
-
-        for i in range(self.k_folds):
-
-            """Se non è l'ultimo fold, assegna fold_size elementi al test set, altrimenti assegna i restanti elementi"""
-
-            if i < self.k_folds - 1:
-                test_indices = indices[i * fold_size: (i + 1) * fold_size]
-            else:
-                test_indices = indices[i * fold_size:]
-
-            train_indices = np.setdiff1d(indices, test_indices) #gli indici di training sono tutti gli indici esclusi quelli di test
+        for train_indices, test_indices in self.iter_k_fold():
 
             # Salvataggio dei vari set
             X_train_folds.append(self.features.iloc[train_indices])
@@ -70,23 +69,68 @@ class SplitData:
 
         return X_train_folds, Y_train_folds, X_test_folds, Y_test_folds, test_indices_folds
 
+    def iter_k_fold(self, ripetizioni=1):
+        """
+        Generatore per la K-Fold Cross Validation: restituisce un fold alla volta come coppia
+        (indici di training, indici di test), senza copiare i dati. La memoria usata resta
+        costante qualunque sia il numero di fold o di ripetizioni.
+
+        Parametri:
+        ripetizioni (int) - quante volte ripetere la K-Fold con un nuovo mescolamento
+
+        Ritorna:
+        generatore di tuple (np.ndarray, np.ndarray) con indici posizionali
+        """
+        n = len(self.features) #dimensione totale del dataset
+        fold_size = n // self.k_folds #calcola la dimensione di ogni fold (divisione intera)
+
+        for _ in range(ripetizioni):
+            indices = np.arange(n) #crea array di indici da 0 a n-1
+            np.random.shuffle(indices) #mescola casualmente gli indici 
+
+            """Generiamo un loop per creare i folds"""
+
+            for i in range(self.k_folds):
+
+                """Se non è l'ultimo fold, assegna fold_size elementi al test set, altrimenti assegna i restanti elementi"""
+
+                with fase("split"):
+                    if i < self.k_folds - 1:
+                        test_indices = indices[i * fold_size: (i + 1) * fold_size]
+                    else:
+                        test_indices = indices[i * fold_size:]
+
+                    train_indices = np.setdiff1d(indices, test_indices) #gli indici di training sono tutti gli indici esclusi quelli di test
+
+                yield train_indices, test_indices
+
     #definiamo il metodo per effetturale la Leave-One-Out Cross Validation
     def split_leave_one_out(self):
         """
         Divide i dati per Leave-One-Out Cross Validation, dove ogni campione viene usato come test una volta sola.
+        Attenzione: restituisce n copie del dataset (memoria O(n²)); per dataset grandi usare iter_leave_one_out.
 
         """
-        n = len(self.features) #utilizziamo la lunghezza totale del dataset
         X_train_folds, Y_train_folds, X_test_folds, Y_test_folds = [], [], [], []
         
-    #creo un loop per iterare una volta per ogni dato
-        for i in range(n):
-            test_indices = [i] #test set di cui seleziona un solo dato
-            train_indices = np.setdiff1d(np.arange(n), test_indices) #training set è costituito da tutti gli altri dati escluso test_indices
-            
+        for train_indices, test_indices in self.iter_leave_one_out():
             X_train_folds.append(self.features.iloc[train_indices])
             Y_train_folds.append(self.target.iloc[train_indices])
             X_test_folds.append(self.features.iloc[test_indices])
             Y_test_folds.append(self.target.iloc[test_indices])
         
-        return X_train_folds, Y_train_folds, X_test_folds, Y_test_folds
\ No newline at end of file
+        return X_train_folds, Y_train_folds, X_test_folds, Y_test_folds
+
+    def iter_leave_one_out(self):
+        """
+        Generatore per la Leave-One-Out Cross Validation: per ogni campione restituisce
+        (indici di training, indici di test) senza copiare i dati.
+        """
+        n = len(self.features) #utilizziamo la lunghezza totale del dataset
+        indices = np.arange(n)
+
+        #creo un loop per iterare una volta per ogni dato
+        for i in range(n):
+            test_indices = indices[i:i + 1] #test set di cui seleziona un solo dato
+            train_indices = np.concatenate((indices[:i], indices[i + 1:])) #training set è costituito da tutti gli altri dati escluso test_indices
+            yield train_indices, test_indices
@@ -1,97 +1,210 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 
 from validation.datasplit import SplitData
 from models.k_nearest_neighbor import ClassificatoreKNN
-from validation.metriche import MetricheCrossValidation
+from models.cache_vicini import CacheVicini, numero_vicini
+from validation.metriche import MetricheCrossValidation, AccumulatoreMetriche
+from validation.parallelo import esegui_folds, esegui_loo_veloce, posizioni_nel_training, RIGHE_PER_BLOCCO_LOO
+from profilazione import fase, misurata
 
 class Evaluation:
-    def __init__(self, features: pd.DataFrame, target: pd.Series, k_folds: int, metriche_scelte: list, k: int):
+    def __init__(self, features: pd.DataFrame, target: pd.Series, k_folds: int, metriche_scelte: list, k: int, n_jobs: int = 1,
+                 metrica: str = "euclidea", p: float = 2, cache_vicini=False):
         """
         Inizializza la classe Evaluation per valutare il modello con tecniche di validazione incrociata.
+        Con n_jobs > 1 i fold della K-Fold e i blocchi del Leave-One-Out veloce vengono eseguiti
+        in un pool di n_jobs processi, con gli stessi risultati dell'esecuzione seriale.
+        metrica e p scelgono la distanza usata da tutti i modelli valutati (vedi ClassificatoreKNN).
+
+        cache_vicini: True per calcolare alla prima valutazione i vicini di ogni campione una volta
+        sola (models.cache_vicini.CacheVicini) e riusarli in tutti i fold, le ripetizioni e le
+        strategie; oppure una CacheVicini già calcolata sulle stesse feature, da condividere tra
+        più oggetti Evaluation. I risultati non cambiano. Con valori mancanti nelle feature o nel
+        target la cache non viene usata.
         """
-        self.features = features.apply(pd.to_numeric, errors='coerce')  # Converte le feature in numeri
-        self.features.fillna(self.features.mean(), inplace=True)  # Sostituisce valori mancanti con la media
+        numeriche = features.apply(pd.to_numeric, errors='coerce')  # Converte le feature in numeri
+        self.features = numeriche.fillna(numeriche.mean())  # Sostituisce valori mancanti con la media
+
+        # matrici NumPy su cui lavorano i fold (condivise tra i processi se n_jobs > 1);
+        # i NaN restano, il modello scarta quelle righe in train come con i DataFrame
+        self._X = numeriche.to_numpy(dtype=np.float64)
+        self._y = pd.to_numeric(target, errors='coerce').to_numpy(dtype=np.float64)
+        self.n_jobs = n_jobs
 
         self.target = target
         self.k_folds = k_folds
         self.metriche_scelte = metriche_scelte
         self.k = k
+        self.metrica = metrica
+        self.p = p
+        self.cache_vicini = cache_vicini
 
         # Creazione di un'istanza della classe SplitData per suddividere i dati
         self.Split = SplitData(features, target, k_folds)
 
 
 
-    def valutazione_k_fold(self):
-    # Ora la split_k_fold restituisce 5 valori
-        X_train_folds, Y_train_folds, X_test_folds, Y_test_folds, test_indices_folds = self.Split.split_k_fold()
+    def _cache(self, k):
+        """CacheVicini da usare per cercare k vicini (calcolata al primo utilizzo), oppure None."""
+        if self.cache_vicini is None or self.cache_vicini is False:
+            return None
+        if np.isnan(self._X).any() or np.isnan(self._y).any():
+            return None  # il modello scarta le righe con valori mancanti: le posizioni non corrisponderebbero
+        if self.cache_vicini is True:
+            with fase("cache_vicini"):
+                self.cache_vicini = CacheVicini(self._X, numero_vicini(k), self.metrica, self.p)
+        elif not self.cache_vicini.compatibile(self._X, self.metrica, self.p):
+            raise ValueError("La cache dei vicini è stata calcolata su altre feature o con un'altra metrica")
+        return self.cache_vicini
 
-        metriche_totali = {m: [] for m in self.metriche_scelte}
+    @misurata("k_fold")
+    def valutazione_k_fold(self, ripetizioni=1, aggregate=False):
+        """
+        Esegue la K-Fold Cross Validation consumando i fold uno alla volta (SplitData.iter_k_fold):
+        in memoria c'è solo la copia del fold corrente.
+
+        I fold sono indipendenti: con n_jobs > 1 vengono distribuiti su un pool di processi.
+        Con ripetizioni > 1 esegue una K-Fold ripetuta: le metriche sono la media su tutti i
+        fold di tutte le ripetizioni, y_pred_all contiene le predizioni dell'ultima ripetizione.
+        Con aggregate=True restituisce invece le metriche calcolate su tutte le predizioni riunite.
+        """
+        accumulatore = AccumulatoreMetriche(self.metriche_scelte)
         
         # Inizializziamo un array vuoto (o np.zeros) per TUTTI i campioni = len(self.target)
         # Ciò ci consentirà di inserire le predizioni al posto giusto
         y_pred_all = np.zeros(len(self.target), dtype=int)
+        y_vero = self.target.to_numpy()
 
-        for i in range(self.k_folds):
-            # Istanzia e addestra il modello su X_train_folds[i]
-            modello_knn = ClassificatoreKNN(self.k)
-            modello_knn.train(X_train_folds[i], Y_train_folds[i])
-
-            # Calcola le predizioni sul test fold
-            previsioni = modello_knn.predict_batch(X_test_folds[i])
-            probabilita = modello_knn.predict_proba_batch(X_test_folds[i])
+        # ogni fold riceve un seme per i pareggi, così serie e parallelo danno gli stessi risultati
+        folds = ((train_indices, test_indices, np.random.randint(2 ** 31 - 1))
+                 for train_indices, test_indices in self.Split.iter_k_fold(ripetizioni))
 
+        cache = self._cache(self.k)
+        for test_indices, previsioni, probabilita in esegui_folds(self._X, self._y, folds, self.k, self.n_jobs,
+                                                                  self.metrica, self.p, cache):
             # Assegniamo le predizioni negli indici corrispondenti
-            y_pred_all[test_indices_folds[i]] = previsioni
+            y_pred_all[test_indices] = previsioni
             
-            # Calcola le metriche per questo fold
-            C_Metriche = MetricheCrossValidation(self.metriche_scelte)
-            metriche_fold = C_Metriche.calcolo_metriche(Y_test_folds[i], previsioni, probabilita)
-
-            # Aggiungi i risultati di fold in fold
-            for key, value in metriche_fold.items():
-                metriche_totali[key].append(value)
+            # Aggiorna conteggi e metriche con questo fold
+            accumulatore.aggiungi(y_vero[test_indices], previsioni, probabilita)
 
-        # Calcoliamo la media delle metriche su tutti i fold
-        metriche_medie = {key: np.mean(values) for key, values in metriche_totali.items()}
-        return metriche_medie, y_pred_all  # y_pred_all è ordinato correttamente!
+        # Media delle metriche su tutti i fold (o metriche sulle predizioni riunite)
+        metriche = accumulatore.metriche_aggregate() if aggregate else accumulatore.metriche_medie()
+        return metriche, y_pred_all  # y_pred_all è ordinato correttamente!
 
-    def valutazione_leave_one_out(self):
+    @misurata("leave_one_out")
+    def valutazione_leave_one_out(self, veloce=True):
         """
-        Esegue la validazione Leave-One-Out e calcola le metriche per ogni iterazione.
-        """
-        X_train_folds, Y_train_folds, X_test_folds, Y_test_folds = self.Split.split_leave_one_out()
-        metriche_totali = {m: [] for m in self.metriche_scelte}
-        y_pred_totale = []
+        Esegue la validazione Leave-One-Out. Ogni iterazione ha un solo campione di test, quindi
+        le metriche sono calcolate una volta sola su tutte le predizioni riunite.
 
-        for i in range(len(self.features)):
-            modello_knn = ClassificatoreKNN(self.k)
+        Con veloce=True (default) non addestra n modelli: usa un solo modello su tutto il dataset
+        e per ogni campione cerca k+1 vicini escludendo il campione stesso, ottenendo le stesse
+        predizioni e metriche della versione con n addestramenti (veloce=False). Entrambe lavorano
+        sulle feature con i valori mancanti riempiti con la media (self.features).
+        """
+        if veloce:
+            return self._leave_one_out_veloce()
 
-            X_train = pd.DataFrame(X_train_folds[i])
-            Y_train = pd.Series(Y_train_folds[i])
+        accumulatore = AccumulatoreMetriche(self.metriche_scelte)
+        y_pred_totale = []
+        features, target = self.features, self.target
 
-            modello_knn.train(X_train, Y_train)
-            previsioni = modello_knn.predict_batch(pd.DataFrame(X_test_folds[i])) 
-            
-            probabilita = modello_knn.predict_proba_batch(pd.DataFrame(X_test_folds[i])) 
+        for train_indices, test_indices in self.Split.iter_leave_one_out():
+            modello_knn = ClassificatoreKNN(self.k, metrica=self.metrica, p=self.p)
+            modello_knn.train(features.iloc[train_indices], target.iloc[train_indices])
+            previsioni, probabilita = modello_knn.predict_e_proba_batch(features.iloc[test_indices])
             
             y_pred_totale.append(previsioni.iloc[0])  # Un solo elemento per iterazione
 
-            C_Metriche = MetricheCrossValidation(self.metriche_scelte)
-            metriche_loo = C_Metriche.calcolo_metriche(pd.Series(Y_test_folds[i]), previsioni, probabilita)
+            accumulatore.aggiungi(target.iloc[test_indices], previsioni, probabilita, per_fold=False)
+
+        return accumulatore.metriche_aggregate(), np.array(y_pred_totale)  # Ora restituisce anche le previsioni!
 
-            for key, value in metriche_loo.items():
-                metriche_totali[key].append(value)
+    def _leave_one_out_veloce(self):
+        """
+        Leave-One-Out con una sola ricerca dei vicini su tutto il dataset.
+        """
+        # il dataset viene interrogato a blocchi di righe, ognuno con il proprio seme per i pareggi;
+        # ogni campione è cercato contro tutti gli altri escludendo la sua stessa posizione
+        X = self.features.to_numpy(dtype=np.float64)
+        semi = np.random.randint(2 ** 31 - 1, size=-(-len(X) // RIGHE_PER_BLOCCO_LOO))
+        previsioni, probabilita = esegui_loo_veloce(X, self._y, self.k, semi, self.n_jobs, self.metrica, self.p,
+                                                    self._cache(self.k))
+        return self._metriche_aggregate(previsioni, probabilita), previsioni
 
-        metriche_medie = {key: np.mean(values) for key, values in metriche_totali.items()}
-        return metriche_medie, np.array(y_pred_totale)  # Ora restituisce anche le previsioni!
+    def _metriche_aggregate(self, previsioni, probabilita):
+        """Metriche del Leave-One-Out sulle predizioni di tutti i campioni riunite."""
+        accumulatore = AccumulatoreMetriche(self.metriche_scelte)
+        accumulatore.aggiungi(self.target.to_numpy(), previsioni, probabilita, per_fold=False)
+        return accumulatore.metriche_aggregate()
+
+    @misurata("sweep_k")
+    def sweep_k(self, valori_k, strategy="k_fold", train_size=0.8):
+        """
+        Valuta più valori di k con una sola ricerca dei vicini per fold: per ogni fold i vicini
+        vengono cercati fino a max(valori_k) e voto e probabilità di ogni k si ricavano dai
+        conteggi cumulativi (ClassificatoreKNN.predict_e_proba_multi_k).
 
+        Parametri:
+        valori_k (list) - valori di k da confrontare
+        strategy (str) - "holdout", "k_fold" o "leave_one_out"
+        train_size (float) - proporzione di training per l'holdout
+
+        Ritorna:
+        pd.DataFrame con una riga per ogni k e una colonna per ogni metrica scelta
+        """
+        valori_k = sorted(set(valori_k))
+        k_max = max(valori_k)
+        y_vero = self.target.to_numpy()
+        cache = self._cache(k_max)
+
+        if strategy == "leave_one_out":
+            X = self.features.to_numpy(dtype=np.float64)
+            modello_knn = ClassificatoreKNN(k_max, metrica=self.metrica, p=self.p)
+            modello_knn.train(X, self._y)
+            tutti = np.arange(len(X))
+            if cache is not None:
+                _, vicini = cache.vicini(tutti, tutti, k_max, modello_knn, escludi=True)
+                risultati = modello_knn.multi_k_da_vicini(vicini, valori_k)
+            else:
+                # il modello scarta le righe con target mancante: ogni riga esclude la sua posizione nel training
+                escludi = posizioni_nel_training(modello_knn, len(X))
+                risultati = modello_knn.predict_e_proba_multi_k(X, valori_k, escludi=escludi)
+            righe = {k: self._metriche_aggregate(*risultati[k]) for k in valori_k}
+            return pd.DataFrame.from_dict(righe, orient="index").rename_axis("k")
+
+        if strategy == "holdout":
+            folds = [self.Split.indici_holdout(train_size)]
+        else:
+            folds = self.Split.iter_k_fold()
+
+        accumulatori = {k: AccumulatoreMetriche(self.metriche_scelte) for k in valori_k}
+        for train_indices, test_indices in folds:
+            modello_knn = ClassificatoreKNN(k_max, metrica=self.metrica, p=self.p)
+            modello_knn.train(self._X[train_indices], self._y[train_indices])
+            if cache is not None:
+                _, vicini = cache.vicini(test_indices, train_indices, k_max, modello_knn)
+                risultati = modello_knn.multi_k_da_vicini(vicini, valori_k)
+            else:
+                risultati = modello_knn.predict_e_proba_multi_k(self._X[test_indices], valori_k)
+
+            for k, (previsioni, probabilita) in risultati.items():
+                accumulatori[k].aggiungi(y_vero[test_indices], previsioni, probabilita)
+
+        righe = {k: accumulatore.metriche_medie() for k, accumulatore in accumulatori.items()}
+        return pd.DataFrame.from_dict(righe, orient="index").rename_axis("k")
+
+    @misurata("holdout")
     def valutazione_holdout(self, train_size=0.8):
         """
         Esegue la validazione Holdout e calcola le metriche.
         """
+        cache = self._cache(self.k)
+        if cache is not None:
+            return self._holdout_con_cache(cache, train_size)
+
         X_train, X_test, Y_train, Y_test = self.Split.split_holdout(train_size)
 
         X_train = pd.DataFrame(X_train)
@@ -99,21 +212,33 @@ class Evaluation:
         X_test = pd.DataFrame(X_test)
         Y_test = pd.Series(Y_test)
 
-        modello_knn = ClassificatoreKNN(self.k)
+        modello_knn = ClassificatoreKNN(self.k, metrica=self.metrica, p=self.p)
         modello_knn.train(X_train, Y_train)
-        previsioni = modello_knn.predict_batch(X_test)
-
-        # Probabilità [0..1] della classe 1 (per AUC)
-        probabilita = modello_knn.predict_proba_batch(X_test)
+        # Predizioni e probabilità [0..1] della classe 1 (per AUC) con una sola ricerca dei vicini
+        previsioni, probabilita = modello_knn.predict_e_proba_batch(X_test)
 
         C_Metriche = MetricheCrossValidation(self.metriche_scelte)
         metriche_holdout = C_Metriche.calcolo_metriche(Y_test, previsioni, probabilita) #aggiunta di probabilita
 
         return metriche_holdout, np.array(previsioni), Y_test  # Ora restituisce anche le previsioni!
 
-def evaluate_model(features, target, strategy, param, k, metriche_scelte):
+    def _holdout_con_cache(self, cache, train_size):
+        """Holdout con i vicini letti dalla cache: stessi indici, predizioni e metriche di valutazione_holdout."""
+        train_indices, test_indices = self.Split.indici_holdout(train_size)
+        modello_knn = ClassificatoreKNN(self.k, metrica=self.metrica, p=self.p)
+        modello_knn.train(self._X[train_indices], self._y[train_indices])
+        _, vicini = cache.vicini(test_indices, train_indices, self.k, modello_knn)
+        previsioni, probabilita = modello_knn.predict_e_proba_vicini(vicini)
+
+        Y_test = self.target.iloc[test_indices]
+        previsioni = pd.Series(previsioni, index=Y_test.index)
+        probabilita = pd.Series(probabilita, index=Y_test.index)
+        C_Metriche = MetricheCrossValidation(self.metriche_scelte)
+        return C_Metriche.calcolo_metriche(Y_test, previsioni, probabilita), np.array(previsioni), Y_test
+
+def evaluate_model(features, target, strategy, param, k, metriche_scelte, n_jobs=1):
     """Esegue la valutazione del modello e calcola le metriche."""
-    evaluation = Evaluation(features, target, k_folds=(param or 5), metriche_scelte=metriche_scelte, k=k)
+    evaluation = Evaluation(features, target, k_folds=(param or 5), metriche_scelte=metriche_scelte, k=k, n_jobs=n_jobs)
     
     if strategy == "holdout":
         metrics_result, y_pred, y_test = evaluation.valutazione_holdout(train_size=param)
@@ -124,4 +249,12 @@ def evaluate_model(features, target, strategy, param, k, metriche_scelte):
         metrics_result, y_pred = evaluation.valutazione_leave_one_out()
         y_test = target
         
-    return y_test, y_pred, metrics_result
\ No newline at end of file
+    return y_test, y_pred, metrics_result
+
+
+def sweep_k(features, target, strategy, param, valori_k, metriche_scelte):
+    """Confronta più valori di k con una sola ricerca dei vicini per fold e restituisce la tabella delle metriche."""
+    evaluation = Evaluation(features, target, k_folds=(param or 5), metriche_scelte=metriche_scelte, k=max(valori_k))
+    if strategy == "holdout":
+        return evaluation.sweep_k(valori_k, strategy, train_size=param)
+    return evaluation.sweep_k(valori_k, strategy)
@@ -1,6 +1,65 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
+from profilazione import misurata
+
+
+def curva_roc(y_true, y_prob) -> tuple:
+    """
+    Calcola i punti della curva ROC con un solo ordinamento e somme cumulative (O(n log n)).
+
+    I campioni sono ordinati per probabilità decrescente; per ogni valore distinto di probabilità
+    (soglia) si contano i veri e i falsi positivi con probabilità >= soglia. I campioni con la
+    stessa probabilità entrano tutti insieme, quindi un gruppo di pari produce un solo punto (il
+    segmento che lo collega al precedente vale come mezzo conteggio nell'area). La curva parte
+    da (0, 0), la soglia infinita che non classifica nessun campione come positivo.
+
+    INPUT:
+    y_true: valori reali (1 positivo, 0 negativo)
+    y_prob: probabilità di classe 1
+
+    OUTPUT:
+    tupla (fpr, tpr, soglie) di array NumPy
+    """
+    y_true = np.asarray(y_true)
+    y_prob = np.asarray(y_prob, dtype=np.float64)
+
+    ordine = np.argsort(-y_prob, kind="stable")
+    probabilita = y_prob[ordine]
+    veri_positivi = np.cumsum(y_true[ordine] == 1)
+    falsi_positivi = np.cumsum(y_true[ordine] == 0)
+
+    # ultima posizione di ogni gruppo di probabilità uguali
+    fine_gruppi = np.flatnonzero(np.r_[probabilita[1:] != probabilita[:-1], len(probabilita) > 0])
+    veri_positivi = np.r_[0, veri_positivi[fine_gruppi]]
+    falsi_positivi = np.r_[0, falsi_positivi[fine_gruppi]]
+    soglie = np.r_[np.inf, probabilita[fine_gruppi]]
+
+    n_positivi, n_negativi = veri_positivi[-1], falsi_positivi[-1]
+    tpr = veri_positivi / n_positivi if n_positivi > 0 else np.zeros(len(soglie))
+    fpr = falsi_positivi / n_negativi if n_negativi > 0 else np.zeros(len(soglie))
+    return fpr, tpr, soglie
+
+
+def area_trapezi(x, y) -> float:
+    """Area sotto la spezzata (x, y) con la formula del trapezio."""
+    x, y = np.asarray(x), np.asarray(y)
+    return float(np.sum(np.diff(x) * (y[1:] + y[:-1]) / 2))
+
+
+def conteggi_confusione(y_true, previsioni) -> tuple:
+    """
+    Conta veri positivi, veri negativi, falsi positivi e falsi negativi (classe positiva 1,
+    negativa 0).
+
+    OUTPUT:
+    tupla (vero_positivo, vero_negativo, falso_positivo, falso_negativo)
+    """
+    y_true, previsioni = np.asarray(y_true), np.asarray(previsioni)
+    reale_positivo, reale_negativo = y_true == 1, y_true == 0
+    previsto_positivo, previsto_negativo = previsioni == 1, previsioni == 0
+    return (np.count_nonzero(reale_positivo & previsto_positivo), np.count_nonzero(reale_negativo & previsto_negativo),
+            np.count_nonzero(reale_negativo & previsto_positivo), np.count_nonzero(reale_positivo & previsto_negativo))
+
 
 class MetricheCrossValidation:
     
@@ -13,6 +72,7 @@ class MetricheCrossValidation:
         """
         self.metriche_scelte = metriche_scelte
 
+    @misurata("metriche")
     def calcolo_metriche(self, y_test: pd.Series, previsioni: pd.Series, probabilita: pd.Series=None) -> dict:
         """
         Calcola le metriche richieste in self.metriche_scelte.
@@ -20,15 +80,28 @@ class MetricheCrossValidation:
         - previsioni: Serie dei valori predetti (0/1)
         - probabilita: Serie delle 'probabilità' di classe 1 (se disponibile)
         """
-        
-        vero_positivo = np.sum((y_test == 1) & (previsioni == 1))
-        vero_negativo = np.sum((y_test == 0) & (previsioni == 0))
-        falso_positivo = np.sum((y_test == 0) & (previsioni == 1))
-        falso_negativo = np.sum((y_test == 1) & (previsioni == 0))
+        metriche = self.metriche_da_conteggi(*conteggi_confusione(y_test, previsioni), totale=len(y_test))
 
+        if 'AUC' in self.metriche_scelte:
+            if probabilita is None:
+                # Se non abbiamo la probabilità, non possiamo calcolare l'AUC.
+                metriche['AUC'] = None
+            else:
+                metriche['AUC'] = self.calcolo_auc(y_test, probabilita)
+
+        return metriche
+
+    def metriche_da_conteggi(self, vero_positivo, vero_negativo, falso_positivo, falso_negativo, totale=None) -> dict:
+        """
+        Calcola le metriche scelte (tranne l'AUC, che richiede le probabilità) a partire dai
+        quattro conteggi della matrice di confusione. totale è il numero di campioni (di default
+        la somma dei conteggi).
+        """
         metriche = {}
 
-        totale = len(y_test) if len(y_test) > 0 else 1  # Evita divisione per zero
+        if totale is None:
+            totale = vero_positivo + vero_negativo + falso_positivo + falso_negativo
+        totale = totale if totale > 0 else 1  # Evita divisione per zero
 
         if 'Accuracy Rate' in self.metriche_scelte:
             metriche['Accuracy Rate'] = (vero_positivo + vero_negativo) / totale
@@ -50,39 +123,14 @@ class MetricheCrossValidation:
             
             metriche['Geometric Mean'] = np.sqrt(sensitivity * specificity)
 
-        if 'AUC' in self.metriche_scelte:
-            if probabilita is None:
-                # Se non abbiamo la probabilità, non possiamo calcolare l'AUC.
-                metriche['AUC'] = None
-            else:
-                metriche['AUC'] = self.calcolo_auc(y_test, probabilita)
-
         return metriche
     
     def calcolo_auc(self, y_true: pd.Series, y_prob: pd.Series) -> float:
         """
         Calcola l'Area Under the ROC Curve (AUC) basandosi sulle probabilità di classe 1.
         """
-        # Ordiniamo le soglie dal più alto al più basso
-        soglie = np.sort(y_prob)[::-1]
-        tpr = []
-        fpr = []
-        
-        n_positivi = np.sum(y_true == 1)
-        n_negativi = np.sum(y_true == 0)
-
-        # Per ogni soglia, costruiamo una predizione binaria e calcoliamo TPR e FPR
-        for soglia in soglie:
-            y_pred_temp = (y_prob >= soglia).astype(int)
-            vp = np.sum((y_pred_temp == 1) & (y_true == 1))
-            fp = np.sum((y_pred_temp == 1) & (y_true == 0))
-
-            tpr.append(vp / n_positivi if n_positivi > 0 else 0.0)
-            fpr.append(fp / n_negativi if n_negativi > 0 else 0.0)
-
-        # Calcolo dell'area con la formula del trapezio
-        auc_value = np.trapz(tpr, fpr)
-        return auc_value
+        fpr, tpr, _ = curva_roc(y_true, y_prob)
+        return area_trapezi(fpr, tpr)
 
 
     def holdout_validation_metrics(self,model, X_train, X_test, Y_train, Y_test) -> dict:
@@ -162,6 +210,8 @@ class MetricheCrossValidation:
         """
         Plotta le metriche ottenute dalla Cross Validation.
         """
+        import matplotlib.pyplot as plt  # importato solo quando serve un grafico
+
         for metrica, valori in metriche.items():
             plt.plot(valori, marker='o', linestyle='solid', linewidth=2, markersize=5, label=metrica)
 
@@ -171,4 +221,72 @@ class MetricheCrossValidation:
         plt.legend()
         plt.show()
 
-  
\ No newline at end of file
+  
+
+
+class AccumulatoreMetriche:
+    """
+    Accumula le predizioni di più fold senza conservare un dizionario di metriche per fold.
+
+    Per ogni fold aggiunto si aggiornano i conteggi totali della matrice di confusione e la somma
+    delle metriche del fold; se è richiesta l'AUC si conservano anche etichette e probabilità.
+    Alla fine sono disponibili:
+    - metriche_medie(): media delle metriche dei fold (come la K-Fold classica)
+    - metriche_aggregate(): metriche calcolate una volta sola su tutte le predizioni riunite,
+      le uniche significative quando ogni fold contiene un solo campione (Leave-One-Out)
+    """
+
+    def __init__(self, metriche_scelte: list):
+        self.metriche = MetricheCrossValidation(metriche_scelte)
+        self.metriche_scelte = metriche_scelte
+        self.conteggi = np.zeros(4, dtype=np.int64)  # vero_positivo, vero_negativo, falso_positivo, falso_negativo
+        self.n_campioni = 0
+        self.n_fold = 0
+        self._somme_fold = {}
+        self._etichette, self._punteggi = [], []
+        self._con_probabilita = True
+
+    @misurata("metriche")
+    def aggiungi(self, y_vero, previsioni, probabilita=None, per_fold: bool = True):
+        """
+        Aggiunge le predizioni di un fold. Con per_fold=False i campioni contano solo per le
+        metriche aggregate (evita di calcolare metriche per fold di un solo campione).
+        """
+        conteggi = conteggi_confusione(y_vero, previsioni)
+        self.conteggi += conteggi
+        self.n_campioni += len(y_vero)
+
+        auc = 'AUC' in self.metriche_scelte
+        if auc:
+            if probabilita is None:
+                self._con_probabilita = False
+            else:
+                self._etichette.append(np.asarray(y_vero))
+                self._punteggi.append(np.asarray(probabilita, dtype=np.float64))
+
+        if per_fold:
+            metriche_fold = self.metriche.metriche_da_conteggi(*conteggi, totale=len(y_vero))
+            if auc:
+                metriche_fold['AUC'] = None if probabilita is None else self.metriche.calcolo_auc(y_vero, probabilita)
+            for key, value in metriche_fold.items():
+                somma = self._somme_fold.get(key, 0.0)
+                self._somme_fold[key] = None if value is None or somma is None else somma + value
+            self.n_fold += 1
+
+    @misurata("metriche")
+    def metriche_medie(self) -> dict:
+        """Media delle metriche dei fold aggiunti con per_fold=True."""
+        return {key: (None if somma is None else somma / self.n_fold) for key, somma in self._somme_fold.items()}
+
+    @misurata("metriche")
+    def metriche_aggregate(self) -> dict:
+        """Metriche calcolate sui conteggi totali e, per l'AUC, su tutte le probabilità riunite."""
+        metriche = self.metriche.metriche_da_conteggi(*self.conteggi, totale=self.n_campioni)
+        if 'AUC' in self.metriche_scelte:
+            if not self._con_probabilita:
+                metriche['AUC'] = None
+            else:
+                etichette = np.concatenate(self._etichette) if self._etichette else np.empty(0)
+                punteggi = np.concatenate(self._punteggi) if self._punteggi else np.empty(0)
+                metriche['AUC'] = self.metriche.calcolo_auc(etichette, punteggi)
+        return metriche
@@ -0,0 +1,205 @@
+"""
+Esecuzione dei fold di validazione in un pool di processi.
+
+La matrice delle feature e il target vengono copiati una sola volta in memoria condivisa
+(multiprocessing.shared_memory): ogni processo del pool vi si collega all'avvio e i task
+ricevono solo gli indici del fold e un seme per i pareggi. I risultati vengono restituiti
+nell'ordine dei fold, quindi le metriche coincidono con quelle dell'esecuzione seriale.
+"""
+
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+from models.k_nearest_neighbor import ClassificatoreKNN
+from profilazione import fase
+
+
+# numero di righe di query per ogni task del leave-one-out veloce: fisso e indipendente da
+# n_jobs, così l'esecuzione seriale e quella parallela usano gli stessi blocchi e gli stessi semi
+RIGHE_PER_BLOCCO_LOO = 2048
+
+# array condivisi visti dal processo corrente (impostati dall'inizializzatore del pool)
+_CONDIVISI = {}
+_SEGMENTI = []
+_MODELLI = {}
+
+
+def esegui_fold(X, y, train_indices, test_indices, k, seme, metrica="euclidea", p=2, cache=None):
+    """
+    Addestra un ClassificatoreKNN (con la metrica di distanza indicata) sul training set del
+    fold e lo valuta sul test set. Con una CacheVicini calcolata su X i vicini vengono letti
+    dalla cache invece di essere cercati.
+
+    Ritorna:
+    tupla (previsioni, probabilita) come array NumPy
+    """
+    modello_knn = ClassificatoreKNN(k, seme=seme, metrica=metrica, p=p)
+    modello_knn.train(X[train_indices], y[train_indices])
+    if cache is not None:
+        _, vicini = cache.vicini(test_indices, train_indices, k, modello_knn)
+        return modello_knn.predict_e_proba_vicini(vicini)
+    previsioni, probabilita = modello_knn.predict_e_proba_batch(X[test_indices])
+    return previsioni.to_numpy(), probabilita.to_numpy()
+
+
+def posizioni_nel_training(modello_knn, n: int) -> np.ndarray:
+    """
+    Posizione nel training del modello di ognuna delle n righe della matrice NumPy passata a
+    train, -1 per le righe scartate perché hanno valori mancanti (feature o target): serve a
+    escludere ogni campione da sé stesso anche quando il modello ha meno righe della matrice.
+    """
+    posizioni = np.full(n, -1, dtype=np.intp)
+    posizioni[modello_knn.features.index.to_numpy()] = np.arange(len(modello_knn.features))
+    return posizioni
+
+
+def esegui_blocco_loo(modello_knn, X, inizio, fine, seme, cache=None, posizioni=None):
+    """
+    Leave-one-out veloce sulle righe [inizio, fine): ogni riga è interrogata contro il modello
+    addestrato su tutto il dataset escludendo sé stessa. posizioni (vedi posizioni_nel_training)
+    traduce le righe di X in posizioni del training; se non indicate vengono calcolate.
+    """
+    modello_knn.seme = seme
+    if cache is not None:
+        _, vicini = cache.vicini(np.arange(inizio, fine), np.arange(len(X)), modello_knn.k, modello_knn, escludi=True)
+        return modello_knn.predict_e_proba_vicini(vicini)
+    if posizioni is None:
+        posizioni = posizioni_nel_training(modello_knn, len(X))
+    previsioni, probabilita = modello_knn.predict_e_proba_batch(X[inizio:fine], escludi=posizioni[inizio:fine])
+    return previsioni.to_numpy(), probabilita.to_numpy()
+
+
+def esegui_folds(X, y, folds, k, n_jobs=1, metrica="euclidea", p=2, cache=None):
+    """
+    Esegue i fold in serie (n_jobs=1) o in un pool di n_jobs processi.
+
+    Parametri:
+    X (np.ndarray) - matrice delle feature
+    y (np.ndarray) - target
+    folds (iterabile) - tuple (train_indices, test_indices, seme), consumate in modo pigro
+    k (int) - numero di vicini
+    metrica, p - metrica di distanza del classificatore (vedi ClassificatoreKNN)
+    cache (CacheVicini) - opzionale, vicini precalcolati su X: i fold vengono eseguiti nel
+    processo corrente, perché la ricerca dei vicini si riduce a una lettura della cache
+
+    Ritorna:
+    generatore di tuple (test_indices, previsioni, probabilita) nell'ordine dei fold
+    """
+    if n_jobs == 1 or cache is not None:
+        for numero, (train_indices, test_indices, seme) in enumerate(folds, 1):
+            with fase(f"fold {numero}"):
+                risultato = esegui_fold(X, y, train_indices, test_indices, k, seme, metrica, p, cache)
+            yield (test_indices, *risultato)
+        return
+
+    with _PoolCondiviso({"X": X, "y": y}, n_jobs) as pool:
+        for test_indices, risultato in _in_ordine(
+                ((test_indices, pool.submit(_esegui_fold_condiviso, train_indices, test_indices, k, seme, metrica, p))
+                 for train_indices, test_indices, seme in folds), n_jobs):
+            yield (test_indices, *risultato)
+
+
+def esegui_loo_veloce(X, y, k, semi, n_jobs=1, metrica="euclidea", p=2, cache=None):
+    """
+    Leave-one-out veloce a blocchi di RIGHE_PER_BLOCCO_LOO righe, in serie o in parallelo.
+    semi deve contenere un seme per ogni blocco. Con una CacheVicini calcolata su X i vicini
+    vengono letti dalla cache, nel processo corrente.
+
+    Ritorna:
+    tupla (previsioni, probabilita) per tutti i campioni, nell'ordine originale
+    """
+    blocchi = [(inizio, min(inizio + RIGHE_PER_BLOCCO_LOO, len(X)), seme)
+               for inizio, seme in zip(range(0, len(X), RIGHE_PER_BLOCCO_LOO), semi)]
+
+    if n_jobs == 1 or cache is not None:
+        modello_knn = ClassificatoreKNN(k, metrica=metrica, p=p)
+        modello_knn.train(X, y)
+        posizioni = posizioni_nel_training(modello_knn, len(X))
+        risultati = []
+        for numero, (inizio, fine, seme) in enumerate(blocchi, 1):
+            with fase(f"blocco {numero}"):
+                risultati.append(esegui_blocco_loo(modello_knn, X, inizio, fine, seme, cache, posizioni))
+    else:
+        with _PoolCondiviso({"X": X, "y": y}, n_jobs) as pool:
+            risultati = [r for _, r in _in_ordine(
+                ((None, pool.submit(_esegui_blocco_loo_condiviso, inizio, fine, k, seme, metrica, p))
+                 for inizio, fine, seme in blocchi), n_jobs)]
+
+    if not risultati:
+        return np.empty(0, dtype=int), np.empty(0)
+    previsioni, probabilita = zip(*risultati)
+    return np.concatenate(previsioni), np.concatenate(probabilita)
+
+
+def _in_ordine(task, n_jobs):
+    """
+    Consuma i task (chiave, future) tenendone in volo al più 2 * n_jobs e restituisce
+    (chiave, risultato) nello stesso ordine in cui i task sono stati creati.
+    """
+    in_volo = deque()
+    for chiave, futuro in task:
+        in_volo.append((chiave, futuro))
+        if len(in_volo) >= 2 * n_jobs:
+            chiave_pronta, futuro_pronto = in_volo.popleft()
+            yield chiave_pronta, futuro_pronto.result()
+    while in_volo:
+        chiave_pronta, futuro_pronto = in_volo.popleft()
+        yield chiave_pronta, futuro_pronto.result()
+
+
+class _PoolCondiviso:
+    """
+    Context manager: copia gli array in memoria condivisa e avvia un ProcessPoolExecutor i cui
+    processi vi si collegano all'avvio. All'uscita chiude il pool e libera la memoria.
+    """
+
+    def __init__(self, array: dict, n_jobs: int):
+        self.array = array
+        self.n_jobs = n_jobs
+        self.segmenti = []
+        self.pool = None
+
+    def __enter__(self):
+        descrizioni = {}
+        for nome, valori in self.array.items():
+            valori = np.ascontiguousarray(valori)
+            segmento = shared_memory.SharedMemory(create=True, size=max(1, valori.nbytes))
+            np.ndarray(valori.shape, dtype=valori.dtype, buffer=segmento.buf)[...] = valori
+            self.segmenti.append(segmento)
+            descrizioni[nome] = (segmento.name, valori.shape, valori.dtype.str)
+
+        self.pool = ProcessPoolExecutor(max_workers=self.n_jobs, initializer=_collega, initargs=(descrizioni,))
+        return self.pool
+
+    def __exit__(self, *errore):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+        for segmento in self.segmenti:
+            segmento.close()
+            segmento.unlink()
+        return False
+
+
+def _collega(descrizioni):
+    """Inizializzatore dei processi del pool: si collega agli array in memoria condivisa."""
+    for nome, (nome_segmento, forma, dtype) in descrizioni.items():
+        segmento = shared_memory.SharedMemory(name=nome_segmento)
+        _SEGMENTI.append(segmento)  # il riferimento tiene aperta la memoria condivisa
+        _CONDIVISI[nome] = np.ndarray(forma, dtype=np.dtype(dtype), buffer=segmento.buf)
+
+
+def _esegui_fold_condiviso(train_indices, test_indices, k, seme, metrica, p):
+    return esegui_fold(_CONDIVISI["X"], _CONDIVISI["y"], train_indices, test_indices, k, seme, metrica, p)
+
+
+def _esegui_blocco_loo_condiviso(inizio, fine, k, seme, metrica, p):
+    # il modello su tutto il dataset viene addestrato una sola volta per processo
+    chiave = (k, metrica, p)
+    if chiave not in _MODELLI:
+        modello_knn = ClassificatoreKNN(k, metrica=metrica, p=p)
+        modello_knn.train(_CONDIVISI["X"], _CONDIVISI["y"])
+        _MODELLI[chiave] = (modello_knn, posizioni_nel_training(modello_knn, len(_CONDIVISI["X"])))
+    modello_knn, posizioni = _MODELLI[chiave]
+    return esegui_blocco_loo(modello_knn, _CONDIVISI["X"], inizio, fine, seme, posizioni=posizioni)
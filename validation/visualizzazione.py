@@ -1,7 +1,8 @@
 import numpy as np
-import matplotlib.pyplot as plt
 import pandas as pd
 
+from validation.metriche import curva_roc, area_trapezi
+
 def plot_confusion_matrix(y_true, y_pred):
     """
     Genera e visualizza una Confusion Matrix.
@@ -13,19 +14,15 @@ def plot_confusion_matrix(y_true, y_pred):
     classi = np.unique(np.concatenate((y_true, y_pred)))
     num_classi = len(classi)
 
-    # Creazione della matrice di confusione vuota
-    cm = np.zeros((num_classi, num_classi), dtype=int)
-
-    # Mappare le etichette a indici validi
-    class_to_index = {label: idx for idx, label in enumerate(classi)}
+    # Mappare le etichette a indici validi (posizione in classi, che è ordinato)
+    true_index = np.searchsorted(classi, y_true)
+    pred_index = np.searchsorted(classi, y_pred)
 
-    # Riempire la matrice di confusione
-    for i in range(len(y_true)):
-        true_index = class_to_index[y_true[i]]
-        pred_index = class_to_index[y_pred[i]]
-        cm[true_index, pred_index] += 1
+    # Riempire la matrice di confusione con un solo conteggio su tutte le coppie (reale, predetto)
+    cm = np.bincount(true_index * num_classi + pred_index, minlength=num_classi ** 2).reshape(num_classi, num_classi)
 
-    # Creazione della figura
+    # Creazione della figura (matplotlib viene importato solo quando si disegna un grafico)
+    import matplotlib.pyplot as plt
     fig, ax = plt.subplots()
     cax = ax.matshow(cm, cmap="Blues")
     plt.colorbar(cax)
@@ -46,8 +43,6 @@ def plot_confusion_matrix(y_true, y_pred):
     plt.title("Confusion Matrix")
     #plt.show()
 
-import matplotlib.pyplot as plt
-
 def plot_metriche_bar(metriche_dict):
     """
     Disegna un grafico a barre con le metriche passate in `metriche_dict`,
@@ -56,6 +51,8 @@ def plot_metriche_bar(metriche_dict):
     # Filtra eventuali metriche = None (ad es. se l'AUC non è calcolabile)
     metriche_filtrate = {m: v for m, v in metriche_dict.items() if v is not None}
 
+    import matplotlib.pyplot as plt
+
     # Se vuoi forzare l’asse Y da 0 a 1, fai:
     plt.figure(figsize=(8, 6))
     plt.bar(range(len(metriche_filtrate)), list(metriche_filtrate.values()), 
@@ -79,34 +76,12 @@ def plot_roc_curve(y_true, y_prob):
     y_true: array dei valori reali
     y_prob: array delle probabilità di classe 1 (maligno)
     """
-    # Ordinare i dati in base alle probabilità predette e inizializza le liste per i tpr e fpr
-    soglie = np.sort(y_prob)[::-1]  # Dal valore più alto al più basso
-    tpr = []  # True Positive Rate (Sensibilità)
-    fpr = []  # False Positive Rate
-
-    #Conta il numero di esempi positivi e negativi
-    n_positivi = np.sum(y_true == 1)
-    n_negativi = np.sum(y_true == 0)
-    
-    
-    for soglia in soglie:
-
-        """Per ogni soglia di decisione ( valore di probabilità da usare per distinguere tra classi): 
-         genera una previsione binaria e calcola il nuemero di veri positivi e falsi positivi
-         registrando i valori di tpr e fpr"""
-     
-        y_pred = (y_prob >= soglia).astype(int)
-
-        vero_positivo = np.sum((y_pred == 1) & (y_true == 1))
-        falso_positivo = np.sum((y_pred == 1) & (y_true == 0))
-
-        tpr.append(vero_positivo / n_positivi)
-        fpr.append(falso_positivo / n_negativi)
-
-    # Calcolo dell'AUC con la formula del trapezio
-    auc = np.trapz(tpr, fpr)
+    # Punti della curva (un solo ordinamento, vedi curva_roc) e AUC con la formula del trapezio
+    fpr, tpr, _ = curva_roc(y_true, y_prob)
+    auc = area_trapezi(fpr, tpr)
 
     # Plot della Curva ROC
+    import matplotlib.pyplot as plt
     plt.figure(figsize=(8, 6))
     plt.plot(fpr, tpr, marker="o", linestyle="-", label=f"AUC = {auc:.3f}")
     plt.plot([0, 1], [0, 1], linestyle="--", color="gray")  # Linea random